@@ -3,8 +3,15 @@ Account Aggregation Service
 Aggregates domain-level data to account-level using mappings
 """
 import pandas as pd
-from typing import Dict, List
-from account_mapping_service import get_account_for_domain, get_affiliate_accounts
+from typing import Dict, List, Optional, Tuple
+from account_mapping_service import resolve_accounts, get_affiliate_accounts, get_domain_account_map
+from druid_service import fetch_region_data, fetch_region_account_data
+from config import DRUID_US_BROKER, DRUID_EU_BROKER
+from mbr_storage_service import ALL
+from mom_service import add_mom_column, build_account_totals
+
+# Largest exact mapping that is sent inline to Druid; bigger maps use the local path
+MAX_PUSHDOWN_DOMAINS = 5000
 
 
 def add_account_column(df: pd.DataFrame) -> pd.DataFrame:
@@ -16,123 +23,101 @@ def add_account_column(df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.copy()
 
-    # Map each domain to its account
-    df['Account'] = df['From_domain'].apply(
-        lambda domain: get_account_for_domain(domain) or 'Unmapped'
-    )
+    # Resolve each distinct domain once (exact, wildcard or parent match), then map every row
+    domains = df['From_domain'].str.lower()
+    lookup = resolve_accounts(domains.dropna().unique())
+    accounts = domains.map(lookup)
+    df['Account'] = accounts.where(accounts.notna() & (accounts != ''), 'Unmapped')
 
     return df
 
 
-def aggregate_by_account(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Aggregate domain-level data to account-level
-    Sums volumes, recalculates percentages
+def fetch_account_level_data(from_date: str, to_date: str, pushdown: bool = True) -> Tuple[pd.DataFrame, str]:
     """
-    if df.empty or 'Account' not in df.columns:
-        return pd.DataFrame()
+    Fetch both regions with an Account column, grouping by account inside Druid when possible
 
-    # Group by Account and ESP if ESP column exists
-    group_cols = ['Account']
-    if 'ESP' in df.columns:
-        group_cols.append('ESP')
-
-    # Aggregate volume metrics
-    agg_dict = {
-        'Sent': 'sum',
-        'Delivered': 'sum',
-    }
+    With pushdown, the exact domain -> account map is sent inline with the query and Druid
+    returns (Account, ESP) rows; domains it cannot match exactly come back individually and
+    are resolved locally (wildcard/parent rules or 'Unmapped'). Without pushdown, or when the
+    map exceeds MAX_PUSHDOWN_DOMAINS, domain rows are fetched and tagged locally.
 
-    # Add other numeric columns if they exist
-    optional_columns = [
-        'Bounces', 'Spam_Reports', 'Spam_report',
-        'Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open',
-        'unique_click', 'Unsubscribes', 'Unsubscribe'
-    ]
-
-    for col in optional_columns:
-        if col in df.columns:
-            agg_dict[col] = 'sum'
-
-    # Calculate Total_Unique_Opens if component columns exist
-    if all(col in df.columns for col in ['Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open']):
-        # Store individual components for aggregation
-        pass  # Already added to agg_dict above
+    Returns:
+        (DataFrame, 'druid' or 'local')
+    """
+    regions = [('US', DRUID_US_BROKER), ('EU', DRUID_EU_BROKER)]
+    domain_accounts = get_domain_account_map()
+
+    if pushdown and 0 < len(domain_accounts) <= MAX_PUSHDOWN_DOMAINS:
+        frames = [
+            fetch_region_account_data(region, broker, from_date, to_date, domain_accounts)
+            for region, broker in regions
+        ]
+        df = pd.concat(frames, ignore_index=True)
+        if not df.empty:
+            unmatched = df['Account'].isna()
+            if unmatched.any():
+                df.loc[unmatched, 'Account'] = add_account_column(
+                    df.loc[unmatched].drop(columns='Account')
+                )['Account']
+        return df, 'druid'
+
+    frames = [fetch_region_data(region, broker, from_date, to_date) for region, broker in regions]
+    return add_account_column(pd.concat(frames, ignore_index=True)), 'local'
+
+
+# Volume columns summed at every aggregation level (when present in the input)
+VOLUME_COLUMNS = [
+    'Sent', 'Delivered',
+    'Bounces', 'Spam_Reports', 'Spam_report',
+    'Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open',
+    'unique_click', 'Unsubscribes', 'Unsubscribe'
+]
+OPEN_COMPONENTS = ['Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open']
+
+
+def _percent(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    """numerator / denominator * 100, with NaN/inf replaced by 0, rounded to 2 places"""
+    return (
+        (numerator / denominator * 100)
+        .fillna(0)
+        .replace([float('inf'), float('-inf')], 0)
+        .round(2)
+    )
 
-    # Perform aggregation
-    df_agg = df.groupby(group_cols, as_index=False).agg(agg_dict)
 
-    # Calculate Total_Unique_Opens if component columns exist
-    if all(col in df_agg.columns for col in ['Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open']):
+def add_account_rates(df_agg: pd.DataFrame) -> pd.DataFrame:
+    """Derive Total_Unique_Opens and percentage metrics from summed volumes"""
+    if all(col in df_agg.columns for col in OPEN_COMPONENTS):
         df_agg['Total_Unique_Opens'] = (
             df_agg['Unique_user_open'] +
             df_agg['Unique_pre_fetch_open'] +
             df_agg['Unique_proxy_open']
         )
 
-    # Recalculate percentage metrics
     if 'Delivered' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Delivery_Rate_%'] = (
-            (df_agg['Delivered'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Delivery_Rate_%'] = _percent(df_agg['Delivered'], df_agg['Sent'])
 
     if 'Bounces' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Bounce_Rate_%'] = (
-            (df_agg['Bounces'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Bounce_Rate_%'] = _percent(df_agg['Bounces'], df_agg['Sent'])
 
     # Handle both Spam_Reports and Spam_report columns
     spam_col = 'Spam_Reports' if 'Spam_Reports' in df_agg.columns else 'Spam_report'
     if spam_col in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Spam_Rate_%'] = (
-            (df_agg[spam_col] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Spam_Rate_%'] = _percent(df_agg[spam_col], df_agg['Sent'])
 
     # Handle both Unsubscribes and Unsubscribe columns
     unsub_col = 'Unsubscribes' if 'Unsubscribes' in df_agg.columns else 'Unsubscribe'
     if unsub_col in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Unsub_Rate_%'] = (
-            (df_agg[unsub_col] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Unsub_Rate_%'] = _percent(df_agg[unsub_col], df_agg['Sent'])
 
-    # Calculate Open Rate using Total_Unique_Opens
     if 'Total_Unique_Opens' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Open_Rate_%'] = (
-            (df_agg['Total_Unique_Opens'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Open_Rate_%'] = _percent(df_agg['Total_Unique_Opens'], df_agg['Delivered'])
 
-    # Calculate Click Rate using unique_click
     if 'unique_click' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Click_Rate_%'] = (
-            (df_agg['unique_click'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['Click_Rate_%'] = _percent(df_agg['unique_click'], df_agg['Delivered'])
 
-    # Calculate CTOR
     if 'unique_click' in df_agg.columns and 'Total_Unique_Opens' in df_agg.columns:
-        df_agg['CTOR_%'] = (
-            (df_agg['unique_click'] / df_agg['Total_Unique_Opens'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+        df_agg['CTOR_%'] = _percent(df_agg['unique_click'], df_agg['Total_Unique_Opens'])
 
     # Final cleanup: Replace any remaining NaN or inf values
     df_agg = df_agg.fillna(0)
@@ -141,136 +126,128 @@ def aggregate_by_account(df: pd.DataFrame) -> pd.DataFrame:
     return df_agg
 
 
-def get_top_accounts_by_esp(df: pd.DataFrame, top_n: int = 10) -> Dict[str, List[Dict]]:
+def build_account_aggregates(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     """
-    Get top N accounts by send volume for each ESP
-    Returns: {esp_name: [top accounts list]}
+    Group domain-level rows once at (Account, ESP) and derive the account-only view
+    by re-aggregating those partial sums
+
+    Returns:
+        {'by_esp': per (Account, ESP) rows, 'by_account': per Account rows}, both with rates
     """
     if df.empty or 'Account' not in df.columns:
-        return {}
+        return {'by_esp': pd.DataFrame(), 'by_account': pd.DataFrame()}
 
-    # Add account column if not present
-    if 'Account' not in df.columns:
-        df = add_account_column(df)
-
-    # Aggregate by account and ESP
-    df_agg = aggregate_by_account(df)
-
-    if df_agg.empty:
-        return {}
+    volume_cols = [col for col in VOLUME_COLUMNS if col in df.columns]
+    group_cols = ['Account', 'ESP'] if 'ESP' in df.columns else ['Account']
 
-    result = {}
+    partial = df.groupby(group_cols, as_index=False)[volume_cols].sum()
+    by_account = partial.groupby('Account', as_index=False)[volume_cols].sum()
 
-    if 'ESP' in df_agg.columns:
-        for esp in df_agg['ESP'].unique():
-            esp_data = df_agg[df_agg['ESP'] == esp].copy()
-            esp_data = esp_data.sort_values('Sent', ascending=False).head(top_n)
+    return {
+        'by_esp': add_account_rates(partial),
+        'by_account': add_account_rates(by_account),
+    }
 
-            # Add rank
-            esp_data['Rank'] = range(1, len(esp_data) + 1)
 
-            result[esp] = esp_data.to_dict('records')
+def _ranked(df_agg: pd.DataFrame, top_n: Optional[int] = None) -> pd.DataFrame:
+    """Order by send volume (top N only, via nlargest, if given) and add Rank"""
+    if top_n is not None:
+        df_agg = df_agg.nlargest(top_n, 'Sent')
     else:
-        # If no ESP column, treat as single group
-        top_accounts = df_agg.sort_values('Sent', ascending=False).head(top_n)
-        top_accounts['Rank'] = range(1, len(top_accounts) + 1)
-        result['All'] = top_accounts.to_dict('records')
-
-    return result
+        df_agg = df_agg.sort_values('Sent', ascending=False)
+    df_agg = df_agg.copy()
+    df_agg['Rank'] = range(1, len(df_agg) + 1)
+    return df_agg
 
 
-def get_top_accounts_overall(df: pd.DataFrame, top_n: int = 10) -> List[Dict]:
+def aggregate_account_views(df: pd.DataFrame, top_n: int = 10,
+                            previous: Optional[pd.DataFrame] = None, include_all: bool = False) -> Dict:
     """
-    Get top N accounts overall (across all ESPs combined)
+    Build every account-level view from a single grouping pass
+
+    Args:
+        previous: Previous period account frame (get_previous_period_metrics()['account']);
+                  when given, MoM send change is merged into every account row
+        include_all: Also return every account per ESP ('all_accounts_by_esp')
+
+    Returns:
+        {'top_accounts_by_esp': {esp: [top accounts]}, 'top_accounts_overall': [top accounts],
+         'affiliate_accounts': [all affiliate accounts by send volume]}
     """
     if df.empty:
-        return []
+        views = {'top_accounts_by_esp': {}, 'top_accounts_overall': [], 'affiliate_accounts': []}
+        if include_all:
+            views['all_accounts_by_esp'] = {}
+        return views
 
     # Add account column if not present
     if 'Account' not in df.columns:
         df = add_account_column(df)
 
-    # Aggregate by account only (not by ESP)
-    group_cols = ['Account']
+    aggregates = build_account_aggregates(df)
+    by_esp, by_account = aggregates['by_esp'], aggregates['by_account']
+
+    if previous is not None and not by_account.empty:
+        # Per (Account, ESP) against the same ESP last period, account totals against totals
+        if 'ESP' in by_esp.columns:
+            by_esp = add_mom_column(by_esp, previous[previous['ESP'] != ALL], ['Account', 'ESP'])
+        by_account = add_mom_column(by_account, build_account_totals(previous), ['Account'])
+
+    top_accounts_by_esp = {}
+    all_accounts_by_esp = {}
+    if 'ESP' in by_esp.columns:
+        for esp, esp_data in by_esp.groupby('ESP'):
+            top_accounts_by_esp[esp] = _ranked(esp_data, top_n).to_dict('records')
+            if include_all:
+                all_accounts_by_esp[esp] = _ranked(esp_data).to_dict('records')
+    elif not by_account.empty:
+        # If no ESP column, treat as single group
+        top_accounts_by_esp['All'] = _ranked(by_account, top_n).to_dict('records')
+        if include_all:
+            all_accounts_by_esp['All'] = _ranked(by_account).to_dict('records')
 
-    agg_dict = {
-        'Sent': 'sum',
-        'Delivered': 'sum',
+    # Affiliate accounts (is_affiliate = 1), all of them
+    affiliate_accounts = []
+    affiliate_names = get_affiliate_accounts()
+    if affiliate_names and not by_account.empty:
+        affiliates = by_account[by_account['Account'].isin(affiliate_names)]
+        affiliate_accounts = _ranked(affiliates).to_dict('records')
+
+    views = {
+        'top_accounts_by_esp': top_accounts_by_esp,
+        'top_accounts_overall': _ranked(by_account, top_n).to_dict('records') if not by_account.empty else [],
+        'affiliate_accounts': affiliate_accounts,
     }
+    if include_all:
+        views['all_accounts_by_esp'] = all_accounts_by_esp
+    return views
 
-    optional_columns = [
-        'Bounces', 'Spam_Reports', 'Spam_report',
-        'Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open',
-        'unique_click', 'Unsubscribes', 'Unsubscribe'
-    ]
-
-    for col in optional_columns:
-        if col in df.columns:
-            agg_dict[col] = 'sum'
-
-    df_agg = df.groupby(group_cols, as_index=False).agg(agg_dict)
-
-    # Calculate Total_Unique_Opens if component columns exist
-    if all(col in df_agg.columns for col in ['Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open']):
-        df_agg['Total_Unique_Opens'] = (
-            df_agg['Unique_user_open'] +
-            df_agg['Unique_pre_fetch_open'] +
-            df_agg['Unique_proxy_open']
-        )
-
-    # Recalculate percentages
-    if 'Delivered' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Delivery_Rate_%'] = (
-            (df_agg['Delivered'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    if 'Bounces' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Bounce_Rate_%'] = (
-            (df_agg['Bounces'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    spam_col = 'Spam_Reports' if 'Spam_Reports' in df_agg.columns else 'Spam_report'
-    if spam_col in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Spam_Rate_%'] = (
-            (df_agg[spam_col] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
 
-    if 'Total_Unique_Opens' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Open_Rate_%'] = (
-            (df_agg['Total_Unique_Opens'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    if 'unique_click' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Click_Rate_%'] = (
-            (df_agg['unique_click'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+def aggregate_by_account(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aggregate domain-level data to account-level (by Account and ESP if present)
+    Sums volumes, recalculates percentages
+    """
+    if df.empty or 'Account' not in df.columns:
+        return pd.DataFrame()
+    return build_account_aggregates(df)['by_esp']
 
-    # Sort by sent volume and get top N
-    df_top = df_agg.sort_values('Sent', ascending=False).head(top_n)
 
-    # Add rank
-    df_top['Rank'] = range(1, len(df_top) + 1)
+def get_top_accounts_by_esp(df: pd.DataFrame, top_n: int = 10) -> Dict[str, List[Dict]]:
+    """
+    Get top N accounts by send volume for each ESP
+    Returns: {esp_name: [top accounts list]}
+    """
+    if df.empty or 'Account' not in df.columns:
+        return {}
+    return aggregate_account_views(df, top_n)['top_accounts_by_esp']
 
-    # Final cleanup: Replace any remaining NaN or inf values
-    df_top = df_top.fillna(0)
-    df_top = df_top.replace([float('inf'), float('-inf')], 0)
 
-    return df_top.to_dict('records')
+def get_top_accounts_overall(df: pd.DataFrame, top_n: int = 10) -> List[Dict]:
+    """
+    Get top N accounts overall (across all ESPs combined)
+    """
+    return aggregate_account_views(df, top_n)['top_accounts_overall']
 
 
 def get_account_summary(df: pd.DataFrame, account_name: str) -> Dict:
@@ -320,117 +297,68 @@ def get_account_summary(df: pd.DataFrame, account_name: str) -> Dict:
     return summary
 
 
-def get_affiliate_accounts_data(df: pd.DataFrame) -> List[Dict]:
-    """
-    Get aggregated data for all affiliate accounts (is_affiliate = 1)
-    Returns sorted list by send volume
+def get_account_summaries(df: pd.DataFrame, account_names: List[str]) -> Dict[str, Dict]:
     """
-    if df.empty:
-        return []
+    Build get_account_summary output for many accounts from one grouped pass
 
-    # Get list of affiliate account names from database
-    affiliate_names = get_affiliate_accounts()
+    Args:
+        df: Domain-level data (Account column is added if missing)
+        account_names: Accounts to summarise
 
-    if not affiliate_names:
-        return []
+    Returns:
+        {account_name: summary}, with the same error entry as get_account_summary
+        for accounts that have no rows
+    """
+    summaries = {name: {'error': f"No data found for account: {name}"} for name in account_names}
+    if df.empty:
+        return summaries
 
-    # Add account column if not present
     if 'Account' not in df.columns:
         df = add_account_column(df)
 
-    # Filter for affiliate accounts only
-    df_affiliates = df[df['Account'].isin(affiliate_names)].copy()
-
-    if df_affiliates.empty:
-        return []
-
-    # Aggregate by account only (across all ESPs)
-    group_cols = ['Account']
-
-    agg_dict = {
-        'Sent': 'sum',
-        'Delivered': 'sum',
-    }
-
-    optional_columns = [
-        'Bounces', 'Spam_Reports', 'Spam_report',
-        'Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open',
-        'unique_click', 'Unsubscribes', 'Unsubscribe'
-    ]
-
-    for col in optional_columns:
-        if col in df_affiliates.columns:
-            agg_dict[col] = 'sum'
-
-    df_agg = df_affiliates.groupby(group_cols, as_index=False).agg(agg_dict)
-
-    # Calculate Total_Unique_Opens
-    if all(col in df_agg.columns for col in ['Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open']):
-        df_agg['Total_Unique_Opens'] = (
-            df_agg['Unique_user_open'] +
-            df_agg['Unique_pre_fetch_open'] +
-            df_agg['Unique_proxy_open']
-        )
-
-    # Calculate percentage metrics
-    if 'Delivered' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Delivery_Rate_%'] = (
-            (df_agg['Delivered'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    if 'Bounces' in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Bounce_Rate_%'] = (
-            (df_agg['Bounces'] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    spam_col = 'Spam_Reports' if 'Spam_Reports' in df_agg.columns else 'Spam_report'
-    if spam_col in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Spam_Rate_%'] = (
-            (df_agg[spam_col] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
-
-    unsub_col = 'Unsubscribes' if 'Unsubscribes' in df_agg.columns else 'Unsubscribe'
-    if unsub_col in df_agg.columns and 'Sent' in df_agg.columns:
-        df_agg['Unsub_Rate_%'] = (
-            (df_agg[unsub_col] / df_agg['Sent'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+    account_data = df[df['Account'].isin(summaries)]
+    if account_data.empty:
+        return summaries
 
-    if 'Total_Unique_Opens' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Open_Rate_%'] = (
-            (df_agg['Total_Unique_Opens'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+    # One pass per level: account totals, account x ESP totals and account domain lists
+    grouped = account_data.groupby('Account', sort=False)
+    totals = grouped[['Sent', 'Delivered']].sum()
+    totals['domains'] = grouped['From_domain'].nunique()
+    domain_lists = grouped['From_domain'].agg(lambda s: sorted(s.unique().tolist()))
 
-    if 'unique_click' in df_agg.columns and 'Delivered' in df_agg.columns:
-        df_agg['Click_Rate_%'] = (
-            (df_agg['unique_click'] / df_agg['Delivered'] * 100)
-            .fillna(0)
-            .replace([float('inf'), float('-inf')], 0)
-            .round(2)
-        )
+    by_esp = {}
+    if 'ESP' in account_data.columns:
+        esp_totals = account_data.groupby(['Account', 'ESP'], sort=False)[['Sent', 'Delivered']].sum()
+        for (account, esp), row in esp_totals.iterrows():
+            by_esp.setdefault(account, {})[esp] = {
+                'sent': int(row['Sent']),
+                'delivered': int(row['Delivered']),
+                'delivery_rate': round(
+                    row['Delivered'] / row['Sent'] * 100, 2
+                ) if row['Sent'] > 0 else 0
+            }
 
-    # Sort by send volume descending
-    df_agg = df_agg.sort_values('Sent', ascending=False)
+    for account, row in totals.iterrows():
+        summary = {
+            'account_name': account,
+            'total_sent': int(row['Sent']),
+            'total_delivered': int(row['Delivered']),
+            'delivery_rate': round(
+                row['Delivered'] / row['Sent'] * 100, 2
+            ) if row['Sent'] > 0 else 0,
+            'total_domains': int(row['domains']),
+        }
+        if 'ESP' in account_data.columns:
+            summary['by_esp'] = by_esp.get(account, {})
+        summary['domains'] = domain_lists[account]
+        summaries[account] = summary
 
-    # Add rank
-    df_agg['Rank'] = range(1, len(df_agg) + 1)
+    return summaries
 
-    # Replace any remaining NaN or inf values before converting to dict
-    df_agg = df_agg.fillna(0)
-    df_agg = df_agg.replace([float('inf'), float('-inf')], 0)
 
-    return df_agg.to_dict('records')
+def get_affiliate_accounts_data(df: pd.DataFrame) -> List[Dict]:
+    """
+    Get aggregated data for all affiliate accounts (is_affiliate = 1)
+    Returns sorted list by send volume
+    """
+    return aggregate_account_views(df)['affiliate_accounts']
@@ -5,13 +5,45 @@ Manages domain-to-account mappings with SQLite backend
 import sqlite3
 import csv
 import os
+import json
+import base64
+import hashlib
+import re
+import threading
+from itertools import islice
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 
 
 DB_PATH = '/Users/pankaj/pani/data/account_mappings.db'
 CSV_PATH = '/Users/pankaj/pani/data/domain_account_mapping.csv'
 
+# In-memory domain -> account map, reloaded when the version moves past the loaded one
+_mapping_cache = {
+    'version': 0,           # bumped by every write to domain_account_mapping
+    'loaded_version': -1,
+    'accounts': {},         # sending_domain -> account_name (exact rows)
+    'affiliates': set(),    # account names with is_affiliate = 1
+    'trie': None,           # reversed-label trie over all rows, see build_domain_trie
+    'resolved': {},         # domain -> resolved account (or None), cleared on reload
+    'fingerprint': None,    # content hash of the loaded rows, stable across restarts
+}
+
+# A sending_domain of '*.example.com' maps every subdomain of example.com
+WILDCARD_PREFIX = '*.'
+
+# Valid sending_domain values for CSV uploads (optionally with a '*.' wildcard prefix)
+DOMAIN_PATTERN = re.compile(r'^(\*\.)?([a-z0-9_]([a-z0-9_-]*[a-z0-9_])?\.)+[a-z0-9-]{2,}$')
+UPSERT_BATCH_SIZE = 5000
+MAX_INVALID_SAMPLES = 100
+RESOLVED_CACHE_MAX = 200000     # resolved domains kept between mapping reloads
+
+# Search index: trigram FTS5 table over sending_domain/account_name, kept in sync by triggers
+SEARCH_TABLE = 'domain_account_mapping_fts'
+SEARCH_MIN_LENGTH = 3       # trigram matching needs at least 3 characters
+COUNT_ESTIMATE_CAP = 1000   # 'estimate' count mode stops counting here
+_mapping_lock = threading.Lock()
+
 
 def get_db_connection():
     """Get database connection"""
@@ -20,6 +52,128 @@ def get_db_connection():
     return conn
 
 
+def bump_mapping_version():
+    """Invalidate the in-memory mapping after a write"""
+    with _mapping_lock:
+        _mapping_cache['version'] += 1
+
+
+def get_mapping_version() -> int:
+    """Get the current mapping version"""
+    return _mapping_cache['version']
+
+
+def get_domain_account_map() -> Dict[str, str]:
+    """
+    Get the in-memory sending_domain -> account_name map
+    Loaded once from the database and reloaded only after a write bumps the version
+    """
+    with _mapping_lock:
+        if _mapping_cache['loaded_version'] != _mapping_cache['version']:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute('SELECT sending_domain, account_name, is_affiliate FROM domain_account_mapping')
+            rows = cursor.fetchall()
+            conn.close()
+
+            _mapping_cache['accounts'] = {
+                row['sending_domain']: row['account_name']
+                for row in rows if not row['sending_domain'].startswith(WILDCARD_PREFIX)
+            }
+            _mapping_cache['affiliates'] = {row['account_name'] for row in rows if row['is_affiliate'] == 1}
+            _mapping_cache['trie'] = build_domain_trie(
+                (row['sending_domain'], row['account_name']) for row in rows
+            )
+            _mapping_cache['resolved'] = {}
+            _mapping_cache['fingerprint'] = hashlib.sha256(json.dumps(
+                sorted((row['sending_domain'], row['account_name'], row['is_affiliate']) for row in rows)
+            ).encode()).hexdigest()
+            _mapping_cache['loaded_version'] = _mapping_cache['version']
+        return _mapping_cache['accounts']
+
+
+def get_mapping_fingerprint() -> str:
+    """Content hash of the current mapping (unlike the version, it survives restarts)"""
+    get_domain_account_map()
+    return _mapping_cache['fingerprint']
+
+
+def build_domain_trie(rows) -> Dict:
+    """
+    Build a trie keyed by domain labels from right to left (com -> example -> mail)
+
+    Each node holds 'account' for an exact row on that domain and 'wildcard'
+    for a '*.' row covering its subdomains.
+    """
+    root = {'children': {}, 'account': None, 'wildcard': None}
+    for sending_domain, account_name in rows:
+        wildcard = sending_domain.startswith(WILDCARD_PREFIX)
+        if wildcard:
+            sending_domain = sending_domain[len(WILDCARD_PREFIX):]
+
+        node = root
+        for label in reversed(sending_domain.split('.')):
+            node = node['children'].setdefault(label, {'children': {}, 'account': None, 'wildcard': None})
+        node['wildcard' if wildcard else 'account'] = account_name
+    return root
+
+
+def _resolve_in_trie(trie: Dict, domain: str) -> Optional[str]:
+    """Walk the trie for one lowercase domain and return the longest match"""
+    node = trie
+    labels = domain.split('.')
+    best = None
+    for depth, label in enumerate(reversed(labels)):
+        node = node['children'].get(label)
+        if node is None:
+            break
+        if depth == len(labels) - 1:
+            best = node['account'] or best
+        else:
+            # This node is a proper parent of the domain
+            best = node['wildcard'] or node['account'] or best
+    return best
+
+
+def resolve_accounts(domains) -> Dict[str, Optional[str]]:
+    """
+    Resolve many domains at once: an exact row wins, otherwise the longest
+    matching parent domain ('*.x.com' row, or an exact row on x.com) applies
+
+    Args:
+        domains: Iterable of lowercase domains
+
+    Returns:
+        Dict domain -> account name (None if unmapped) for the given domains
+    """
+    get_domain_account_map()
+    domains = set(domains)
+
+    with _mapping_lock:
+        trie = _mapping_cache['trie']
+        version = _mapping_cache['loaded_version']
+        cached = _mapping_cache['resolved']
+        result = {domain: cached[domain] for domain in domains if domain in cached}
+
+    missing = {domain: _resolve_in_trie(trie, domain) for domain in domains.difference(result)}
+    if missing:
+        with _mapping_lock:
+            # Only keep results computed against the map that is still loaded
+            if _mapping_cache['loaded_version'] == version and len(missing) <= RESOLVED_CACHE_MAX:
+                resolved = _mapping_cache['resolved']
+                if len(resolved) + len(missing) > RESOLVED_CACHE_MAX:
+                    resolved.clear()
+                resolved.update(missing)
+        result.update(missing)
+    return result
+
+
+def resolve_account(domain: str) -> Optional[str]:
+    """Resolve the account for a single domain (see resolve_accounts)"""
+    domain = domain.strip().lower()
+    return resolve_accounts([domain])[domain]
+
+
 def init_account_mapping_database():
     """Initialize account mapping database"""
     conn = get_db_connection()
@@ -48,6 +202,12 @@ def init_account_mapping_database():
         ON domain_account_mapping(account_name)
     ''')
 
+    # Keyset pagination follows (account_name, sending_domain)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_account_domain
+        ON domain_account_mapping(account_name, sending_domain)
+    ''')
+
     # Migration: Add is_affiliate column if it doesn't exist
     try:
         cursor.execute("SELECT is_affiliate FROM domain_account_mapping LIMIT 1")
@@ -56,57 +216,187 @@ def init_account_mapping_database():
         cursor.execute("ALTER TABLE domain_account_mapping ADD COLUMN is_affiliate INTEGER DEFAULT 0")
         print("is_affiliate column added successfully")
 
+    init_search_index(cursor)
+
     conn.commit()
     conn.close()
     print(f"Account mapping database initialized at {DB_PATH}")
 
 
-def import_csv_to_database(csv_path: str = CSV_PATH) -> Tuple[int, int]:
-    """
-    Import CSV file into database
-    Returns: (rows_imported, rows_skipped)
-    """
-    if not os.path.exists(csv_path):
-        print(f"CSV file not found at {csv_path}")
-        return 0, 0
+def parse_is_affiliate(value: Optional[str]) -> int:
+    """Parse the optional is_affiliate CSV field"""
+    return 1 if (value or 'No').strip().lower() in ['yes', 'true', '1'] else 0
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    imported = 0
-    skipped = 0
+def upsert_mappings_from_csv(lines: Iterable[str], batch_size: int = UPSERT_BATCH_SIZE,
+                             validate_domains: bool = True) -> Dict:
+    """
+    Stream-parse mapping CSV lines and upsert them in one transaction
+
+    Rows are read and written in batches, and each batch is compared with the stored
+    rows first, so only new or changed mappings are written (one executemany per batch).
+    Counts are per domain across the whole file; a later row for the same domain
+    overrides an earlier one. Nothing is committed if the file fails part way through.
+    Notes are left untouched.
+
+    Args:
+        lines: CSV text lines including the header (sending_domain, account_name, is_affiliate)
+        batch_size: Rows per batch
+        validate_domains: Reject sending domains that do not match DOMAIN_PATTERN
+                          (the legacy CSV_PATH import accepts any non-empty value)
+
+    Returns:
+        Dict with inserted/updated/unchanged/invalid counts (per domain), the number
+        of valid rows read and sample invalid rows
+    """
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not {'sending_domain', 'account_name'} <= {f.strip() for f in reader.fieldnames}:
+        raise ValueError('CSV must have sending_domain and account_name columns')
+    reader.fieldnames = [f.strip() for f in reader.fieldnames]
 
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+    summary = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0, 'rows': 0, 'invalid_rows': []}
 
-        for row in reader:
-            sending_domain = row.get('sending_domain', '').strip().lower()
-            account_name = row.get('account_name', '').strip()
+    def invalid(line: int, reason: str):
+        summary['invalid'] += 1
+        if len(summary['invalid_rows']) < MAX_INVALID_SAMPLES:
+            summary['invalid_rows'].append({'line': line, 'reason': reason})
 
-            # Handle is_affiliate field (optional in CSV)
-            is_affiliate_str = row.get('is_affiliate', 'No').strip()
-            is_affiliate = 1 if is_affiliate_str.lower() in ['yes', 'true', '1'] else 0
+    original = {}   # domain -> stored (account_name, is_affiliate) before this upload, None if new
+    final = {}      # domain -> last valid value in the file (what the table holds now)
+    written = False
 
-            if not sending_domain or not account_name:
-                skipped += 1
-                continue
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-            try:
-                cursor.execute('''
+    try:
+        while True:
+            chunk = [(row, reader.line_num) for row in islice(reader, batch_size)]
+            if not chunk:
+                break
+
+            # Validate; later rows for the same domain override earlier ones
+            batch = {}
+            for row, line in chunk:
+                sending_domain = (row.get('sending_domain') or '').strip().lower()
+                account_name = (row.get('account_name') or '').strip()
+                if not sending_domain or not account_name:
+                    invalid(line, 'missing sending_domain or account_name')
+                elif validate_domains and not DOMAIN_PATTERN.match(sending_domain):
+                    invalid(line, f"invalid domain '{sending_domain}'")
+                else:
+                    summary['rows'] += 1
+                    batch[sending_domain] = (account_name, parse_is_affiliate(row.get('is_affiliate')))
+
+            # Look up stored rows for domains not seen in earlier batches
+            domains = [d for d in batch if d not in original]
+            existing = {}
+            for start in range(0, len(domains), 500):
+                part = domains[start:start + 500]
+                cursor.execute(
+                    f"SELECT sending_domain, account_name, is_affiliate FROM domain_account_mapping "
+                    f"WHERE sending_domain IN ({','.join('?' * len(part))})",
+                    part
+                )
+                existing.update({r['sending_domain']: (r['account_name'], r['is_affiliate']) for r in cursor.fetchall()})
+            original.update({d: existing.get(d) for d in domains})
+
+            changes = [
+                (sending_domain, values[0], values[1])
+                for sending_domain, values in batch.items()
+                if values != final.get(sending_domain, original[sending_domain])
+            ]
+            final.update(batch)
+
+            if changes:
+                cursor.executemany('''
                     INSERT INTO domain_account_mapping (sending_domain, account_name, is_affiliate)
                     VALUES (?, ?, ?)
                     ON CONFLICT(sending_domain) DO UPDATE SET
                         account_name = excluded.account_name,
                         is_affiliate = excluded.is_affiliate,
                         updated_at = CURRENT_TIMESTAMP
-                ''', (sending_domain, account_name, is_affiliate))
-                imported += 1
-            except Exception as e:
-                print(f"Error importing {sending_domain}: {e}")
-                skipped += 1
+                ''', changes)
+                written = True
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for sending_domain, values in final.items():
+        if original[sending_domain] is None:
+            summary['inserted'] += 1
+        elif original[sending_domain] != values:
+            summary['updated'] += 1
+        else:
+            summary['unchanged'] += 1
+
+    if written:
+        bump_mapping_version()
+    return summary
+
+
+def init_search_index(cursor: sqlite3.Cursor):
+    """Create the trigram search index and its sync triggers (skipped if FTS5 is unavailable)"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,))
+    if cursor.fetchone():
+        return
+
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+                sending_domain, account_name,
+                content='domain_account_mapping', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Search index not available, falling back to LIKE search: {e}")
+        return
+
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS domain_account_mapping_ai AFTER INSERT ON domain_account_mapping BEGIN
+            INSERT INTO {SEARCH_TABLE} (rowid, sending_domain, account_name)
+            VALUES (new.id, new.sending_domain, new.account_name);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS domain_account_mapping_ad AFTER DELETE ON domain_account_mapping BEGIN
+            INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, sending_domain, account_name)
+            VALUES ('delete', old.id, old.sending_domain, old.account_name);
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS domain_account_mapping_au
+        AFTER UPDATE OF sending_domain, account_name ON domain_account_mapping BEGIN
+            INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, sending_domain, account_name)
+            VALUES ('delete', old.id, old.sending_domain, old.account_name);
+            INSERT INTO {SEARCH_TABLE} (rowid, sending_domain, account_name)
+            VALUES (new.id, new.sending_domain, new.account_name);
+        END
+    ''')
+
+    # Index rows that existed before the search table
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+    print("Account mapping search index created")
+
+
+def import_csv_to_database(csv_path: str = CSV_PATH) -> Tuple[int, int]:
+    """
+    Import CSV file into database
+    Returns: (rows_imported, rows_skipped)
+    """
+    if not os.path.exists(csv_path):
+        print(f"CSV file not found at {csv_path}")
+        return 0, 0
+
+    # Same accept rules and per-row counts as before the upload endpoint existed
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        summary = upsert_mappings_from_csv(f, validate_domains=False)
+
+    imported = summary['rows']
+    skipped = summary['invalid']
 
     print(f"CSV import complete: {imported} imported, {skipped} skipped")
     return imported, skipped
@@ -144,49 +434,92 @@ def export_database_to_csv(csv_path: str = CSV_PATH) -> int:
     return len(rows)
 
 
-def get_all_mappings(search: str = '', limit: int = 1000, offset: int = 0) -> Dict:
+def encode_page_cursor(row: Dict) -> str:
+    """Encode the (account_name, sending_domain) position of a row as an opaque cursor"""
+    key = json.dumps([row['account_name'], row['sending_domain']])
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii')
+
+
+def decode_page_cursor(cursor: str) -> Tuple[str, str]:
+    """Decode a page cursor back to (account_name, sending_domain)"""
+    try:
+        account_name, sending_domain = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return account_name, sending_domain
+    except (ValueError, TypeError):
+        raise ValueError('Invalid page cursor')
+
+
+def get_all_mappings(search: str = '', limit: int = 1000, offset: int = 0,
+                     cursor: Optional[str] = None, count: str = 'exact') -> Dict:
     """
     Get all mappings with optional search
-    Returns: dict with mappings and total count
+
+    Args:
+        search: Substring to match in sending_domain or account_name
+        limit: Page size
+        offset: Rows to skip (ignored when cursor is given)
+        cursor: next_cursor from the previous page (keyset pagination)
+        count: 'exact', 'estimate' (stops counting at COUNT_ESTIMATE_CAP) or 'none'
+
+    Returns: dict with mappings, total count and next_cursor
     """
+    if count not in ('exact', 'estimate', 'none'):
+        raise ValueError("count must be 'exact', 'estimate' or 'none'")
+
     conn = get_db_connection()
-    cursor = conn.cursor()
+    db_cursor = conn.cursor()
 
-    # Build search query
+    # Build the filtered row source
+    search = search.strip()
+    params: List = []
     if search:
-        search_pattern = f"%{search}%"
-        count_query = '''
-            SELECT COUNT(*) as count FROM domain_account_mapping
-            WHERE sending_domain LIKE ? OR account_name LIKE ?
-        '''
-        data_query = '''
-            SELECT * FROM domain_account_mapping
-            WHERE sending_domain LIKE ? OR account_name LIKE ?
-            ORDER BY account_name, sending_domain
-            LIMIT ? OFFSET ?
-        '''
-        cursor.execute(count_query, (search_pattern, search_pattern))
-        total = cursor.fetchone()['count']
-
-        cursor.execute(data_query, (search_pattern, search_pattern, limit, offset))
+        db_cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,))
+        if len(search) >= SEARCH_MIN_LENGTH and db_cursor.fetchone():
+            where = f'id IN (SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?)'
+            params.append('"' + search.replace('"', '""') + '"')
+        else:
+            search_pattern = f"%{search}%"
+            where = 'sending_domain LIKE ? OR account_name LIKE ?'
+            params.extend([search_pattern, search_pattern])
+        where = f'({where})'
     else:
-        cursor.execute('SELECT COUNT(*) as count FROM domain_account_mapping')
-        total = cursor.fetchone()['count']
-
-        cursor.execute('''
-            SELECT * FROM domain_account_mapping
-            ORDER BY account_name, sending_domain
-            LIMIT ? OFFSET ?
-        ''', (limit, offset))
+        where = '1'
+
+    # Total
+    total = None
+    if count == 'exact':
+        db_cursor.execute(f'SELECT COUNT(*) as count FROM domain_account_mapping WHERE {where}', params)
+        total = db_cursor.fetchone()['count']
+    elif count == 'estimate':
+        db_cursor.execute(
+            f'SELECT COUNT(*) as count FROM (SELECT 1 FROM domain_account_mapping WHERE {where} LIMIT ?)',
+            params + [COUNT_ESTIMATE_CAP]
+        )
+        total = db_cursor.fetchone()['count']
+
+    # Page
+    page_params = list(params)
+    if cursor:
+        where += ' AND (account_name, sending_domain) > (?, ?)'
+        page_params.extend(decode_page_cursor(cursor))
+        offset = 0
+    db_cursor.execute(f'''
+        SELECT * FROM domain_account_mapping
+        WHERE {where}
+        ORDER BY account_name, sending_domain
+        LIMIT ? OFFSET ?
+    ''', page_params + [limit, offset])
 
-    mappings = [dict(row) for row in cursor.fetchall()]
+    mappings = [dict(row) for row in db_cursor.fetchall()]
     conn.close()
 
     return {
         'mappings': mappings,
         'total': total,
+        'total_is_estimate': count == 'estimate' and total == COUNT_ESTIMATE_CAP,
         'limit': limit,
-        'offset': offset
+        'offset': offset,
+        'next_cursor': encode_page_cursor(mappings[-1]) if len(mappings) == limit else None
     }
 
 
@@ -203,36 +536,14 @@ def get_mapping_by_id(mapping_id: int) -> Optional[Dict]:
 
 
 def get_account_for_domain(domain: str) -> Optional[str]:
-    """Get account name for a given domain"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        'SELECT account_name FROM domain_account_mapping WHERE sending_domain = ?',
-        (domain.lower(),)
-    )
-    row = cursor.fetchone()
-    conn.close()
-
-    return row['account_name'] if row else None
+    """Get account name for a given domain (exact, wildcard or parent-domain match)"""
+    return resolve_account(domain)
 
 
 def get_affiliate_accounts() -> List[str]:
     """Get list of all account names where is_affiliate = 1"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        SELECT DISTINCT account_name
-        FROM domain_account_mapping
-        WHERE is_affiliate = 1
-        ORDER BY account_name
-    ''')
-
-    accounts = [row['account_name'] for row in cursor.fetchall()]
-    conn.close()
-
-    return accounts
+    get_domain_account_map()
+    return sorted(_mapping_cache['affiliates'])
 
 
 def get_domains_for_account(account_name: str) -> List[str]:
@@ -250,6 +561,27 @@ def get_domains_for_account(account_name: str) -> List[str]:
     return [row['sending_domain'] for row in rows]
 
 
+def get_domains_for_accounts(account_names: List[str]) -> Dict[str, List[str]]:
+    """Get the domains of several accounts with one query (accounts without mappings get [])"""
+    domains = {name: [] for name in account_names}
+    if not domains:
+        return domains
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    placeholders = ', '.join('?' for _ in domains)
+    cursor.execute(
+        f'SELECT account_name, sending_domain FROM domain_account_mapping WHERE account_name IN ({placeholders})',
+        list(domains)
+    )
+    for row in cursor.fetchall():
+        domains[row['account_name']].append(row['sending_domain'])
+    conn.close()
+
+    return domains
+
+
 def create_mapping(sending_domain: str, account_name: str, notes: str = '', is_affiliate: bool = False) -> Dict:
     """Create new domain-account mapping"""
     conn = get_db_connection()
@@ -267,6 +599,7 @@ def create_mapping(sending_domain: str, account_name: str, notes: str = '', is_a
 
         mapping_id = cursor.lastrowid
         conn.commit()
+        bump_mapping_version()
 
         # Fetch the created mapping
         cursor.execute('SELECT * FROM domain_account_mapping WHERE id = ?', (mapping_id,))
@@ -307,6 +640,7 @@ def update_mapping(mapping_id: int, sending_domain: str = None,
         ''', (new_domain, new_account, new_notes, new_is_affiliate, mapping_id))
 
         conn.commit()
+        bump_mapping_version()
 
         # Fetch updated mapping
         cursor.execute('SELECT * FROM domain_account_mapping WHERE id = ?', (mapping_id,))
@@ -329,6 +663,7 @@ def delete_mapping(mapping_id: int) -> bool:
 
     conn.commit()
     conn.close()
+    bump_mapping_version()
 
     return deleted
 
@@ -344,6 +679,7 @@ def bulk_delete_mappings(mapping_ids: List[int]) -> int:
 
     conn.commit()
     conn.close()
+    bump_mapping_version()
 
     return deleted
 
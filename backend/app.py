@@ -1,18 +1,55 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
 import io
-from typing import Dict, Optional, List
+import json
+from typing import Any, Dict, Optional, List
 
 from druid_service import (
     fetch_region_data,
     aggregate_data_by_esp,
+    build_esp_frames,
+    serialize_esp_frames,
     aggregate_region_summary,
     get_top10_overall
 )
-from export_service import export_to_excel, export_to_pdf
+from export_service import export_to_excel, stream_excel_export
+from export_job_service import (
+    JOB_STATUSES,
+    create_export_job,
+    get_job,
+    list_jobs,
+    get_job_archive,
+    delete_job,
+    shutdown_export_jobs
+)
+from bulk_export_service import (
+    BULK_SOURCES,
+    BULK_FORMATS,
+    bulk_export_available,
+    load_source_frame,
+    build_table,
+    stream_table
+)
+from artifact_cache_service import (
+    is_range_cacheable,
+    artifact_key,
+    get_artifact,
+    read_artifact,
+    put_artifact,
+    cache_stream,
+    get_artifact_cache_stats,
+    clear_artifact_cache
+)
+from pdf_render_service import (
+    RenderQueueFull,
+    RenderTimeout,
+    render_pdf,
+    get_render_stats,
+    shutdown_renderer
+)
 from config import DRUID_US_BROKER, DRUID_EU_BROKER
 from pulsation_service import (
     init_pulsation_database,
@@ -23,8 +60,24 @@ from pulsation_service import (
     cleanup_old_data,
     query_date_range,
     get_domain_timeseries,
+    get_domains_timeseries,
     get_available_dates
 )
+from pulsation_index_service import (
+    add_day_to_range_index,
+    prune_range_index,
+    query_range_totals,
+    get_range_index_status
+)
+from pulsation_trend_service import (
+    TREND_LEVELS,
+    anchor_month_for_range,
+    last_closed_month,
+    trailing_months,
+    get_trend_frame,
+    invalidate_trend_cache
+)
+from downsample_service import validate_max_points
 from datetime import timedelta
 import pandas as pd
 import csv
@@ -36,15 +89,19 @@ from account_mapping_service import (
     delete_mapping,
     bulk_delete_mappings,
     import_csv_to_database,
+    upsert_mappings_from_csv,
     export_database_to_csv,
-    get_account_statistics
+    get_account_statistics,
+    get_domains_for_account,
+    get_domains_for_accounts,
+    get_mapping_fingerprint
 )
 from account_aggregation_service import (
     add_account_column,
-    get_top_accounts_by_esp,
-    get_top_accounts_overall,
+    aggregate_account_views,
+    fetch_account_level_data,
     get_account_summary,
-    get_affiliate_accounts_data
+    get_account_summaries
 )
 from snds_service import (
     init_snds_database,
@@ -84,8 +141,10 @@ from gpt_analytics_service import (
     get_domain_detailed_metrics
 )
 from bounce_analytics_service import (
+    init_bounce_database,
     collect_all_esps,
     get_bounces,
+    get_bounce_fingerprint,
     get_sending_domains,
     cleanup_old_data as cleanup_bounce_data
 )
@@ -99,14 +158,19 @@ from industry_updates_service import (
 from mbr_storage_service import (
     check_report_exists,
     save_mbr_report,
-    get_report_by_id,
+    get_report_json,
+    find_servable_snapshot,
+    diff_reports,
+    get_report_sections,
+    list_report_sections,
     get_all_reports,
     delete_report,
     get_report_statistics
 )
 from mom_service import (
-    add_mom_to_domain_data,
-    add_mom_to_account_data
+    get_previous_period_metrics,
+    add_mom_column,
+    add_mom_to_esp_frames
 )
 from email_service import (
     get_all_recipients,
@@ -131,9 +195,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['X-Data-Source', 'X-Snapshot-Id', 'X-Snapshot-Created-At', 'X-Artifact-Cache', 'X-Row-Count'],
 )
 
 
+@app.on_event('startup')
+def init_local_stores():
+    # Runs the bounce_events partition migration once, not on every import
+    init_bounce_database()
+
+
+@app.on_event('shutdown')
+def stop_background_workers():
+    shutdown_export_jobs()
+    shutdown_renderer()
+
+
 class DateRange(BaseModel):
     from_date: str
     to_date: str
@@ -149,9 +226,39 @@ async def health_check():
     return {'status': 'healthy'}
 
 
+def snapshot_response(from_date: str, to_date: str, report_type: str) -> Optional[Response]:
+    """Answer from the latest settled snapshot for a closed range, None if there is none"""
+    # Account views depend on the domain -> account mapping they were attributed with
+    mapping = get_mapping_fingerprint() if report_type == 'account' else None
+    snapshot = find_servable_snapshot(from_date, to_date, report_type, mapping_fingerprint=mapping)
+    if not snapshot:
+        return None
+
+    report = get_report_json(snapshot['id'])
+    if not report:
+        return None
+
+    meta, report_json = report
+    return Response(
+        content=report_json,
+        media_type='application/json',
+        headers={
+            'X-Data-Source': 'snapshot',
+            'X-Snapshot-Id': str(meta['id']),
+            'X-Snapshot-Created-At': str(meta['created_at'])
+        }
+    )
+
+
 @app.post('/api/fetch-data')
-async def fetch_data(date_range: DateRange):
-    """Fetch deliverability data from Druid for the given date range"""
+async def fetch_data(date_range: DateRange, response: Response, use_snapshot: bool = True):
+    """
+    Fetch deliverability data from Druid for the given date range
+
+    Query params:
+        use_snapshot: Answer closed ranges from a settled saved report when one exists
+                      (the X-Data-Source header says which source was used)
+    """
     try:
         # Validate dates
         from_date = datetime.strptime(date_range.from_date, '%Y-%m-%d')
@@ -160,6 +267,12 @@ async def fetch_data(date_range: DateRange):
         if to_date <= from_date:
             raise HTTPException(status_code=400, detail='To Date must be after From Date')
 
+        if use_snapshot:
+            snapshot = snapshot_response(date_range.from_date, date_range.to_date, 'domain')
+            if snapshot:
+                return snapshot
+        response.headers['X-Data-Source'] = 'druid'
+
         # Fetch data from both regions
         df_us = fetch_region_data('US', DRUID_US_BROKER, date_range.from_date, date_range.to_date)
         df_eu = fetch_region_data('EU', DRUID_EU_BROKER, date_range.from_date, date_range.to_date)
@@ -167,14 +280,22 @@ async def fetch_data(date_range: DateRange):
         if df_us.empty and df_eu.empty:
             raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
 
-        # Aggregate data by ESP
-        esp_data, df_combined = aggregate_data_by_esp(df_us, df_eu)
+        # Previous period rows for MoM (Month-over-Month) Send change, merged into the frames
+        previous = get_previous_period_metrics(date_range.from_date, date_range.to_date, 'domain')
+
+        # Aggregate data by ESP, adding MoM to the frames before they are serialized
+        frames, df_combined = build_esp_frames(df_us, df_eu)
+        if previous is not None:
+            add_mom_to_esp_frames(frames, previous)
+        esp_data = serialize_esp_frames(frames)
 
         # Get overall summary
         overall_summary = aggregate_region_summary(df_combined[df_combined['Delivered'] > 0])
 
         # Get overall top 10
         top10_overall = get_top10_overall(df_combined)
+        if previous is not None:
+            top10_overall = add_mom_column(top10_overall, previous['domain'], ['From_domain'])
 
         # Build response data
         response_data = {
@@ -190,9 +311,6 @@ async def fetch_data(date_range: DateRange):
             'total_domains': len(df_combined['From_domain'].unique())
         }
 
-        # Add MoM (Month-over-Month) Send change calculations
-        response_data = add_mom_to_domain_data(response_data, date_range.from_date, date_range.to_date)
-
         return response_data
 
     except ValueError as e:
@@ -201,35 +319,127 @@ async def fetch_data(date_range: DateRange):
         raise HTTPException(status_code=500, detail=f'Error fetching data: {str(e)}')
 
 
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
 @app.post('/api/export/excel')
-async def export_excel(date_range: DateRange):
-    """Export data to Excel"""
+async def export_excel(date_range: DateRange, stream: bool = False):
+    """
+    Export data to Excel
+
+    Query params:
+        stream: Stream a constant-memory workbook that also has an All Domains sheet
+    """
     try:
+        filename = f"mbr_deliverability_report_{date_range.from_date}_to_{date_range.to_date}.xlsx"
+        kind = 'xlsx-stream' if stream else 'xlsx'
+        cache_key = None
+        if is_range_cacheable(date_range.to_date):
+            cache_key = artifact_key(kind, from_date=date_range.from_date, to_date=date_range.to_date)
+            cached_path = get_artifact(cache_key)
+            if cached_path is not None:
+                return FileResponse(
+                    cached_path,
+                    media_type=XLSX_MEDIA_TYPE,
+                    filename=filename,
+                    headers={'X-Artifact-Cache': 'hit'}
+                )
+
         # Fetch data (reuse logic from fetch_data)
         df_us = fetch_region_data('US', DRUID_US_BROKER, date_range.from_date, date_range.to_date)
         df_eu = fetch_region_data('EU', DRUID_EU_BROKER, date_range.from_date, date_range.to_date)
 
         if df_us.empty and df_eu.empty:
             raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
+        if df_us.empty or df_eu.empty:
+            # A broker error also comes back empty; never keep a one-region workbook for good
+            cache_key = None
 
         esp_data, df_combined = aggregate_data_by_esp(df_us, df_eu)
 
-        # Generate Excel file
-        excel_data = export_to_excel(esp_data, df_combined, date_range.from_date, date_range.to_date)
+        if stream:
+            # Rows are written and sent as the workbook is produced
+            content = stream_excel_export(esp_data, df_combined, date_range.from_date, date_range.to_date)
+            if cache_key:
+                content = cache_stream(cache_key, kind, content)
+        else:
+            # Generate Excel file
+            excel_data = export_to_excel(esp_data, df_combined, date_range.from_date, date_range.to_date)
+            if cache_key:
+                put_artifact(cache_key, kind, excel_data)
+            content = io.BytesIO(excel_data)
 
         # Return as downloadable file
-        filename = f"mbr_deliverability_report_{date_range.from_date}_to_{date_range.to_date}.xlsx"
-
         return StreamingResponse(
-            io.BytesIO(excel_data),
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
+            content,
+            media_type=XLSX_MEDIA_TYPE,
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Artifact-Cache': 'miss' if cache_key else 'bypass'
+            }
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error generating Excel: {str(e)}')
 
 
+async def build_report_pdf(from_date: str, to_date: str):
+    """
+    Render the MBR PDF with domain and account data, from the artifact cache when possible
+
+    Returns:
+        (pdf bytes, cache status 'hit' / 'miss' / 'bypass')
+    """
+    cache_key = None
+    if is_range_cacheable(to_date):
+        # Account sections depend on the domain -> account mapping
+        cache_key = artifact_key('pdf', from_date=from_date, to_date=to_date,
+                                 mapping=get_mapping_fingerprint())
+        cached = read_artifact(cache_key)
+        if cached is not None:
+            return cached, 'hit'
+
+    # Fetch data
+    df_us = fetch_region_data('US', DRUID_US_BROKER, from_date, to_date)
+    df_eu = fetch_region_data('EU', DRUID_EU_BROKER, from_date, to_date)
+
+    if df_us.empty and df_eu.empty:
+        raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
+    if df_us.empty or df_eu.empty:
+        # A broker error also comes back empty; never keep a one-region PDF for good
+        cache_key = None
+
+    # Get domain-level data
+    esp_data, df_combined = aggregate_data_by_esp(df_us, df_eu)
+
+    # Get account-level data
+    df_combined_with_accounts = pd.concat([df_us, df_eu], ignore_index=True)
+    df_combined_with_accounts = add_account_column(df_combined_with_accounts)
+
+    # Get top accounts and affiliate accounts from one grouping pass
+    account_views = aggregate_account_views(df_combined_with_accounts, top_n=10)
+    top_accounts_by_esp = account_views['top_accounts_by_esp']
+    top_accounts_overall = account_views['top_accounts_overall']
+    affiliate_accounts = account_views['affiliate_accounts']
+
+    # Build account data structure
+    account_data = {
+        'esp_data': {esp: {'top10_accounts': accounts} for esp, accounts in top_accounts_by_esp.items()},
+        'top10_accounts_overall': top_accounts_overall,
+        'affiliate_accounts': affiliate_accounts,
+    }
+
+    # Generate PDF file with both domain and account data
+    pdf_data = await render_pdf(esp_data, df_combined, from_date, to_date, account_data)
+
+    if cache_key:
+        put_artifact(cache_key, 'pdf', pdf_data)
+        return pdf_data, 'miss'
+    return pdf_data, 'bypass'
+
+
 @app.post('/api/export/pdf')
 async def export_pdf(date_range: DateRange):
     """Export data to PDF with both domain and account level data"""
@@ -238,48 +448,222 @@ async def export_pdf(date_range: DateRange):
         from_date = datetime.strptime(date_range.from_date, '%Y-%m-%d')
         to_date = datetime.strptime(date_range.to_date, '%Y-%m-%d')
 
-        # Fetch data
-        df_us = fetch_region_data('US', DRUID_US_BROKER, date_range.from_date, date_range.to_date)
-        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, date_range.from_date, date_range.to_date)
+        pdf_data, cache_status = await build_report_pdf(date_range.from_date, date_range.to_date)
 
-        if df_us.empty and df_eu.empty:
-            raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
+        # Return as downloadable file
+        filename = f"mbr_deliverability_report_{date_range.from_date}_to_{date_range.to_date}.pdf"
 
-        # Get domain-level data
-        esp_data, df_combined = aggregate_data_by_esp(df_us, df_eu)
+        return StreamingResponse(
+            io.BytesIO(pdf_data),
+            media_type='application/pdf',
+            headers={'Content-Disposition': f'attachment; filename={filename}', 'X-Artifact-Cache': cache_status}
+        )
 
-        # Get account-level data
-        df_combined_with_accounts = pd.concat([df_us, df_eu], ignore_index=True)
-        df_combined_with_accounts = add_account_column(df_combined_with_accounts)
+    except HTTPException:
+        raise
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error generating PDF: {str(e)}')
 
-        # Get top accounts
-        top_accounts_by_esp = get_top_accounts_by_esp(df_combined_with_accounts, top_n=10)
-        top_accounts_overall = get_top_accounts_overall(df_combined_with_accounts, top_n=10)
 
-        # Get affiliate accounts data
-        affiliate_accounts = get_affiliate_accounts_data(df_combined_with_accounts)
+class ExportJobRequest(BaseModel):
+    from_date: str
+    to_date: str
+    accounts: Optional[List[str]] = None    # None with all_affiliates=True for every affiliate
+    all_affiliates: bool = False
+
 
-        # Build account data structure
-        account_data = {
-            'esp_data': {esp: {'top10_accounts': accounts} for esp, accounts in top_accounts_by_esp.items()},
-            'top10_accounts_overall': top_accounts_overall,
-            'affiliate_accounts': affiliate_accounts,
+@app.post('/api/export/jobs')
+async def create_account_export_job(request: ExportJobRequest):
+    """
+    Start a background job rendering one PDF per account into a ZIP
+
+    Poll GET /api/export/jobs/{job_id} for progress and download the ZIP from
+    /api/export/jobs/{job_id}/download once the job is completed.
+    """
+    try:
+        if request.all_affiliates == bool(request.accounts):
+            raise HTTPException(status_code=400, detail='Provide either accounts or all_affiliates')
+
+        job = create_export_job(
+            request.from_date,
+            request.to_date,
+            None if request.all_affiliates else request.accounts
+        )
+        return {
+            'status': 'success',
+            'job': job
         }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error creating export job: {str(e)}')
 
-        # Generate PDF file with both domain and account data
-        pdf_data = export_to_pdf(esp_data, df_combined, date_range.from_date, date_range.to_date, account_data)
 
-        # Return as downloadable file
-        filename = f"mbr_deliverability_report_{date_range.from_date}_to_{date_range.to_date}.pdf"
+@app.get('/api/export/jobs')
+async def list_account_export_jobs(status: Optional[str] = None):
+    """List export jobs, newest first (optionally only one status)"""
+    try:
+        if status is not None and status not in JOB_STATUSES:
+            raise HTTPException(status_code=400, detail=f'Invalid status. Must be one of: {list(JOB_STATUSES)}')
 
+        jobs = [job for job in list_jobs() if status is None or job['status'] == status]
+        return {
+            'status': 'success',
+            'count': len(jobs),
+            'jobs': jobs
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error listing export jobs: {str(e)}')
+
+
+@app.get('/api/export/jobs/{job_id}')
+async def get_account_export_job(job_id: str):
+    """Status and progress of an export job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Export job not found')
+    return {
+        'status': 'success',
+        'job': job
+    }
+
+
+@app.get('/api/export/jobs/{job_id}/download')
+async def download_account_export_job(job_id: str):
+    """Download the ZIP of a completed export job"""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail='Export job not found')
+
+    archive = get_job_archive(job_id)
+    if not archive:
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}, not completed")
+
+    filename = f"account_reports_{job['from_date']}_to_{job['to_date']}.zip"
+    return FileResponse(archive, media_type='application/zip', filename=filename)
+
+
+@app.delete('/api/export/jobs/{job_id}')
+async def delete_account_export_job(job_id: str):
+    """Delete a finished export job and its ZIP"""
+    try:
+        if not delete_job(job_id):
+            raise HTTPException(status_code=404, detail='Export job not found')
+        return {
+            'status': 'success',
+            'message': 'Export job deleted'
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error deleting export job: {str(e)}')
+
+
+class BulkFilter(BaseModel):
+    column: str
+    op: str             # ==, !=, >, >=, <, <= or in
+    value: Any
+
+
+class BulkExportRequest(BaseModel):
+    source: str = 'mbr'                     # mbr, pulsation or bounces
+    from_date: str
+    to_date: str                            # exclusive
+    format: str = 'parquet'                 # parquet or arrow (IPC stream)
+    columns: Optional[List[str]] = None
+    filters: Optional[List[BulkFilter]] = None
+
+
+@app.post('/api/export/bulk')
+async def export_bulk(request: BulkExportRequest):
+    """
+    Typed bulk extract as Parquet or Arrow IPC, streamed in record batches
+
+    Filters are ANDed and applied before the column projection, so they may use
+    columns that are not returned. X-Row-Count has the number of rows sent.
+    """
+    try:
+        if not bulk_export_available():
+            raise HTTPException(status_code=501, detail='Bulk export needs the pyarrow package')
+        if request.source not in BULK_SOURCES:
+            raise HTTPException(status_code=400, detail=f'Invalid source. Must be one of: {list(BULK_SOURCES)}')
+        if request.format not in BULK_FORMATS:
+            raise HTTPException(status_code=400, detail=f'Invalid format. Must be one of: {list(BULK_FORMATS)}')
+
+        datetime.strptime(request.from_date, '%Y-%m-%d')
+        datetime.strptime(request.to_date, '%Y-%m-%d')
+
+        df = load_source_frame(request.source, request.from_date, request.to_date)
+        if df.columns.empty:
+            raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
+
+        table = build_table(
+            df,
+            request.columns,
+            [f.model_dump() for f in request.filters] if request.filters else None
+        )
+
+        extension = BULK_FORMATS[request.format]['extension']
+        filename = f"{request.source}_{request.from_date}_to_{request.to_date}.{extension}"
         return StreamingResponse(
-            io.BytesIO(pdf_data),
-            media_type='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
+            stream_table(table, request.format),
+            media_type=BULK_FORMATS[request.format]['media_type'],
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Row-Count': str(table.num_rows)
+            }
         )
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f'Error generating PDF: {str(e)}')
+        raise HTTPException(status_code=500, detail=f'Error generating bulk export: {str(e)}')
+
+
+@app.get('/api/export/cache/stats')
+async def export_cache_stats():
+    """Size and hit counts of the export artifact cache"""
+    try:
+        return {
+            'status': 'success',
+            'cache': get_artifact_cache_stats()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error reading export cache: {str(e)}')
+
+
+@app.delete('/api/export/cache')
+async def clear_export_cache():
+    """Remove all cached export artifacts"""
+    try:
+        removed = clear_artifact_cache()
+        return {
+            'status': 'success',
+            'message': f'Removed {removed} cached artifacts'
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error clearing export cache: {str(e)}')
+
+
+@app.get('/api/export/pdf/stats')
+async def pdf_render_stats():
+    """Queue depth and counters of the PDF render pool"""
+    return {
+        'status': 'success',
+        'renderer': get_render_stats()
+    }
 
 
 # -------------------------
@@ -326,9 +710,12 @@ async def collect_yesterday_data():
 
         # Insert into database
         insert_daily_data(df_yesterday, yesterday_str)
+        add_day_to_range_index(df_yesterday, yesterday_str)
+        invalidate_trend_cache(yesterday_str)
 
         # Cleanup old data
         cleanup_old_data()
+        prune_range_index()
 
         return {
             'status': 'success',
@@ -368,9 +755,12 @@ async def collect_custom_date(date: str = Query(...)):
 
         # Insert into database
         insert_daily_data(df_target, target_date_str)
+        add_day_to_range_index(df_target, target_date_str)
+        invalidate_trend_cache(target_date_str)
 
         # Cleanup old data
         cleanup_old_data()
+        prune_range_index()
 
         return {
             'status': 'success',
@@ -449,10 +839,11 @@ async def query_pulsation_data(view: PulsationViewType):
 
 
 @app.get('/api/pulsation/domain-timeseries/{domain}')
-async def get_domain_chart_data(domain: str, days: int = 30):
-    """Get time-series data for a specific domain"""
+async def get_domain_chart_data(domain: str, days: int = 30, max_points: Optional[int] = None):
+    """Get time-series data for a specific domain (max_points: optional LTTB downsampling)"""
     try:
-        df = get_domain_timeseries(domain, days)
+        validate_max_points(max_points)
+        df = get_domain_timeseries(domain, days, max_points)
 
         if df.empty:
             return {
@@ -474,10 +865,142 @@ async def get_domain_chart_data(domain: str, days: int = 30):
             }
         }
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error fetching timeseries: {str(e)}')
+
+
+class PulsationTimeseriesBatch(BaseModel):
+    domains: Optional[List[str]] = None
+    top_n: Optional[int] = None  # top N domains by sent volume (used instead of domains)
+    days: int = 30
+    max_points: Optional[int] = None  # LTTB-downsample the date axis
+
+
+@app.post('/api/pulsation/domains-timeseries')
+async def get_domains_chart_data(request: PulsationTimeseriesBatch):
+    """Get aligned time-series data for several domains in one request"""
+    try:
+        if request.top_n is None and not request.domains:
+            raise HTTPException(status_code=400, detail='Provide domains or top_n')
+        if request.top_n is not None and request.top_n <= 0:
+            raise HTTPException(status_code=400, detail='top_n must be positive')
+        validate_max_points(request.max_points)
+
+        result = get_domains_timeseries(request.domains, request.days, request.top_n, request.max_points)
+
+        return {
+            'status': 'success' if result['domains'] else 'no_data',
+            'days': request.days,
+            'total': len(result['domains']),
+            'data': result
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error fetching timeseries: {str(e)}')
 
 
+class PulsationTrendQuery(BaseModel):
+    level: str = 'domain'  # 'domain' or 'account'
+    month: Optional[str] = None  # anchor month YYYY-MM (defaults to last closed month)
+    to_date: Optional[str] = None  # or anchor on the month a range ends in (exclusive end)
+    metric: str = 'sent'
+    names: Optional[List[str]] = None  # domains/accounts to include, None for all
+    top_n: Optional[int] = None  # top N by current month volume
+
+
+@app.post('/api/pulsation/trends')
+async def get_pulsation_trends(request: PulsationTrendQuery):
+    """Get MoM, QoQ, YoY and trailing-12-month trends per domain or account"""
+    try:
+        if request.level not in TREND_LEVELS:
+            raise HTTPException(status_code=400, detail='Invalid level. Must be domain or account')
+        if request.top_n is not None and request.top_n <= 0:
+            raise HTTPException(status_code=400, detail='top_n must be positive')
+
+        month = request.month
+        if month is None:
+            month = anchor_month_for_range(request.to_date) if request.to_date else last_closed_month()
+
+        df = get_trend_frame(request.level, month, request.metric, request.names)
+        if request.top_n is not None:
+            df = df.head(request.top_n)
+
+        return {
+            'status': 'success' if not df.empty else 'no_data',
+            'level': request.level,
+            'metric': request.metric,
+            'month': month,
+            'months': trailing_months(month),
+            'total': len(df),
+            'data': df.to_dict('records')
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error computing trends: {str(e)}')
+
+
+class PulsationRangeQuery(BaseModel):
+    start_date: str
+    end_date: str  # exclusive
+    domains: Optional[List[str]] = None  # None for all domains
+    group_by: Optional[str] = 'esp'  # 'esp' or 'domain'
+
+
+@app.post('/api/pulsation/range-query')
+async def query_pulsation_range(request: PulsationRangeQuery):
+    """Sum Pulsation volumes and rates for any day range from the in-memory range index"""
+    try:
+        start_date = datetime.strptime(request.start_date, '%Y-%m-%d')
+        end_date = datetime.strptime(request.end_date, '%Y-%m-%d')
+
+        if end_date <= start_date:
+            raise HTTPException(status_code=400, detail='end_date must be after start_date')
+        if request.group_by not in ('esp', 'domain'):
+            raise HTTPException(status_code=400, detail='Invalid group_by. Must be esp or domain')
+
+        df = query_range_totals(start_date, end_date, request.domains, request.group_by)
+
+        return {
+            'status': 'success' if not df.empty else 'no_data',
+            'date_range': {
+                'start': request.start_date,
+                'end': request.end_date
+            },
+            'group_by': request.group_by,
+            'total': len(df),
+            'data': df.to_dict('records')
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=f'Invalid date format. Use YYYY-MM-DD: {str(ve)}')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error querying range: {str(e)}')
+
+
+@app.get('/api/pulsation/range-index/status')
+async def get_pulsation_range_index_status():
+    """Get status of the in-memory Pulsation range index"""
+    try:
+        return {
+            'status': 'success',
+            **get_range_index_status()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error fetching index status: {str(e)}')
+
+
 @app.get('/api/pulsation/available-dates')
 async def get_pulsation_dates():
     """Get list of dates with available data"""
@@ -528,14 +1051,24 @@ async def get_mapping_statistics():
 
 
 @app.get('/api/account-mappings')
-async def get_mappings(search: str = '', limit: int = 1000, offset: int = 0):
-    """Get all account mappings with optional search"""
+async def get_mappings(search: str = '', limit: int = 1000, offset: int = 0,
+                       cursor: Optional[str] = None, count: str = 'exact'):
+    """
+    Get all account mappings with optional search
+
+    Query params:
+        search: Substring match on domain or account (trigram index)
+        cursor: next_cursor from the previous page (keyset pagination instead of offset)
+        count: 'exact', 'estimate' (capped count) or 'none'
+    """
     try:
-        result = get_all_mappings(search, limit, offset)
+        result = get_all_mappings(search, limit, offset, cursor, count)
         return {
             'status': 'success',
             **result
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error fetching mappings: {str(e)}')
 
@@ -646,6 +1179,35 @@ async def import_csv():
         raise HTTPException(status_code=500, detail=f'Error importing CSV: {str(e)}')
 
 
+@app.post('/api/account-mappings/upload-csv')
+async def upload_csv(file: UploadFile = File(...)):
+    """
+    Upload a mapping CSV (sending_domain, account_name, is_affiliate) and upsert it
+
+    The file is parsed as a stream and written in batches; the response
+    summarizes inserted, updated, unchanged and invalid rows.
+    """
+    try:
+        lines = io.TextIOWrapper(file.file, encoding='utf-8-sig', newline='')
+        summary = upsert_mappings_from_csv(lines)
+        return {
+            'status': 'success',
+            'message': (
+                f"Upload complete: {summary['inserted']} inserted, {summary['updated']} updated, "
+                f"{summary['unchanged']} unchanged, {summary['invalid']} invalid"
+            ),
+            **summary
+        }
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail='CSV must be UTF-8 encoded')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error uploading CSV: {str(e)}')
+    finally:
+        await file.close()
+
+
 @app.get('/api/account-mappings/export-csv')
 async def export_csv():
     """Export database to CSV file"""
@@ -665,8 +1227,16 @@ async def export_csv():
 # -------------------------
 
 @app.post('/api/fetch-data-by-account')
-async def fetch_data_by_account(date_range: DateRange):
-    """Fetch deliverability data aggregated by account"""
+async def fetch_data_by_account(date_range: DateRange, response: Response,
+                                pushdown: bool = True, use_snapshot: bool = True):
+    """
+    Fetch deliverability data aggregated by account
+
+    Query params:
+        pushdown: Group by account inside Druid using the inline mapping (falls back to
+                  local aggregation when the mapping is too large)
+        use_snapshot: Answer closed ranges from a settled saved report when one exists
+    """
     try:
         # Validate dates
         from_date = datetime.strptime(date_range.from_date, '%Y-%m-%d')
@@ -675,25 +1245,31 @@ async def fetch_data_by_account(date_range: DateRange):
         if to_date <= from_date:
             raise HTTPException(status_code=400, detail='To Date must be after From Date')
 
-        # Fetch data from both regions
-        df_us = fetch_region_data('US', DRUID_US_BROKER, date_range.from_date, date_range.to_date)
-        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, date_range.from_date, date_range.to_date)
-
-        if df_us.empty and df_eu.empty:
-            raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
+        if use_snapshot:
+            snapshot = snapshot_response(date_range.from_date, date_range.to_date, 'account')
+            if snapshot:
+                return snapshot
+        response.headers['X-Data-Source'] = 'druid'
 
-        # Combine and add account column
-        df_combined = pd.concat([df_us, df_eu], ignore_index=True)
-        df_combined = add_account_column(df_combined)
+        # Fetch data from both regions, tagged with accounts
+        df_combined, execution = fetch_account_level_data(date_range.from_date, date_range.to_date, pushdown)
 
-        # Get top accounts by ESP
-        top_accounts_by_esp = get_top_accounts_by_esp(df_combined, top_n=10)
+        if df_combined.empty:
+            raise HTTPException(status_code=404, detail='No data found - Make sure you are connected to Prod VPN')
 
-        # Get overall top 10 accounts
-        top_accounts_overall = get_top_accounts_overall(df_combined, top_n=10)
+        # Previous period rows for MoM (Month-over-Month) Send change, merged into every account row
+        previous = get_previous_period_metrics(date_range.from_date, date_range.to_date, 'account')
 
-        # Get affiliate accounts data
-        affiliate_accounts = get_affiliate_accounts_data(df_combined)
+        # Get top accounts by ESP, overall top 10 and affiliate accounts from one grouping pass
+        account_views = aggregate_account_views(
+            df_combined, top_n=10,
+            previous=previous['account'] if previous is not None else None,
+            include_all=True
+        )
+        top_accounts_by_esp = account_views['top_accounts_by_esp']
+        top_accounts_overall = account_views['top_accounts_overall']
+        affiliate_accounts = account_views['affiliate_accounts']
+        all_accounts_by_esp = account_views['all_accounts_by_esp']
 
         # Build response data
         response_data = {
@@ -704,15 +1280,16 @@ async def fetch_data_by_account(date_range: DateRange):
                 'duration_days': (to_date - from_date).days
             },
             'esp_data': {esp: {'top10_accounts': accounts} for esp, accounts in top_accounts_by_esp.items()},
+            # Every account per ESP (MoM baseline for later reports), kept out of esp_data
+            # so the top_accounts_by_esp alias below does not repeat it
+            'all_accounts_by_esp': all_accounts_by_esp,
             'top10_accounts_overall': top_accounts_overall,
             'affiliate_accounts': affiliate_accounts,
             'total_accounts': len(df_combined['Account'].unique()),
-            'unmapped_domains': int((df_combined['Account'] == 'Unmapped').sum())
+            'unmapped_domains': int((df_combined['Account'] == 'Unmapped').sum()),
+            'execution': execution
         }
 
-        # Add MoM (Month-over-Month) Send change calculations
-        response_data = add_mom_to_account_data(response_data, date_range.from_date, date_range.to_date)
-
         # Extract top_accounts_by_esp from response for backward compatibility
         response_data['top_accounts_by_esp'] = response_data['esp_data']
 
@@ -732,9 +1309,16 @@ async def get_account_details(account_name: str, from_date: str, to_date: str):
         datetime.strptime(from_date, '%Y-%m-%d')
         datetime.strptime(to_date, '%Y-%m-%d')
 
-        # Fetch data
-        df_us = fetch_region_data('US', DRUID_US_BROKER, from_date, to_date)
-        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, from_date, to_date)
+        # Only fetch the account's own domains from Druid
+        domains = get_domains_for_account(account_name)
+        if not domains:
+            return {
+                'status': 'success',
+                'error': f'No data found for account: {account_name}'
+            }
+
+        df_us = fetch_region_data('US', DRUID_US_BROKER, from_date, to_date, domains=domains)
+        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, from_date, to_date, domains=domains)
 
         df_combined = pd.concat([df_us, df_eu], ignore_index=True)
         df_combined = add_account_column(df_combined)
@@ -750,6 +1334,55 @@ async def get_account_details(account_name: str, from_date: str, to_date: str):
         raise HTTPException(status_code=500, detail=f'Error fetching account summary: {str(e)}')
 
 
+class AccountSummaryBatch(BaseModel):
+    account_names: List[str]
+    from_date: str
+    to_date: str
+
+
+@app.post('/api/account-summaries')
+async def get_account_summaries_batch(request: AccountSummaryBatch):
+    """Get summaries for several accounts from one fetch of both regions"""
+    try:
+        # Validate dates
+        datetime.strptime(request.from_date, '%Y-%m-%d')
+        datetime.strptime(request.to_date, '%Y-%m-%d')
+
+        account_names = list(dict.fromkeys(name.strip() for name in request.account_names if name.strip()))
+        if not account_names:
+            raise HTTPException(status_code=400, detail='No account names provided')
+
+        # Fetch only the requested accounts' domains, once per region
+        account_domains = get_domains_for_accounts(account_names)
+        domains = sorted({d for names in account_domains.values() for d in names})
+
+        if domains:
+            df_us = fetch_region_data('US', DRUID_US_BROKER, request.from_date, request.to_date, domains=domains)
+            df_eu = fetch_region_data('EU', DRUID_EU_BROKER, request.from_date, request.to_date, domains=domains)
+            df_combined = add_account_column(pd.concat([df_us, df_eu], ignore_index=True))
+        else:
+            df_combined = pd.DataFrame()
+
+        summaries = get_account_summaries(df_combined, account_names)
+
+        return {
+            'status': 'success',
+            'date_range': {
+                'from_date': request.from_date,
+                'to_date': request.to_date
+            },
+            'accounts': summaries,
+            'unmapped_accounts': [name for name, names in account_domains.items() if not names]
+        }
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f'Invalid date format: {str(e)}')
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error fetching account summaries: {str(e)}')
+
+
 # -------------------------
 # MBR Report Storage Endpoints
 # -------------------------
@@ -785,7 +1418,8 @@ async def save_report(request: SaveReportRequest):
             request.to_date,
             request.report_type,
             request.report_data,
-            request.overwrite
+            request.overwrite,
+            mapping_fingerprint=get_mapping_fingerprint() if request.report_type == 'account' else None
         )
         return result
     except Exception as e:
@@ -810,17 +1444,90 @@ async def list_reports(report_type: Optional[str] = None, limit: int = 50):
 async def get_saved_report(report_id: int):
     """Get a specific saved report with full data"""
     try:
-        report = get_report_by_id(report_id)
+        report = get_report_json(report_id)
         if not report:
             raise HTTPException(status_code=404, detail='Report not found')
+
+        # The stored JSON is decompressed and passed through as-is instead of being
+        # parsed into Python objects and encoded again
+        meta, report_json = report
+        body = '{"status":"success","report":' + json.dumps(meta)[:-1] + ',"report_data":' + report_json + '}}'
+        return Response(content=body, media_type='application/json')
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error fetching report: {str(e)}')
+
+
+@app.get('/api/mbr/reports/{report_id}/sections')
+async def get_saved_report_sections(report_id: int, path: Optional[List[str]] = Query(None)):
+    """
+    Get only some parts of a saved report
+
+    Query params:
+        path: Dotted section or JSON path, repeatable (e.g. overall_summary,
+              esp_data.Sparkpost.top10_domains). Without path, lists the sections.
+    """
+    try:
+        if not path:
+            sections = list_report_sections(report_id)
+            if not sections and get_report_sections(report_id, []) is None:
+                raise HTTPException(status_code=404, detail='Report not found')
+            return {
+                'status': 'success',
+                'report_id': report_id,
+                'sections': sections
+            }
+
+        result = get_report_sections(report_id, path)
+        if not result:
+            raise HTTPException(status_code=404, detail='Report not found')
+
+        # Section JSON is passed through without being parsed and re-encoded
+        meta, found, missing = result
+        sections = '{' + ','.join(f'{json.dumps(p)}:{text}' for p, text in found.items()) + '}'
+        body = (
+            '{"status":"success","report":' + json.dumps(meta) +
+            ',"sections":' + sections + ',"missing":' + json.dumps(missing) + '}'
+        )
+        return Response(content=body, media_type='application/json')
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f'Error fetching report sections: {str(e)}')
+
+
+@app.get('/api/mbr/reports/{base_id}/diff/{compare_id}')
+async def diff_saved_reports(base_id: int, compare_id: int, threshold: float = 5.0,
+                             level: Optional[str] = None, min_sent: int = 0):
+    """
+    Compare two saved reports (e.g. two snapshots of the same month)
+
+    Query params:
+        threshold: Minimum percent change of any metric for an entity to be listed
+        level: 'domain', 'account' or 'esp' (defaults to the reports' type)
+        min_sent: Ignore entities sending less than this in both reports
+    """
+    try:
+        if level is not None and level not in ('domain', 'account', 'esp'):
+            raise HTTPException(status_code=400, detail='Invalid level. Must be domain, account or esp')
+        if threshold < 0:
+            raise HTTPException(status_code=400, detail='threshold must not be negative')
+
+        diff = diff_reports(base_id, compare_id, threshold, level, min_sent)
+        if diff is None:
+            raise HTTPException(status_code=404, detail='Report not found')
+
         return {
             'status': 'success',
-            'report': report
+            **diff
         }
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f'Error fetching report: {str(e)}')
+        raise HTTPException(status_code=500, detail=f'Error comparing reports: {str(e)}')
 
 
 @app.delete('/api/mbr/reports/{report_id}')
@@ -989,34 +1696,8 @@ async def send_report_via_email(request: SendEmailRequest):
         from_date = datetime.strptime(request.from_date, '%Y-%m-%d')
         to_date = datetime.strptime(request.to_date, '%Y-%m-%d')
 
-        # Fetch data
-        df_us = fetch_region_data('US', DRUID_US_BROKER, request.from_date, request.to_date)
-        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, request.from_date, request.to_date)
-
-        if df_us.empty and df_eu.empty:
-            raise HTTPException(status_code=404, detail='No data found for the selected date range')
-
-        # Get domain-level data
-        esp_data, df_combined = aggregate_data_by_esp(df_us, df_eu)
-
-        # Get account-level data
-        df_combined_with_accounts = pd.concat([df_us, df_eu], ignore_index=True)
-        df_combined_with_accounts = add_account_column(df_combined_with_accounts)
-
-        top_accounts_by_esp = get_top_accounts_by_esp(df_combined_with_accounts, top_n=10)
-        top_accounts_overall = get_top_accounts_overall(df_combined_with_accounts, top_n=10)
-
-        # Get affiliate accounts data
-        affiliate_accounts = get_affiliate_accounts_data(df_combined_with_accounts)
-
-        account_data = {
-            'esp_data': {esp: {'top10_accounts': accounts} for esp, accounts in top_accounts_by_esp.items()},
-            'top10_accounts_overall': top_accounts_overall,
-            'affiliate_accounts': affiliate_accounts,
-        }
-
-        # Generate PDF
-        pdf_data = export_to_pdf(esp_data, df_combined, request.from_date, request.to_date, account_data)
+        # Generate PDF (cached for settled ranges)
+        pdf_data, _ = await build_report_pdf(request.from_date, request.to_date)
         pdf_filename = f"mbr_deliverability_report_{request.from_date}_to_{request.to_date}.pdf"
 
         # Send email
@@ -1038,6 +1719,10 @@ async def send_report_via_email(request: SendEmailRequest):
         raise HTTPException(status_code=400, detail=f'Invalid date format: {str(e)}')
     except HTTPException:
         raise
+    except RenderQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RenderTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"Exception in send_report_via_email: {str(e)}")
         import traceback
@@ -1127,33 +1812,43 @@ async def get_snds_data_endpoint(
 
 
 @app.get('/api/snds/reputation-trends')
-async def get_snds_reputation_trends_endpoint(period: str = '30day', group_by: str = 'ip'):
+async def get_snds_reputation_trends_endpoint(period: str = '30day', group_by: str = 'ip',
+                                               max_points: Optional[int] = None):
     """
     Get reputation trends over time
 
     Query params:
         period: Time period
         group_by: Group by 'ip' or 'account'
+        max_points: Downsample each series to at most this many points (LTTB)
     """
     try:
-        result = get_reputation_trends(period, group_by)
+        validate_max_points(max_points)
+        result = get_reputation_trends(period, group_by, max_points)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error fetching reputation trends: {str(e)}')
 
 
 @app.get('/api/snds/traffic-trends')
-async def get_snds_traffic_trends_endpoint(period: str = '30day', group_by: str = 'ip'):
+async def get_snds_traffic_trends_endpoint(period: str = '30day', group_by: str = 'ip',
+                                            max_points: Optional[int] = None):
     """
     Get traffic volume trends over time
 
     Query params:
         period: Time period
         group_by: Group by 'ip' or 'account'
+        max_points: Downsample each series to at most this many points (LTTB)
     """
     try:
-        result = get_traffic_trends(period, group_by)
+        validate_max_points(max_points)
+        result = get_traffic_trends(period, group_by, max_points)
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error fetching traffic trends: {str(e)}')
 
@@ -1462,7 +2157,7 @@ async def get_gpt_enhanced_changes_endpoint():
 
 
 @app.get('/api/gpt/domain-details')
-async def get_gpt_domain_details_endpoint(domain: str, period: str = '30day'):
+async def get_gpt_domain_details_endpoint(domain: str, period: str = '30day', max_points: Optional[int] = None):
     """
     Get detailed metrics for a specific domain
     Used for detailed domain view
@@ -1470,6 +2165,7 @@ async def get_gpt_domain_details_endpoint(domain: str, period: str = '30day'):
     Query params:
         domain: Domain name (required)
         period: 7day, 30day, 60day, 90day, 120day, 180day, 365day (default: 30day)
+        max_points: Downsample the trends to at most this many points (LTTB)
     """
     try:
         period_map = {
@@ -1484,7 +2180,8 @@ async def get_gpt_domain_details_endpoint(domain: str, period: str = '30day'):
         }
         days = period_map.get(period, 30)
 
-        details = get_domain_detailed_metrics(domain, days)
+        validate_max_points(max_points)
+        details = get_domain_detailed_metrics(domain, days, max_points)
 
         if not details:
             raise HTTPException(status_code=404, detail=f'No data found for domain: {domain}')
@@ -1492,6 +2189,8 @@ async def get_gpt_domain_details_endpoint(domain: str, period: str = '30day'):
         return details
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'Error fetching domain details: {str(e)}')
 
@@ -1619,6 +2318,26 @@ async def export_bounces_csv_endpoint(
         if esp not in valid_esps:
             raise HTTPException(status_code=400, detail=f'Invalid ESP. Must be one of: {valid_esps}')
 
+        # Create filename
+        domain_suffix = f"_{sending_domain}" if sending_domain and sending_domain != 'all' else ''
+        filename = f"bounces_{esp.lower()}_{start_date}_{end_date}{domain_suffix}.csv"
+
+        # end_date is inclusive here
+        cache_key = None
+        next_day = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        if is_range_cacheable(next_day):
+            cache_key = artifact_key('csv', export='bounces', esp=esp, start_date=start_date,
+                                     end_date=end_date, sending_domain=sending_domain,
+                                     data=get_bounce_fingerprint(start_date, end_date))
+            cached_path = get_artifact(cache_key)
+            if cached_path is not None:
+                return FileResponse(
+                    cached_path,
+                    media_type='text/csv',
+                    filename=filename,
+                    headers={'X-Artifact-Cache': 'hit'}
+                )
+
         # Get bounce data
         bounces = get_bounces(esp, start_date, end_date, sending_domain)
 
@@ -1646,16 +2365,18 @@ async def export_bounces_csv_endpoint(
                 bounce['count']
             ])
 
-        # Create filename
-        domain_suffix = f"_{sending_domain}" if sending_domain and sending_domain != 'all' else ''
-        filename = f"bounces_{esp.lower()}_{start_date}_{end_date}{domain_suffix}.csv"
+        csv_data = output.getvalue()
+        if cache_key:
+            put_artifact(cache_key, 'csv', csv_data.encode('utf-8'))
 
         # Return as streaming response
-        output.seek(0)
         return StreamingResponse(
-            iter([output.getvalue()]),
+            iter([csv_data]),
             media_type='text/csv',
-            headers={'Content-Disposition': f'attachment; filename={filename}'}
+            headers={
+                'Content-Disposition': f'attachment; filename={filename}',
+                'X-Artifact-Cache': 'miss' if cache_key else 'bypass'
+            }
         )
     except HTTPException:
         raise
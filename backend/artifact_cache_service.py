@@ -0,0 +1,247 @@
+"""
+Artifact Cache Service
+Content-addressed disk cache for generated exports (PDF, XLSX, CSV)
+
+An artifact's key is a SHA-256 of its kind, the renderer version for that kind and
+the inputs that determine its content (date range, options, mapping fingerprint).
+Files live under ARTIFACT_CACHE_DIR/<key[:2]>/<key>.<kind>; a small SQLite index
+tracks size and last use, and the least recently used files are evicted once the
+cache exceeds ARTIFACT_CACHE_MAX_BYTES or ARTIFACT_CACHE_MAX_ENTRIES.
+
+Only settled ranges are cached (see is_range_cacheable): Druid data no longer
+changes, so a key never has to be invalidated. Exports of local SQLite data, which
+can be backfilled or cleaned up at any time, add a fingerprint of the rows read
+to their inputs instead.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, Optional
+from config import (
+    ARTIFACT_CACHE_DIR,
+    ARTIFACT_CACHE_MAX_BYTES,
+    ARTIFACT_CACHE_MAX_ENTRIES,
+    SNAPSHOT_SETTLE_HOURS
+)
+from export_service import RENDERER_VERSIONS
+
+INDEX_FILE = 'index.db'
+
+_evict_lock = threading.Lock()
+
+
+def _index_connection():
+    os.makedirs(ARTIFACT_CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(ARTIFACT_CACHE_DIR, INDEX_FILE), timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS artifacts (
+            key TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_used_at REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_artifacts_last_used ON artifacts(last_used_at)')
+    return conn
+
+
+def _artifact_path(key: str, kind: str) -> str:
+    return os.path.join(ARTIFACT_CACHE_DIR, key[:2], f'{key}.{kind}')
+
+
+def is_range_cacheable(to_date: str, now: Optional[datetime] = None) -> bool:
+    """
+    Whether exports for a range ending at to_date (exclusive) may be cached
+
+    The range must have ended at least SNAPSHOT_SETTLE_HOURS ago, the same rule
+    snapshot serving uses for late-arriving events.
+    """
+    now = now or datetime.utcnow()
+    range_end = datetime.strptime(to_date, '%Y-%m-%d')
+    return range_end + timedelta(hours=SNAPSHOT_SETTLE_HOURS) <= now
+
+
+def artifact_key(kind: str, **inputs) -> str:
+    """
+    Cache key for an artifact of kind built from inputs
+
+    Args:
+        kind: A RENDERER_VERSIONS entry ('pdf', 'xlsx', 'xlsx-stream', 'csv')
+        inputs: JSON-serializable values that fully determine the content
+    """
+    if kind not in RENDERER_VERSIONS:
+        raise ValueError(f'Unknown artifact kind: {kind}')
+
+    payload = json.dumps(
+        {'kind': kind, 'renderer': RENDERER_VERSIONS[kind], 'inputs': inputs},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_artifact(key: str) -> Optional[str]:
+    """Path of the cached file for key (and mark it used), or None"""
+    conn = _index_connection()
+    try:
+        row = conn.execute('SELECT kind FROM artifacts WHERE key = ?', (key,)).fetchone()
+        if not row:
+            return None
+
+        path = _artifact_path(key, row[0])
+        if not os.path.exists(path):
+            # File removed behind our back
+            conn.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+            conn.commit()
+            return None
+
+        conn.execute(
+            'UPDATE artifacts SET last_used_at = ?, hits = hits + 1 WHERE key = ?',
+            (datetime.utcnow().timestamp(), key)
+        )
+        conn.commit()
+        return path
+    finally:
+        conn.close()
+
+
+def read_artifact(key: str) -> Optional[bytes]:
+    """Cached bytes for key, for callers that need the content in memory"""
+    path = get_artifact(key)
+    if path is None:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        # Evicted between the lookup and the read
+        return None
+
+
+def _register(conn, key: str, kind: str, size: int):
+    conn.execute('''
+        INSERT OR REPLACE INTO artifacts (key, kind, size, last_used_at)
+        VALUES (?, ?, ?, ?)
+    ''', (key, kind, size, datetime.utcnow().timestamp()))
+    conn.commit()
+    evict_artifacts(conn)
+
+
+def _temp_file(key: str):
+    directory = os.path.dirname(_artifact_path(key, 'tmp'))
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.NamedTemporaryFile(dir=directory, suffix='.part', delete=False)
+
+
+def put_artifact(key: str, kind: str, data: bytes):
+    """Store bytes under key (written to a temp file and renamed into place)"""
+    with _temp_file(key) as f:
+        f.write(data)
+    os.replace(f.name, _artifact_path(key, kind))
+
+    conn = _index_connection()
+    try:
+        _register(conn, key, kind, len(data))
+    finally:
+        conn.close()
+
+
+def cache_stream(key: str, kind: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Pass chunks through while copying them to the cache
+
+    The artifact is only stored when the stream is consumed to the end; an
+    interrupted download leaves nothing behind.
+    """
+    f = _temp_file(key)
+    size = 0
+    complete = False
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+            yield chunk
+        complete = True
+    finally:
+        f.close()
+        if complete:
+            os.replace(f.name, _artifact_path(key, kind))
+            conn = _index_connection()
+            try:
+                _register(conn, key, kind, size)
+            finally:
+                conn.close()
+        else:
+            os.remove(f.name)
+
+
+def evict_artifacts(conn=None) -> int:
+    """Delete least recently used artifacts until both limits hold; returns the count"""
+    own_connection = conn is None
+    conn = conn or _index_connection()
+    removed = 0
+    try:
+        with _evict_lock:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts').fetchone()
+            if count <= ARTIFACT_CACHE_MAX_ENTRIES and total <= ARTIFACT_CACHE_MAX_BYTES:
+                return 0
+
+            rows = conn.execute('SELECT key, kind, size FROM artifacts ORDER BY last_used_at').fetchall()
+            for key, kind, size in rows:
+                if count <= ARTIFACT_CACHE_MAX_ENTRIES and total <= ARTIFACT_CACHE_MAX_BYTES:
+                    break
+                try:
+                    os.remove(_artifact_path(key, kind))
+                except FileNotFoundError:
+                    pass
+                conn.execute('DELETE FROM artifacts WHERE key = ?', (key,))
+                count -= 1
+                total -= size
+                removed += 1
+            conn.commit()
+    finally:
+        if own_connection:
+            conn.close()
+    return removed
+
+
+def get_artifact_cache_stats() -> Dict:
+    """Entry count, size and hits per kind plus the configured limits"""
+    conn = _index_connection()
+    try:
+        rows = conn.execute('''
+            SELECT kind, COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0)
+            FROM artifacts GROUP BY kind
+        ''').fetchall()
+    finally:
+        conn.close()
+
+    return {
+        'entries': sum(r[1] for r in rows),
+        'total_bytes': sum(r[2] for r in rows),
+        'by_kind': {kind: {'entries': n, 'bytes': size, 'hits': hits} for kind, n, size, hits in rows},
+        'max_bytes': ARTIFACT_CACHE_MAX_BYTES,
+        'max_entries': ARTIFACT_CACHE_MAX_ENTRIES,
+    }
+
+
+def clear_artifact_cache() -> int:
+    """Remove every cached artifact; returns the number removed"""
+    conn = _index_connection()
+    try:
+        rows = conn.execute('SELECT key, kind FROM artifacts').fetchall()
+        for key, kind in rows:
+            try:
+                os.remove(_artifact_path(key, kind))
+            except FileNotFoundError:
+                pass
+        conn.execute('DELETE FROM artifacts')
+        conn.commit()
+    finally:
+        conn.close()
+    return len(rows)
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Account Mapping Benchmark
+Compares per-row SQLite lookups with the in-memory map used by add_account_column
+Runs against a temporary database, so the real mappings are never touched
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import account_mapping_service
+from account_aggregation_service import add_account_column
+
+MAPPING_COUNT = 5000
+ROW_COUNTS = [1000, 10000, 100000]
+
+
+def lookup_per_row(domain: str):
+    """Previous behaviour: one connection and SELECT per domain"""
+    conn = account_mapping_service.get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT account_name FROM domain_account_mapping WHERE sending_domain = ?',
+        (domain.lower(),)
+    )
+    row = cursor.fetchone()
+    conn.close()
+    return row['account_name'] if row else None
+
+
+def main():
+    """Run the benchmark at each row count"""
+    with tempfile.TemporaryDirectory() as tmp:
+        account_mapping_service.DB_PATH = os.path.join(tmp, 'account_mappings.db')
+        account_mapping_service.init_account_mapping_database()
+
+        conn = sqlite3.connect(account_mapping_service.DB_PATH)
+        conn.executemany(
+            'INSERT INTO domain_account_mapping (sending_domain, account_name) VALUES (?, ?)',
+            [(f'domain{i}.com', f'Account {i % 500}') for i in range(MAPPING_COUNT)]
+        )
+        conn.commit()
+        conn.close()
+        account_mapping_service.bump_mapping_version()
+
+        print(f"\n{'='*60}")
+        print(f"Account mapping benchmark ({MAPPING_COUNT} mappings)")
+        print(f"{'='*60}")
+        print(f"{'Rows':>10} {'Per-row (s)':>14} {'Map (s)':>10} {'Speedup':>10}")
+
+        for rows in ROW_COUNTS:
+            # Mix of mapped and unmapped domains
+            df = pd.DataFrame({'From_domain': [f'Domain{i % (MAPPING_COUNT * 2)}.com' for i in range(rows)]})
+
+            start = time.perf_counter()
+            expected = df['From_domain'].apply(lambda d: lookup_per_row(d) or 'Unmapped')
+            per_row = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = add_account_column(df)
+            mapped = time.perf_counter() - start
+
+            assert result['Account'].tolist() == expected.tolist()
+            print(f"{rows:>10} {per_row:>14.3f} {mapped:>10.4f} {per_row / mapped:>9.0f}x")
+
+        print(f"{'='*60}\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,7 @@ Automatically discovers sending domains from each ESP
 """
 import sqlite3
 import requests
+import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from config import (
@@ -12,9 +13,46 @@ from config import (
     SPARKPOST_API_KEY, SPARKPOST_BASE_URL,
     SENDGRID_API_KEY, SENDGRID_BASE_URL
 )
+from partition_service import (
+    ensure_partition,
+    refresh_union_view,
+    partitioned_source,
+    partitions_for_range,
+    partition_resolver,
+    drop_partitions_before,
+    migrate_to_partitions,
+    list_partitions,
+    ddl_from_table
+)
 
 DB_PATH = '/Users/pankaj/pani/data/bounce_analytics.db'
 
+# Bounce events are stored in monthly partitions (bounce_events_YYYY_MM) behind a bounce_events union view.
+# BOUNCE_DDL is only used for a new database; partitions migrated from an existing
+# bounce_events table keep that table's columns (see bounce_partition_ddl).
+BOUNCE_TABLE = 'bounce_events'
+BOUNCE_COLUMNS = (
+    'esp, event_date, sending_domain, sending_ip, recipient_domain, isp, '
+    'bounce_type, bounce_reason, bounce_code'
+)
+BOUNCE_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        esp TEXT NOT NULL,
+        event_date DATE NOT NULL,
+        sending_domain TEXT,
+        sending_ip TEXT,
+        recipient_domain TEXT,
+        isp TEXT,
+        bounce_type TEXT,
+        bounce_reason TEXT,
+        bounce_code TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+BOUNCE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_{table}_esp_date ON {table}(esp, event_date)',
+]
+
 # ISP Domain Mapping
 ISP_MAPPING = {
     'gmail.com': 'Gmail',
@@ -99,6 +137,36 @@ def get_db_connection():
     return conn
 
 
+def bounce_partition_ddl(cursor: sqlite3.Cursor) -> str:
+    """DDL for a new month: the newest partition's columns, or BOUNCE_DDL for a new database"""
+    partitions = list_partitions(cursor, BOUNCE_TABLE)
+    return ddl_from_table(cursor, partitions[-1]) if partitions else BOUNCE_DDL
+
+
+def init_bounce_database():
+    """
+    Initialize bounce database with monthly bounce_events partitions
+
+    Called on app startup. An existing single bounce_events table is split into
+    partitions with its own columns; the migration refuses to drop it unless every
+    row was copied.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    # Migration: split the old single bounce_events table into monthly partitions
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (BOUNCE_TABLE,))
+    existing = cursor.fetchone()
+    if existing and existing[0] == 'table':
+        migrate_to_partitions(cursor, BOUNCE_TABLE, BOUNCE_TABLE, 'event_date', None, BOUNCE_INDEXES)
+
+    ensure_partition(cursor, BOUNCE_TABLE, datetime.now().date(), bounce_partition_ddl(cursor), BOUNCE_INDEXES)
+    refresh_union_view(cursor, BOUNCE_TABLE, BOUNCE_COLUMNS)
+
+    conn.commit()
+    conn.close()
+
+
 def get_mailgun_domains() -> List[str]:
     """
     Fetch all sending domains from Mailgun (both US and EU regions)
@@ -509,18 +577,18 @@ def collect_sendgrid_bounces(date: str = None) -> Dict:
 
 
 def store_bounces(bounces: List[Dict]) -> int:
-    """Store bounce events in database"""
+    """Store bounce events in database, one executemany per monthly partition"""
     conn = get_db_connection()
     cursor = conn.cursor()
+    partition_for = partition_resolver(
+        cursor, BOUNCE_TABLE, bounce_partition_ddl(cursor), BOUNCE_INDEXES, view_columns=BOUNCE_COLUMNS
+    )
 
-    inserted = 0
+    rows_by_table = {}
     for bounce in bounces:
         try:
-            cursor.execute('''
-                INSERT INTO bounce_events
-                (esp, event_date, sending_domain, sending_ip, recipient_domain, isp, bounce_type, bounce_reason, bounce_code)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            table = partition_for(bounce['event_date'])
+            rows_by_table.setdefault(table, []).append((
                 bounce['esp'],
                 bounce['event_date'],
                 bounce['sending_domain'],
@@ -531,10 +599,25 @@ def store_bounces(bounces: List[Dict]) -> int:
                 bounce['bounce_reason'],
                 bounce['bounce_code']
             ))
-            inserted += 1
         except Exception as e:
             print(f"Error inserting bounce: {str(e)}")
 
+    inserted = 0
+    for table, rows in rows_by_table.items():
+        # A failing month is rolled back whole instead of leaving part of its rows
+        cursor.execute('SAVEPOINT store_month')
+        try:
+            cursor.executemany(f'''
+                INSERT INTO {table}
+                (esp, event_date, sending_domain, sending_ip, recipient_domain, isp, bounce_type, bounce_reason, bounce_code)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            inserted += len(rows)
+        except sqlite3.Error as e:
+            cursor.execute('ROLLBACK TO store_month')
+            print(f"Error inserting bounces into {table}: {str(e)}")
+        cursor.execute('RELEASE store_month')
+
     conn.commit()
     conn.close()
 
@@ -547,8 +630,9 @@ def get_bounces(esp: str, start_date: str, end_date: str, sending_domain: str =
     """
     conn = get_db_connection()
     cursor = conn.cursor()
+    source = partitioned_source(cursor, BOUNCE_TABLE, BOUNCE_COLUMNS, start_date, end_date)
 
-    query = '''
+    query = f'''
         SELECT
             event_date,
             sending_domain,
@@ -559,7 +643,7 @@ def get_bounces(esp: str, start_date: str, end_date: str, sending_domain: str =
             bounce_reason,
             bounce_code,
             COUNT(*) as count
-        FROM bounce_events
+        FROM {source}
         WHERE esp = ? AND event_date >= ? AND event_date <= ?
     '''
 
@@ -595,6 +679,58 @@ def get_bounces(esp: str, start_date: str, end_date: str, sending_domain: str =
     return bounces
 
 
+def get_bounce_fingerprint(start_date: str, end_date: str) -> List[List]:
+    """
+    Row count and max rowid of every partition read for [start_date, end_date]
+
+    Collection can backfill any date and cleanup drops partitions, so cached exports
+    of local bounce data include this in their key.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    fingerprint = []
+    for partition in partitions_for_range(cursor, BOUNCE_TABLE, start_date, end_date):
+        cursor.execute(f'SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM {partition}')
+        fingerprint.append([partition, *cursor.fetchone()])
+
+    conn.close()
+    return fingerprint
+
+
+def query_bounce_frame(start_date: str, end_date: str, esp: Optional[str] = None) -> pd.DataFrame:
+    """
+    Bounce counts per day, ESP, domain, IP, ISP and reason for [start_date, end_date)
+
+    Used for bulk exports, so missing values stay null instead of 'N/A'.
+    """
+    conn = get_db_connection()
+    last_day = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+    source = partitioned_source(conn.cursor(), BOUNCE_TABLE, BOUNCE_COLUMNS, start_date, last_day)
+
+    query = f'''
+        SELECT
+            event_date, esp, sending_domain, sending_ip, recipient_domain, isp,
+            bounce_type, bounce_reason, bounce_code, COUNT(*) as count
+        FROM {source}
+        WHERE event_date >= ? AND event_date < ?
+    '''
+    params = [start_date, end_date]
+
+    if esp:
+        query += ' AND esp = ?'
+        params.append(esp)
+
+    query += '''
+        GROUP BY event_date, esp, sending_domain, sending_ip, recipient_domain, isp, bounce_type, bounce_reason, bounce_code
+        ORDER BY event_date, esp
+    '''
+
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+
 def get_sending_domains(esp: str) -> List[str]:
     """Get list of unique sending domains for an ESP"""
     conn = get_db_connection()
@@ -614,14 +750,13 @@ def get_sending_domains(esp: str) -> List[str]:
 
 
 def cleanup_old_data(days: int = 120) -> int:
-    """Delete bounce events older than specified days"""
+    """Drop bounce event partitions entirely older than specified days"""
     cutoff_date = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
 
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('DELETE FROM bounce_events WHERE event_date < ?', (cutoff_date,))
-    deleted = cursor.rowcount
+    deleted = drop_partitions_before(cursor, BOUNCE_TABLE, cutoff_date, BOUNCE_COLUMNS)
 
     conn.commit()
     conn.close()
@@ -654,3 +789,4 @@ def collect_all_esps(date: str = None) -> Dict:
     results['old_records_deleted'] = deleted
 
     return results
+
@@ -0,0 +1,171 @@
+"""
+Bulk Export Service
+Typed Parquet / Arrow IPC extracts of the MBR domain frame, Pulsation and bounce ranges
+
+The source frame is converted to an Arrow table once, filtered with Arrow compute
+kernels, projected to the requested columns and written in record batches of
+BULK_BATCH_ROWS; each batch's bytes are yielded as soon as the writer emits them,
+so the response streams while the rest is still being encoded.
+
+pyarrow is optional: without it bulk_export_available() is False and the endpoint
+answers 501.
+"""
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+import pandas as pd
+from config import DRUID_US_BROKER, DRUID_EU_BROKER
+from druid_service import fetch_region_data, aggregate_data_by_esp
+from pulsation_service import query_date_range
+from bounce_analytics_service import query_bounce_frame
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+BULK_SOURCES = ('mbr', 'pulsation', 'bounces')
+
+BULK_FORMATS = {
+    'parquet': {'media_type': 'application/vnd.apache.parquet', 'extension': 'parquet'},
+    'arrow': {'media_type': 'application/vnd.apache.arrow.stream', 'extension': 'arrows'},
+}
+
+BULK_BATCH_ROWS = 65536
+PARQUET_COMPRESSION = 'zstd'
+
+FILTER_OPS = {
+    '==': 'equal',
+    '!=': 'not_equal',
+    '>': 'greater',
+    '>=': 'greater_equal',
+    '<': 'less',
+    '<=': 'less_equal',
+}
+
+
+def bulk_export_available() -> bool:
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+
+def load_source_frame(source: str, from_date: str, to_date: str) -> pd.DataFrame:
+    """
+    Load one export source for [from_date, to_date)
+
+    mbr is the combined domain-level frame of the report pipeline (both regions,
+    with the computed rate columns); pulsation and bounces come from local SQLite.
+    """
+    if source == 'mbr':
+        df_us = fetch_region_data('US', DRUID_US_BROKER, from_date, to_date)
+        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, from_date, to_date)
+        if df_us.empty and df_eu.empty:
+            return pd.DataFrame()
+        _, df_combined = aggregate_data_by_esp(df_us, df_eu)
+        return df_combined
+    if source == 'pulsation':
+        return query_date_range(datetime.strptime(from_date, '%Y-%m-%d'), datetime.strptime(to_date, '%Y-%m-%d'))
+    if source == 'bounces':
+        return query_bounce_frame(from_date, to_date)
+    raise ValueError(f'Invalid source: {source}. Must be one of {list(BULK_SOURCES)}')
+
+
+def _filter_mask(table, column: str, op: str, value):
+    """Boolean mask for one predicate"""
+    if column not in table.column_names:
+        raise ValueError(f'Unknown filter column: {column}')
+
+    data = table[column]
+    try:
+        if op == 'in':
+            if not isinstance(value, list):
+                raise ValueError(f"Filter 'in' on {column} needs a list value")
+            return pc.is_in(data, value_set=pa.array(value).cast(data.type))
+        if op not in FILTER_OPS:
+            raise ValueError(f'Invalid filter op: {op}. Must be one of {list(FILTER_OPS) + ["in"]}')
+        return getattr(pc, FILTER_OPS[op])(data, pa.scalar(value).cast(data.type))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+        raise ValueError(f'Cannot compare {column} ({data.type}) with {value!r}: {e}')
+
+
+def build_table(df: pd.DataFrame, columns: Optional[List[str]] = None,
+                filters: Optional[List[Dict]] = None):
+    """
+    Arrow table for a frame after predicate filters and column projection
+
+    Args:
+        df: Source frame
+        columns: Columns to keep, in order (None keeps all)
+        filters: [{'column', 'op', 'value'}] combined with AND; op is one of
+                 ==, !=, >, >=, <, <= or 'in' (value is a list)
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    if columns:
+        missing = [c for c in columns if c not in table.column_names]
+        if missing:
+            raise ValueError(f'Unknown columns: {missing}. Available: {table.column_names}')
+
+    if filters:
+        mask = None
+        for f in filters:
+            condition = _filter_mask(table, f['column'], f['op'], f['value'])
+            mask = condition if mask is None else pc.and_(mask, condition)
+        table = table.filter(mask)
+
+    return table.select(columns) if columns else table
+
+
+class _ByteSink:
+    """Write-only file object whose buffered bytes are taken after every batch"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_table(table, fmt: str) -> Iterator[bytes]:
+    """Serialize a table as Parquet (one row group per batch) or an Arrow IPC stream"""
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f'Invalid format: {fmt}. Must be one of {list(BULK_FORMATS)}')
+
+    sink = _ByteSink()
+    if fmt == 'parquet':
+        writer = pq.ParquetWriter(sink, table.schema, compression=PARQUET_COMPRESSION)
+    else:
+        writer = pa.ipc.new_stream(sink, table.schema)
+
+    for batch in table.to_batches(max_chunksize=BULK_BATCH_ROWS):
+        writer.write_batch(batch)
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+
+    writer.close()
+    chunk = sink.take()
+    if chunk:
+        yield chunk
@@ -42,8 +42,42 @@ FROM ucts_1
 WHERE "__time" >= TIMESTAMP '{start_date}'
  AND "__time" < TIMESTAMP '{end_date}'
  AND LOOKUP("extended_attributes.adapter_uuid", 'accountadapters_uuid-to-accountadapters_from_address') IS NOT NULL
- AND LOOKUP(LOOKUP("extended_attributes.adapter_uuid", 'accountadapters_uuid-to-accountadapters_adapter_id'),'adapters_id-to-adapters_name') IN ('Sparkpost','Mailgun','Sendgrid')
+ AND LOOKUP(LOOKUP("extended_attributes.adapter_uuid", 'accountadapters_uuid-to-accountadapters_adapter_id'),'adapters_id-to-adapters_name') IN ('Sparkpost','Mailgun','Sendgrid'){domain_filter}
 GROUP BY
  LOOKUP(LOOKUP("extended_attributes.adapter_uuid", 'accountadapters_uuid-to-accountadapters_adapter_id'),'adapters_id-to-adapters_name'),
  MV_OFFSET(STRING_TO_MV(LOOKUP("extended_attributes.adapter_uuid", 'accountadapters_uuid-to-accountadapters_from_address'), '@'), 1)
 """
+
+# Sending domain expression used by DRUID_QUERY_TEMPLATE (for extra domain filters)
+DRUID_FROM_DOMAIN_EXPR = (
+    'MV_OFFSET(STRING_TO_MV(LOOKUP("extended_attributes.adapter_uuid", '
+    "'accountadapters_uuid-to-accountadapters_from_address'), '@'), 1)"
+)
+
+# Serving closed-range MBR views from saved snapshots (mbr_reports) instead of Druid.
+# A snapshot is used when the range has ended and the snapshot was taken at least
+# SNAPSHOT_SETTLE_HOURS after the range end (late events have landed); with
+# SNAPSHOT_MAX_AGE_DAYS > 0, older snapshots are ignored as well.
+SNAPSHOT_SERVING_ENABLED = os.getenv('SNAPSHOT_SERVING_ENABLED', 'true').lower() == 'true'
+SNAPSHOT_SETTLE_HOURS = int(os.getenv('SNAPSHOT_SETTLE_HOURS', '48'))
+SNAPSHOT_MAX_AGE_DAYS = int(os.getenv('SNAPSHOT_MAX_AGE_DAYS', '0'))
+
+# PDF rendering runs in a bounded process pool so ReportLab work never blocks the API.
+# Requests beyond PDF_RENDER_MAX_QUEUE waiting renders are rejected (503) and a render
+# taking longer than PDF_RENDER_TIMEOUT_SECONDS is abandoned (504).
+PDF_RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', str(min(4, os.cpu_count() or 1))))
+PDF_RENDER_MAX_QUEUE = int(os.getenv('PDF_RENDER_MAX_QUEUE', '8'))
+PDF_RENDER_TIMEOUT_SECONDS = int(os.getenv('PDF_RENDER_TIMEOUT_SECONDS', '120'))
+
+# Generated export artifacts (PDF/XLSX/CSV) for settled ranges are cached on disk,
+# keyed by a hash of their inputs and renderer version, and evicted least recently
+# used first once either limit is exceeded.
+ARTIFACT_CACHE_DIR = os.getenv('ARTIFACT_CACHE_DIR', '/Users/pankaj/pani/data/export_cache')
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv('ARTIFACT_CACHE_MAX_MB', '1024')) * 1024 * 1024
+ARTIFACT_CACHE_MAX_ENTRIES = int(os.getenv('ARTIFACT_CACHE_MAX_ENTRIES', '500'))
+
+# Export jobs (batch per-account PDFs) run in background threads, EXPORT_JOB_CONCURRENCY
+# at a time; finished ZIPs live in EXPORT_JOB_DIR for EXPORT_JOB_RETENTION_HOURS.
+EXPORT_JOB_DIR = os.getenv('EXPORT_JOB_DIR', '/Users/pankaj/pani/data/export_jobs')
+EXPORT_JOB_CONCURRENCY = int(os.getenv('EXPORT_JOB_CONCURRENCY', '1'))
+EXPORT_JOB_RETENTION_HOURS = int(os.getenv('EXPORT_JOB_RETENTION_HOURS', '24'))
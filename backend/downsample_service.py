@@ -0,0 +1,136 @@
+"""
+Downsample Service
+Largest-Triangle-Three-Buckets (LTTB) downsampling for chart series
+
+Long daily series are reduced to at most max_points points while keeping the
+shape of the line, including isolated spikes. Charts that plot several metrics
+on one date axis are downsampled together so every series keeps the same dates.
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# LTTB always keeps the first and last point plus at least one from the middle
+MIN_POINTS = 3
+
+
+def validate_max_points(max_points: Optional[int]):
+    """Raise ValueError for a max_points LTTB cannot honour (None means no downsampling)"""
+    if max_points is not None and max_points < MIN_POINTS:
+        raise ValueError(f'max_points must be at least {MIN_POINTS}')
+
+
+def lttb_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Pick the indices LTTB keeps for one or more aligned series
+
+    Args:
+        values: (n,) array, or (n, k) array of k series sharing the x axis
+        max_points: Maximum number of points to keep (at least MIN_POINTS)
+
+    Returns:
+        Sorted index array, always including the first and last point
+    """
+    validate_max_points(max_points)
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    if max_points is None or max_points >= n or n <= 2:
+        return np.arange(n)
+    max_points = int(max_points)
+
+    # Scale every series to [0, 1] so no single metric dominates the triangle areas
+    values = np.nan_to_num(values, nan=0.0)
+    low = values.min(axis=0)
+    span = values.max(axis=0) - low
+    values = (values - low) / np.where(span > 0, span, 1.0)
+
+    # Bucket boundaries for the n - 2 inner points
+    every = (n - 2) / (max_points - 2)
+    bounds = (np.arange(max_points - 1) * every).astype(np.int64) + 1
+    bounds[-1] = n - 1
+
+    # Average point of each bucket (used as the third triangle corner), plus the last point
+    cum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    sizes = (bounds[1:] - bounds[:-1])[:, None]
+    avg_y = (cum[bounds[1:]] - cum[bounds[:-1]]) / sizes
+    avg_x = (bounds[:-1] + bounds[1:] - 1) / 2.0
+    avg_y = np.vstack([avg_y, values[-1:]])
+    avg_x = np.append(avg_x, n - 1)
+
+    x = np.arange(n, dtype=float)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = bounds[i], bounds[i + 1]
+        cx, cy = avg_x[i + 1], avg_y[i + 1]
+        px, py = x[start:end], values[start:end]
+        ax, ay = x[a], values[a]
+
+        # Triangle area per candidate, summed over all series
+        area = np.abs((ax - cx) * (py - ay) - (ax - px)[:, None] * (cy - ay)).sum(axis=1)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def _numeric_lists(data: Dict) -> List[list]:
+    """Collect numeric lists from a (possibly nested) dict of aligned lists"""
+    found = []
+    for value in data.values():
+        if isinstance(value, dict):
+            found.extend(_numeric_lists(value))
+        elif isinstance(value, list) and value and all(
+            v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in value
+        ):
+            found.append([np.nan if v is None else v for v in value])
+    return found
+
+
+def _take(data: Dict, indices: np.ndarray, length: int) -> Dict:
+    """Select indices from every aligned list in a (possibly nested) dict"""
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            result[key] = _take(value, indices, length)
+        elif isinstance(value, list) and len(value) == length:
+            result[key] = [value[i] for i in indices]
+        else:
+            result[key] = value
+    return result
+
+
+def downsample_series(data: Dict, max_points: Optional[int], axis_key: str = 'dates') -> Dict:
+    """
+    Downsample a dict of lists aligned on data[axis_key]
+
+    Numeric lists (at any nesting level) drive the point selection; every list with
+    the same length as the axis is reduced to the same indices.
+    """
+    validate_max_points(max_points)
+    length = len(data.get(axis_key) or [])
+    if max_points is None or length <= max_points:
+        return data
+
+    columns = _numeric_lists(data)
+    columns = [c for c in columns if len(c) == length]
+    if not columns:
+        indices = np.linspace(0, length - 1, max_points).round().astype(np.int64)
+    else:
+        indices = lttb_indices(np.column_stack(columns), max_points)
+
+    return _take(data, indices.tolist(), length)
+
+
+def downsample_frame(df: pd.DataFrame, max_points: Optional[int], columns: List[str]) -> pd.DataFrame:
+    """Downsample an ordered DataFrame using LTTB over the given numeric columns"""
+    validate_max_points(max_points)
+    if max_points is None or len(df) <= max_points:
+        return df
+    indices = lttb_indices(df[columns].to_numpy(dtype=float), max_points)
+    return df.iloc[indices].reset_index(drop=True)
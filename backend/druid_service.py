@@ -2,7 +2,7 @@ import json
 import requests
 import pandas as pd
 from typing import Dict, List, Optional, Tuple
-from config import DRUID_US_BROKER, DRUID_EU_BROKER, DRUID_QUERY_TEMPLATE, ESPS
+from config import DRUID_US_BROKER, DRUID_EU_BROKER, DRUID_QUERY_TEMPLATE, DRUID_FROM_DOMAIN_EXPR, ESPS
 from health_score_service import add_health_score_to_summary
 
 
@@ -25,11 +25,56 @@ def execute_druid_query(broker_url: str, query: str, timeout: int = 120) -> List
         return []
 
 
-def fetch_region_data(region_name: str, broker_url: str, from_date: str, to_date: str) -> pd.DataFrame:
-    """Fetch deliverability data from a specific Druid region"""
+def druid_string(value: str) -> str:
+    """Quote a value as a Druid SQL string literal"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards in a literal (used with ESCAPE '\\')"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def build_domain_filter(domains: List[str]) -> str:
+    """
+    Build an extra WHERE condition limiting DRUID_QUERY_TEMPLATE to the given sending domains
+
+    Mapping rows also cover subdomains ('x.com' and '*.x.com' match 'mail.x.com'), so
+    subdomains are included too; callers still resolve accounts locally afterwards.
+    """
+    exact = set()
+    suffixes = set()
+    for domain in domains:
+        domain = domain.strip().lower()
+        if domain.startswith('*.'):
+            suffixes.add(domain[2:])
+        elif domain:
+            exact.add(domain)
+            suffixes.add(domain)
+
+    domain_expr = f'LOWER({DRUID_FROM_DOMAIN_EXPR})'
+    conditions = []
+    if exact:
+        conditions.append(f"{domain_expr} IN ({', '.join(druid_string(d) for d in sorted(exact))})")
+    # Subdomain match; '_' and '%' in the domain itself are literals
+    conditions.extend(
+        f"{domain_expr} LIKE {druid_string('%.' + escape_like(s))} ESCAPE '\\'" for s in sorted(suffixes)
+    )
+    return f"\n AND ({' OR '.join(conditions)})"
+
+
+def fetch_region_data(region_name: str, broker_url: str, from_date: str, to_date: str,
+                      domains: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Fetch deliverability data from a specific Druid region
+
+    Args:
+        domains: Only fetch these sending domains (and their subdomains); None for all
+    """
     print(f'Querying {region_name} Druid broker...')
 
-    query = DRUID_QUERY_TEMPLATE.format(start_date=from_date, end_date=to_date)
+    domain_filter = build_domain_filter(domains) if domains else ''
+    query = DRUID_QUERY_TEMPLATE.format(start_date=from_date, end_date=to_date, domain_filter=domain_filter)
     results = execute_druid_query(broker_url, query)
 
     if not results:
@@ -42,6 +87,77 @@ def fetch_region_data(region_name: str, broker_url: str, from_date: str, to_date
     return df
 
 
+# Volume columns of DRUID_QUERY_TEMPLATE that are summed when grouping rows by account
+ACCOUNT_PUSHDOWN_METRICS = [
+    'Sent', 'Delivered', 'Unique_user_open', 'Unique_pre_fetch_open', 'Unique_proxy_open',
+    'Clicks', 'unique_click', 'Bounces', 'Unique_soft_bounce', 'Spam_report', 'Unsubscribe'
+]
+
+# Account values starting with this marker carry an unmatched sending domain instead
+UNMATCHED_DOMAIN_MARKER = '@'
+
+
+def build_account_case(domain_accounts: Dict[str, str]) -> str:
+    """
+    Build a Druid CASE expression mapping "From_domain" to its account
+
+    Domains without an entry come back as '@<domain>' so they can be resolved locally.
+    """
+    by_account = {}
+    for domain, account in domain_accounts.items():
+        by_account.setdefault(account, []).append(domain)
+
+    branches = '\n    '.join(
+        f"WHEN LOWER(\"From_domain\") IN ({', '.join(druid_string(d) for d in sorted(domains))}) "
+        f"THEN {druid_string(account)}"
+        for account, domains in sorted(by_account.items())
+    )
+    marker = druid_string(UNMATCHED_DOMAIN_MARKER)
+    return f'CASE\n    {branches}\n    ELSE {marker} || "From_domain"\n  END'
+
+
+def fetch_region_account_data(region_name: str, broker_url: str, from_date: str, to_date: str,
+                              domain_accounts: Dict[str, str]) -> pd.DataFrame:
+    """
+    Fetch deliverability data grouped by (Account, ESP) inside Druid
+
+    The domain-level query runs as a subquery and an inline CASE mapping groups its rows
+    by account, so only account rows (plus unmatched domains) are returned.
+
+    Returns:
+        DataFrame with Account, ESP, Region and summed metrics; rows for unmatched domains have
+        Account = None and From_domain set
+    """
+    print(f'Querying {region_name} Druid broker (account pushdown, {len(domain_accounts)} domains)...')
+
+    account_expr = build_account_case(domain_accounts)
+    sums = ',\n  '.join(f'SUM("{col}") AS "{col}"' for col in ACCOUNT_PUSHDOWN_METRICS)
+    inner = DRUID_QUERY_TEMPLATE.format(start_date=from_date, end_date=to_date, domain_filter='')
+    query = f"""
+SELECT
+  {account_expr} AS "Account",
+  "ESP",
+  {sums}
+FROM ({inner}) domain_rows
+GROUP BY
+  {account_expr},
+  "ESP"
+"""
+    results = execute_druid_query(broker_url, query)
+
+    if not results:
+        print(f'No data returned from {region_name} broker')
+        return pd.DataFrame()
+
+    df = pd.DataFrame(results)
+    unmatched = df['Account'].str.startswith(UNMATCHED_DOMAIN_MARKER)
+    df['From_domain'] = df['Account'].where(unmatched).str[len(UNMATCHED_DOMAIN_MARKER):]
+    df['Account'] = df['Account'].where(~unmatched)
+    df['Region'] = region_name
+    print(f'Retrieved {len(df)} rows from {region_name} ({int((~unmatched).sum())} account rows)')
+    return df
+
+
 def calculate_metrics(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate derived metrics (rates, percentages) for deliverability data"""
     numeric_cols = [
@@ -174,13 +290,19 @@ def get_top10_domains(df: pd.DataFrame) -> pd.DataFrame:
     return top10
 
 
-def aggregate_data_by_esp(df_us: pd.DataFrame, df_eu: pd.DataFrame) -> Tuple[Dict, pd.DataFrame]:
-    """Aggregate data by ESP with regional breakdowns"""
+def build_esp_frames(df_us: pd.DataFrame, df_eu: pd.DataFrame) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Per-ESP summaries and frames, not yet serialized
+
+    Returns:
+        ({esp: {'us_summary', 'eu_summary', 'combined_summary',
+                'top10_domains': DataFrame, 'all_data': DataFrame}}, df_combined)
+    """
     df_combined = pd.concat([df_us, df_eu], ignore_index=True)
     df_combined = df_combined[df_combined['Delivered'] > 0].copy()
     df_combined = calculate_metrics(df_combined)
 
-    esp_data = {}
+    frames = {}
 
     for esp in ESPS:
         esp_df = df_combined[df_combined['ESP'] == esp].copy()
@@ -195,20 +317,40 @@ def aggregate_data_by_esp(df_us: pd.DataFrame, df_eu: pd.DataFrame) -> Tuple[Dic
         eu_df = esp_df[esp_df['Region'] == 'EU'].copy()
         eu_summary = aggregate_region_summary(eu_df) if not eu_df.empty else None
 
-        combined_summary = aggregate_region_summary(esp_df)
-        top10_domains = get_top10_domains(esp_df)
-
-        esp_data[esp] = {
+        frames[esp] = {
             'us_summary': us_summary,
             'eu_summary': eu_summary,
-            'combined_summary': combined_summary,
+            'combined_summary': aggregate_region_summary(esp_df),
+            'top10_domains': get_top10_domains(esp_df),
+            'all_data': esp_df
+        }
+
+    return frames, df_combined
+
+
+def serialize_esp_frames(frames: Dict) -> Dict:
+    """Turn build_esp_frames output into the esp_data dict sent to the UI"""
+    esp_data = {}
+
+    for esp, block in frames.items():
+        top10_domains = block['top10_domains']
+        esp_data[esp] = {
+            'us_summary': block['us_summary'],
+            'eu_summary': block['eu_summary'],
+            'combined_summary': block['combined_summary'],
             'top10_domains': top10_domains.to_dict('records') if not top10_domains.empty else [],
-            'all_data': esp_df.to_dict('records')
+            'all_data': block['all_data'].to_dict('records')
         }
 
-        print(f'Processed {esp}: {len(esp_df)} domains')
+        print(f"Processed {esp}: {len(block['all_data'])} domains")
 
-    return esp_data, df_combined
+    return esp_data
+
+
+def aggregate_data_by_esp(df_us: pd.DataFrame, df_eu: pd.DataFrame) -> Tuple[Dict, pd.DataFrame]:
+    """Aggregate data by ESP with regional breakdowns"""
+    frames, df_combined = build_esp_frames(df_us, df_eu)
+    return serialize_esp_frames(frames), df_combined
 
 
 def get_top10_overall(df_combined: pd.DataFrame) -> pd.DataFrame:
@@ -0,0 +1,291 @@
+"""
+Export Job Service
+Background jobs that render one MBR PDF per account and bundle them into a ZIP
+
+A job fetches the range once from both Druid brokers, maps domains to accounts and
+splits the frame per account; every account's PDF is then rendered through the
+shared process pool (pdf_render_service). All jobs together hold at most
+max(1, PDF_RENDER_WORKERS - 1) render slots, which leaves a worker free for
+interactive exports when the pool has more than one; with a single worker, jobs
+and interactive exports share it. PDFs go into EXPORT_JOB_DIR/<job_id>.zip as
+they finish. Job state is kept in memory and reported through get_job.
+"""
+import asyncio
+import os
+import re
+import threading
+import uuid
+import zipfile
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from config import (
+    DRUID_US_BROKER,
+    DRUID_EU_BROKER,
+    PDF_RENDER_WORKERS,
+    EXPORT_JOB_DIR,
+    EXPORT_JOB_CONCURRENCY,
+    EXPORT_JOB_RETENTION_HOURS
+)
+from druid_service import fetch_region_data, aggregate_data_by_esp
+from account_aggregation_service import add_account_column
+from account_mapping_service import get_affiliate_accounts, get_mapping_fingerprint
+from artifact_cache_service import is_range_cacheable, artifact_key, read_artifact, put_artifact
+from pdf_render_service import RenderQueueFull, render_pdf
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed')
+
+# Seconds to wait before retrying a render the pool turned away
+QUEUE_FULL_RETRY_SECONDS = 1
+
+# Seconds between attempts to take a render slot
+RENDER_SLOT_POLL_SECONDS = 0.2
+
+# Render slots shared by every job; each job runs its own event loop in its own
+# thread, so this is a thread-level semaphore rather than an asyncio one
+_render_slots = threading.BoundedSemaphore(max(1, PDF_RENDER_WORKERS - 1))
+
+# job_id -> job state (see create_export_job)
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _jobs_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=EXPORT_JOB_CONCURRENCY, thread_name_prefix='export-job')
+        return _executor
+
+
+def _update(job_id: str, **changes):
+    with _jobs_lock:
+        _jobs[job_id].update(changes)
+
+
+def _zip_path(job_id: str) -> str:
+    return os.path.join(EXPORT_JOB_DIR, f'{job_id}.zip')
+
+
+def _pdf_filename(account: str, from_date: str, to_date: str) -> str:
+    safe = re.sub(r'[^A-Za-z0-9._-]+', '_', account).strip('_') or 'account'
+    return f'{safe}_deliverability_report_{from_date}_to_{to_date}.pdf'
+
+
+def split_by_account(df: pd.DataFrame, accounts: List[str]) -> Dict[str, pd.DataFrame]:
+    """Rows of the requested accounts, one frame per account (accounts without data are left out)"""
+    df = df[df['Account'].isin(accounts)]
+    return {name: group for name, group in df.groupby('Account', sort=False)}
+
+
+async def _render_account(job_id: str, account: str, df: pd.DataFrame, mapping: Optional[str]) -> bytes:
+    """One account's PDF, from the artifact cache when the range is settled (mapping None skips the cache)"""
+    job = get_job(job_id)
+    from_date, to_date = job['from_date'], job['to_date']
+
+    cache_key = None
+    if mapping is not None and is_range_cacheable(to_date):
+        cache_key = artifact_key('pdf', from_date=from_date, to_date=to_date, account=account, mapping=mapping)
+        cached = read_artifact(cache_key)
+        if cached is not None:
+            return cached
+
+    esp_data, df_combined = aggregate_data_by_esp(
+        df[df['Region'] == 'US'].drop(columns=['Account']),
+        df[df['Region'] == 'EU'].drop(columns=['Account'])
+    )
+
+    while True:
+        try:
+            pdf_data = await render_pdf(esp_data, df_combined, from_date, to_date, account_name=account)
+            break
+        except RenderQueueFull:
+            await asyncio.sleep(QUEUE_FULL_RETRY_SECONDS)
+
+    if cache_key:
+        put_artifact(cache_key, 'pdf', pdf_data)
+    return pdf_data
+
+
+async def _render_all(job_id: str, frames: Dict[str, pd.DataFrame], mapping: Optional[str]):
+    """Render every account through the shared render slots, appending to the job's ZIP"""
+    job = get_job(job_id)
+
+    async def render(account: str):
+        # Poll instead of blocking so the job's event loop keeps collecting finished renders
+        while not _render_slots.acquire(blocking=False):
+            await asyncio.sleep(RENDER_SLOT_POLL_SECONDS)
+        try:
+            return account, await _render_account(job_id, account, frames[account], mapping), None
+        except Exception as e:
+            return account, None, str(e)
+        finally:
+            _render_slots.release()
+
+    with zipfile.ZipFile(_zip_path(job_id), 'w', compression=zipfile.ZIP_STORED) as archive:
+        for next_done in asyncio.as_completed([render(account) for account in frames]):
+            account, pdf_data, error = await next_done
+            with _jobs_lock:
+                state = _jobs[job_id]
+                if error:
+                    state['failed'] += 1
+                    state['errors'][account] = error
+                else:
+                    state['completed'] += 1
+            if pdf_data is not None:
+                archive.writestr(_pdf_filename(account, job['from_date'], job['to_date']), pdf_data)
+
+
+def _run_job(job_id: str):
+    """Job body: one shared fetch, then parallel per-account rendering"""
+    job = get_job(job_id)
+    _update(job_id, status='running', started_at=datetime.utcnow().isoformat())
+    try:
+        accounts = job['accounts'] if job['accounts'] is not None else get_affiliate_accounts()
+
+        df_us = fetch_region_data('US', DRUID_US_BROKER, job['from_date'], job['to_date'])
+        df_eu = fetch_region_data('EU', DRUID_EU_BROKER, job['from_date'], job['to_date'])
+        df = add_account_column(pd.concat([df_us, df_eu], ignore_index=True))
+
+        frames = split_by_account(df, accounts) if not df.empty else {}
+        _update(
+            job_id,
+            total=len(frames),
+            skipped=sorted(set(accounts) - set(frames))
+        )
+
+        # A broker error also comes back empty, so PDFs built without both regions are
+        # rendered but not cached
+        mapping = get_mapping_fingerprint() if not (df_us.empty or df_eu.empty) else None
+
+        os.makedirs(EXPORT_JOB_DIR, exist_ok=True)
+        asyncio.run(_render_all(job_id, frames, mapping))
+
+        state = get_job(job_id)
+        if frames and state['completed'] == 0:
+            raise RuntimeError('No account report could be rendered')
+        _update(
+            job_id,
+            status='completed',
+            file_size=os.path.getsize(_zip_path(job_id)),
+            finished_at=datetime.utcnow().isoformat()
+        )
+    except Exception as e:
+        _update(job_id, status='failed', message=str(e), finished_at=datetime.utcnow().isoformat())
+
+
+def prune_export_jobs() -> int:
+    """Forget finished jobs older than EXPORT_JOB_RETENTION_HOURS and delete their ZIPs"""
+    cutoff = (datetime.utcnow() - timedelta(hours=EXPORT_JOB_RETENTION_HOURS)).isoformat()
+    with _jobs_lock:
+        expired = [
+            job_id for job_id, job in _jobs.items()
+            if job['finished_at'] and job['finished_at'] < cutoff
+        ]
+        for job_id in expired:
+            del _jobs[job_id]
+
+    for job_id in expired:
+        if os.path.exists(_zip_path(job_id)):
+            os.remove(_zip_path(job_id))
+    return len(expired)
+
+
+def create_export_job(from_date: str, to_date: str, accounts: Optional[List[str]] = None) -> Dict:
+    """
+    Queue a per-account PDF export
+
+    Args:
+        from_date: Start date (YYYY-MM-DD)
+        to_date: End date (YYYY-MM-DD, exclusive)
+        accounts: Account names, or None for all affiliate accounts
+
+    Returns:
+        The new job's state
+    """
+    datetime.strptime(from_date, '%Y-%m-%d')
+    datetime.strptime(to_date, '%Y-%m-%d')
+    if accounts is not None and not accounts:
+        raise ValueError('accounts must not be empty')
+
+    prune_export_jobs()
+
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _jobs[job_id] = {
+            'id': job_id,
+            'status': 'queued',
+            'from_date': from_date,
+            'to_date': to_date,
+            'accounts': list(dict.fromkeys(accounts)) if accounts is not None else None,
+            'total': None,
+            'completed': 0,
+            'failed': 0,
+            'skipped': [],
+            'errors': {},
+            'message': None,
+            'file_size': None,
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+        }
+
+    _get_executor().submit(_run_job, job_id)
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Snapshot of a job's state with a progress percentage, or None"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job, errors=dict(job['errors']), skipped=list(job['skipped']))
+
+    done = job['completed'] + job['failed']
+    job['progress_pct'] = round(done / job['total'] * 100, 1) if job['total'] else (
+        100.0 if job['status'] == 'completed' else 0.0
+    )
+    return job
+
+
+def list_jobs() -> List[Dict]:
+    """All known jobs, newest first"""
+    with _jobs_lock:
+        job_ids = list(_jobs)
+    jobs = [get_job(job_id) for job_id in job_ids]
+    return sorted((job for job in jobs if job), key=lambda job: job['created_at'], reverse=True)
+
+
+def get_job_archive(job_id: str) -> Optional[str]:
+    """Path of a completed job's ZIP, None if the job is unknown or not finished"""
+    job = get_job(job_id)
+    if not job or job['status'] != 'completed':
+        return None
+    return _zip_path(job_id)
+
+
+def delete_job(job_id: str) -> bool:
+    """Forget a finished job and delete its ZIP; running jobs cannot be deleted"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return False
+        if job['status'] in ('queued', 'running'):
+            raise ValueError('Job is still running')
+        del _jobs[job_id]
+
+    if os.path.exists(_zip_path(job_id)):
+        os.remove(_zip_path(job_id))
+    return True
+
+
+def shutdown_export_jobs():
+    """Stop accepting jobs (running ones finish in the background)"""
+    global _executor
+    with _jobs_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,6 +1,10 @@
 import io
+import queue
+import threading
 import pandas as pd
+import xlsxwriter
 from datetime import datetime
+from xml.sax.saxutils import escape
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -8,7 +12,15 @@ from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
 from reportlab.pdfgen import canvas
 from reportlab.lib.enums import TA_CENTER
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
+
+# Part of every cached artifact's key; bump an entry whenever that output changes
+RENDERER_VERSIONS = {
+    'pdf': 1,
+    'xlsx': 1,
+    'xlsx-stream': 1,
+    'csv': 1,
+}
 
 
 class NumberedCanvas(canvas.Canvas):
@@ -37,51 +49,154 @@ class NumberedCanvas(canvas.Canvas):
         )
 
 
+# Rows converted to Python values at a time when streaming a sheet
+EXCEL_STREAM_BATCH_ROWS = 5000
+
+# Zip chunks buffered between the workbook writer and the response (backpressure)
+EXCEL_STREAM_QUEUE_CHUNKS = 16
+
+
+def excel_sheets(esp_data: Dict, df_combined: pd.DataFrame) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Yield (sheet name, frame) for every sheet of the MBR workbook, in order"""
+    # Executive Summary
+    overall_summary = aggregate_region_summary_for_export(df_combined)
+    if overall_summary:
+        yield 'Executive Summary', pd.DataFrame([overall_summary])
+
+    # ESP-wise data
+    for esp, data in esp_data.items():
+        if data['combined_summary']:
+            # Summary sheet
+            esp_summary = []
+            if data['us_summary']:
+                us_row = data['us_summary'].copy()
+                us_row['Region'] = 'US'
+                esp_summary.append(us_row)
+            if data['eu_summary']:
+                eu_row = data['eu_summary'].copy()
+                eu_row['Region'] = 'EU'
+                esp_summary.append(eu_row)
+            combined_row = data['combined_summary'].copy()
+            combined_row['Region'] = 'Total'
+            esp_summary.append(combined_row)
+
+            yield f'{esp} Summary', pd.DataFrame(esp_summary)
+
+            # Top 10 domains
+            if data['top10_domains']:
+                yield f'{esp} Top 10', pd.DataFrame(data['top10_domains'])
+
+    # Overall Top 10
+    overall_top10 = get_top10_overall_for_export(df_combined)
+    if not overall_top10.empty:
+        yield 'Top 10 Overall', overall_top10
+
+
 def export_to_excel(esp_data: Dict, df_combined: pd.DataFrame, from_date: str, to_date: str) -> bytes:
     """Export all data to Excel file"""
     output = io.BytesIO()
 
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        # Executive Summary
-        overall_summary = aggregate_region_summary_for_export(df_combined)
-        if overall_summary:
-            summary_df = pd.DataFrame([overall_summary])
-            summary_df.to_excel(writer, sheet_name='Executive Summary', index=False)
-
-        # ESP-wise data
-        for esp, data in esp_data.items():
-            if data['combined_summary']:
-                # Summary sheet
-                esp_summary = []
-                if data['us_summary']:
-                    us_row = data['us_summary'].copy()
-                    us_row['Region'] = 'US'
-                    esp_summary.append(us_row)
-                if data['eu_summary']:
-                    eu_row = data['eu_summary'].copy()
-                    eu_row['Region'] = 'EU'
-                    esp_summary.append(eu_row)
-                combined_row = data['combined_summary'].copy()
-                combined_row['Region'] = 'Total'
-                esp_summary.append(combined_row)
-
-                esp_df = pd.DataFrame(esp_summary)
-                esp_df.to_excel(writer, sheet_name=f'{esp} Summary', index=False)
-
-                # Top 10 domains
-                if data['top10_domains']:
-                    top10_df = pd.DataFrame(data['top10_domains'])
-                    top10_df.to_excel(writer, sheet_name=f'{esp} Top 10', index=False)
-
-        # Overall Top 10
-        overall_top10 = get_top10_overall_for_export(df_combined)
-        if not overall_top10.empty:
-            overall_top10.to_excel(writer, sheet_name='Top 10 Overall', index=False)
+        for sheet_name, df in excel_sheets(esp_data, df_combined):
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
 
     output.seek(0)
     return output.getvalue()
 
 
+class _ChunkSink:
+    """Write-only, unseekable file object that hands zip output to a queue"""
+
+    def __init__(self, chunks: queue.Queue, cancelled: threading.Event):
+        self.chunks = chunks
+        self.cancelled = cancelled
+        self.discard = False
+
+    def write(self, data) -> int:
+        if self.discard:
+            return len(data)
+        while not self.cancelled.is_set():
+            try:
+                self.chunks.put(bytes(data), timeout=1)
+                return len(data)
+            except queue.Full:
+                continue
+        raise IOError('Excel export cancelled by client')
+
+    def flush(self):
+        pass
+
+
+def _write_sheet_rows(worksheet, df: pd.DataFrame):
+    """Write a header and the frame's rows in order (constant_memory needs row order)"""
+    worksheet.write_row(0, 0, [str(c) for c in df.columns])
+    # Nested values (e.g. dicts in summaries) are written as text, like to_excel does
+    object_columns = [c for c in df.columns if df[c].dtype == object]
+    row = 1
+    for start in range(0, len(df), EXCEL_STREAM_BATCH_ROWS):
+        batch = df.iloc[start:start + EXCEL_STREAM_BATCH_ROWS].astype(object)
+        batch = batch.where(batch.notna(), None)
+        for column in object_columns:
+            batch[column] = batch[column].map(lambda v: str(v) if isinstance(v, (dict, list, tuple)) else v)
+        for values in batch.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, values)
+            row += 1
+
+
+def stream_excel_export(esp_data: Dict, df_combined: pd.DataFrame, from_date: str,
+                        to_date: str) -> Iterator[bytes]:
+    """
+    Stream the MBR workbook plus an All Domains sheet with every row of df_combined
+
+    The workbook is written with xlsxwriter's constant_memory mode, so finished rows
+    are flushed to temp files instead of kept in memory, and the xlsx zip is written
+    into a bounded queue that this generator drains. Peak memory stays bounded no
+    matter how many domains are exported.
+    """
+    chunks = queue.Queue(maxsize=EXCEL_STREAM_QUEUE_CHUNKS)
+    cancelled = threading.Event()
+    done = object()
+    errors = []
+
+    sink = _ChunkSink(chunks, cancelled)
+
+    def build():
+        try:
+            workbook = xlsxwriter.Workbook(
+                sink,
+                {'constant_memory': True, 'in_memory': False, 'nan_inf_to_errors': True}
+            )
+            for sheet_name, df in excel_sheets(esp_data, df_combined):
+                _write_sheet_rows(workbook.add_worksheet(sheet_name), df)
+            _write_sheet_rows(workbook.add_worksheet('All Domains'), df_combined)
+            workbook.close()
+        except Exception as e:
+            # Anything the half-written zip flushes on cleanup goes nowhere
+            sink.discard = True
+            errors.append(e)
+        finally:
+            while not cancelled.is_set():
+                try:
+                    chunks.put(done, timeout=1)
+                    break
+                except queue.Full:
+                    continue
+
+    worker = threading.Thread(target=build, daemon=True)
+    worker.start()
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is done:
+                break
+            yield chunk
+        if errors:
+            raise errors[0]
+    finally:
+        # Client went away (or we finished): let the writer thread exit
+        cancelled.set()
+
+
 def aggregate_region_summary_for_export(df: pd.DataFrame) -> Dict:
     """Helper function for export - same as druid_service but importable"""
     from druid_service import aggregate_region_summary
@@ -347,8 +462,12 @@ def create_account_table(accounts: List[Dict], title: str):
 
 
 def export_to_pdf(esp_data: Dict, df_combined: pd.DataFrame, from_date: str, to_date: str,
-                  account_data: Dict = None) -> bytes:
-    """Export data to PDF file with all domain and account tables"""
+                  account_data: Dict = None, account_name: str = None) -> bytes:
+    """
+    Export data to PDF file with all domain and account tables
+
+    account_name titles a single customer's report (data already filtered to it).
+    """
     output = io.BytesIO()
 
     doc = SimpleDocTemplate(
@@ -394,6 +513,8 @@ def export_to_pdf(esp_data: Dict, df_combined: pd.DataFrame, from_date: str, to_
     story.append(Spacer(1, 1.5*inch))
     story.append(Paragraph('Monthly Business Review (MBR)', title_style))
     story.append(Paragraph('Deliverability Report', title_style))
+    if account_name:
+        story.append(Paragraph(escape(account_name), title_style))
     story.append(Spacer(1, 0.3*inch))
     story.append(Paragraph(f'Report Period: {from_date} to {to_date}', subtitle_style))
     story.append(Paragraph(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S UTC')}", subtitle_style))
@@ -6,6 +6,9 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import json
+from partition_service import partitioned_source
+from downsample_service import downsample_series
+from gpt_service import GPT_TABLE, GPT_COLUMNS
 
 GPT_DB_PATH = '/Users/pankaj/pani/data/gpt_data.db'
 
@@ -20,9 +23,10 @@ def get_overview_stats(days: int = 30) -> Dict:
     # Calculate date range
     end_date = datetime.utcnow().strftime('%Y-%m-%d')
     start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, start_date, end_date)
 
     # Get latest data for each domain within period
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT
             COUNT(DISTINCT domain) as total_domains,
             AVG(reputation_value) as avg_reputation_value,
@@ -35,7 +39,7 @@ def get_overview_stats(days: int = 30) -> Dict:
         FROM (
             SELECT domain, reputation_value, spam_rate, user_reported_spam_rate,
                    spf_success_rate, dkim_success_rate, dmarc_success_rate, tls_rate
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ? AND data_date <= ?
             ORDER BY data_date DESC
         )
@@ -45,12 +49,12 @@ def get_overview_stats(days: int = 30) -> Dict:
     row = cursor.fetchone()
 
     # Get reputation distribution
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT reputation, COUNT(DISTINCT domain) as count
         FROM (
             SELECT domain, reputation,
                    ROW_NUMBER() OVER (PARTITION BY domain ORDER BY data_date DESC) as rn
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ? AND data_date <= ?
         )
         WHERE rn = 1
@@ -117,20 +121,21 @@ def get_domain_data(days: int = 30, domain: str = None) -> List[Dict]:
 
     end_date = datetime.utcnow().strftime('%Y-%m-%d')
     start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, start_date, end_date)
 
     if domain:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT domain, data_date, reputation, reputation_value,
                    spam_rate, user_reported_spam_rate,
                    spf_success_rate, dkim_success_rate, dmarc_success_rate,
                    tls_rate, verified
-            FROM gpt_data
+            FROM {source}
             WHERE domain = ? AND data_date >= ? AND data_date <= ?
             ORDER BY data_date DESC
         ''', (domain, start_date, end_date))
     else:
         # Get latest record for each domain
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT domain, data_date, reputation, reputation_value,
                    spam_rate, user_reported_spam_rate,
                    spf_success_rate, dkim_success_rate, dmarc_success_rate,
@@ -138,7 +143,7 @@ def get_domain_data(days: int = 30, domain: str = None) -> List[Dict]:
             FROM (
                 SELECT *,
                        ROW_NUMBER() OVER (PARTITION BY domain ORDER BY data_date DESC) as rn
-                FROM gpt_data
+                FROM {source}
                 WHERE data_date >= ? AND data_date <= ?
             )
             WHERE rn = 1
@@ -176,19 +181,20 @@ def get_reputation_trends(days: int = 30, domain: str = None) -> Dict:
 
     end_date = datetime.utcnow().strftime('%Y-%m-%d')
     start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, start_date, end_date)
 
     if domain:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date, AVG(reputation_value) as avg_rep
-            FROM gpt_data
+            FROM {source}
             WHERE domain = ? AND data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
         ''', (domain, start_date, end_date))
     else:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date, AVG(reputation_value) as avg_rep
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
@@ -220,23 +226,24 @@ def get_spam_trends(days: int = 30, domain: str = None) -> Dict:
 
     end_date = datetime.utcnow().strftime('%Y-%m-%d')
     start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, start_date, end_date)
 
     if domain:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date,
                    AVG(spam_rate) as avg_spam,
                    AVG(user_reported_spam_rate) as avg_user_spam
-            FROM gpt_data
+            FROM {source}
             WHERE domain = ? AND data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
         ''', (domain, start_date, end_date))
     else:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date,
                    AVG(spam_rate) as avg_spam,
                    AVG(user_reported_spam_rate) as avg_user_spam
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
@@ -271,25 +278,26 @@ def get_auth_trends(days: int = 30, domain: str = None) -> Dict:
 
     end_date = datetime.utcnow().strftime('%Y-%m-%d')
     start_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, start_date, end_date)
 
     if domain:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date,
                    AVG(spf_success_rate) as avg_spf,
                    AVG(dkim_success_rate) as avg_dkim,
                    AVG(dmarc_success_rate) as avg_dmarc
-            FROM gpt_data
+            FROM {source}
             WHERE domain = ? AND data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
         ''', (domain, start_date, end_date))
     else:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT data_date,
                    AVG(spf_success_rate) as avg_spf,
                    AVG(dkim_success_rate) as avg_dkim,
                    AVG(dmarc_success_rate) as avg_dmarc
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ? AND data_date <= ?
             GROUP BY data_date
             ORDER BY data_date
@@ -570,9 +578,10 @@ def get_enhanced_reputation_changes(days_back: int = 2) -> List[Dict]:
 
     # Get the two most recent dates with data for each domain
     cutoff_date = (datetime.utcnow() - timedelta(days=days_back)).strftime('%Y-%m-%d')
+    source = partitioned_source(cursor, GPT_TABLE, GPT_COLUMNS, cutoff_date)
 
     # Get the two most recent records for each domain
-    cursor.execute('''
+    cursor.execute(f'''
         WITH ranked_data AS (
             SELECT
                 domain,
@@ -582,7 +591,7 @@ def get_enhanced_reputation_changes(days_back: int = 2) -> List[Dict]:
                 spam_rate,
                 data_date,
                 ROW_NUMBER() OVER (PARTITION BY domain ORDER BY data_date DESC) as rn
-            FROM gpt_data
+            FROM {source}
             WHERE data_date >= ?
         ),
         recent AS (
@@ -677,13 +686,14 @@ def get_enhanced_reputation_changes(days_back: int = 2) -> List[Dict]:
     return changes
 
 
-def get_domain_detailed_metrics(domain: str, days: int = 30) -> Dict:
+def get_domain_detailed_metrics(domain: str, days: int = 30, max_points: Optional[int] = None) -> Dict:
     """
     Get detailed metrics for a specific domain over time period
     Used for detailed domain view
 
     Note: Gets all available data for the domain (up to 365 days stored)
     The 'days' parameter is provided for future use but currently gets all data
+    If max_points is given, the trends are LTTB-downsampled to at most that many dates
     """
     conn = sqlite3.connect(GPT_DB_PATH)
     cursor = conn.cursor()
@@ -817,7 +827,7 @@ def get_domain_detailed_metrics(domain: str, days: int = 30) -> Dict:
             'tls_rate': round(latest[9] or 0, 2),
             'delivery_errors': json.loads(latest[10]) if latest[10] else []
         },
-        'trends': {
+        'trends': downsample_series({
             'dates': dates,
             'domain_reputation': domain_rep_trend,
             'ip_reputation': ip_rep_trend,
@@ -826,5 +836,5 @@ def get_domain_detailed_metrics(domain: str, days: int = 30) -> Dict:
             'spf_rate': auth_trends['spf'],
             'dkim_rate': auth_trends['dkim'],
             'dmarc_rate': auth_trends['dmarc']
-        }
+        }, max_points)
     }
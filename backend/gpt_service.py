@@ -10,6 +10,13 @@ from typing import Dict, List, Optional
 import requests
 from urllib.parse import urlencode
 from dotenv import load_dotenv
+from partition_service import (
+    ensure_partition,
+    refresh_union_view,
+    partition_resolver,
+    drop_partitions_before,
+    migrate_to_partitions
+)
 
 load_dotenv()
 
@@ -25,51 +32,70 @@ AUTH_URL = 'https://accounts.google.com/o/oauth2/v2/auth'
 TOKEN_URL = 'https://oauth2.googleapis.com/token'
 API_BASE_URL = 'https://gmailpostmastertools.googleapis.com/v1'
 
+# GPT rows are stored in monthly partitions (gpt_data_YYYY_MM) behind a gpt_data union view
+GPT_TABLE = 'gpt_data'
+GPT_COLUMNS = (
+    'domain, data_date, reputation, reputation_value, spam_rate, user_reported_spam_rate, '
+    'spf_success_rate, dkim_success_rate, dmarc_success_rate, tls_rate, message_volume, '
+    'delivery_errors, ip_reputation, verified, collected_at'
+)
+GPT_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        domain TEXT NOT NULL,
+        data_date DATE NOT NULL,
 
-def initialize_database():
-    """Initialize GPT database with required tables"""
-    conn = sqlite3.connect(GPT_DB_PATH)
-    cursor = conn.cursor()
+        -- Reputation Metrics
+        reputation TEXT,
+        reputation_value INTEGER,
 
-    # Main data table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS gpt_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            domain TEXT NOT NULL,
-            data_date DATE NOT NULL,
+        -- Spam Metrics
+        spam_rate REAL DEFAULT 0,
+        user_reported_spam_rate REAL DEFAULT 0,
 
-            -- Reputation Metrics
-            reputation TEXT,
-            reputation_value INTEGER,
+        -- Authentication Metrics
+        spf_success_rate REAL DEFAULT 0,
+        dkim_success_rate REAL DEFAULT 0,
+        dmarc_success_rate REAL DEFAULT 0,
 
-            -- Spam Metrics
-            spam_rate REAL DEFAULT 0,
-            user_reported_spam_rate REAL DEFAULT 0,
+        -- Encryption
+        tls_rate REAL DEFAULT 0,
 
-            -- Authentication Metrics
-            spf_success_rate REAL DEFAULT 0,
-            dkim_success_rate REAL DEFAULT 0,
-            dmarc_success_rate REAL DEFAULT 0,
+        -- Traffic
+        message_volume INTEGER DEFAULT 0,
 
-            -- Encryption
-            tls_rate REAL DEFAULT 0,
+        -- Delivery Errors
+        delivery_errors TEXT,
 
-            -- Traffic
-            message_volume INTEGER DEFAULT 0,
+        -- IP Reputation (if available)
+        ip_reputation TEXT,
 
-            -- Delivery Errors
-            delivery_errors TEXT,
+        -- Metadata
+        verified BOOLEAN DEFAULT 1,
+        collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
-            -- IP Reputation (if available)
-            ip_reputation TEXT,
+        UNIQUE(domain, data_date)
+    )
+'''
+GPT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table}(data_date)',
+    'CREATE INDEX IF NOT EXISTS idx_{table}_reputation ON {table}(reputation)',
+]
 
-            -- Metadata
-            verified BOOLEAN DEFAULT 1,
-            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
-            UNIQUE(domain, data_date)
-        )
-    ''')
+def initialize_database():
+    """Initialize GPT database with required tables"""
+    conn = sqlite3.connect(GPT_DB_PATH)
+    cursor = conn.cursor()
+
+    # Migration: split the old single gpt_data table into monthly partitions
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (GPT_TABLE,))
+    existing = cursor.fetchone()
+    if existing and existing[0] == 'table':
+        migrate_to_partitions(cursor, GPT_TABLE, GPT_TABLE, 'data_date', GPT_DDL, GPT_INDEXES, GPT_COLUMNS)
+
+    # Main data partitions
+    ensure_partition(cursor, GPT_TABLE, datetime.utcnow().date(), GPT_DDL, GPT_INDEXES)
+    refresh_union_view(cursor, GPT_TABLE, GPT_COLUMNS)
 
     # OAuth tokens table
     cursor.execute('''
@@ -94,11 +120,6 @@ def initialize_database():
         )
     ''')
 
-    # Create indexes
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gpt_domain_date ON gpt_data(domain, data_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gpt_date ON gpt_data(data_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_gpt_reputation ON gpt_data(reputation)')
-
     conn.commit()
     conn.close()
 
@@ -317,6 +338,9 @@ def store_domain_data(domain: str, stats: List[Dict]):
     cursor = conn.cursor()
 
     stored_count = 0
+    partition_for = partition_resolver(cursor, GPT_TABLE, GPT_DDL, GPT_INDEXES, view_columns=GPT_COLUMNS)
+    collected_at = datetime.utcnow()
+    rows_by_table = {}
 
     for stat in stats:
         # Debug: Print first stat to see structure
@@ -384,20 +408,23 @@ def store_domain_data(domain: str, stats: List[Dict]):
         # Message volume (not always available)
         message_volume = 0  # Google doesn't provide exact volume in API
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO gpt_data
-            (domain, data_date, reputation, reputation_value, spam_rate, user_reported_spam_rate,
-             spf_success_rate, dkim_success_rate, dmarc_success_rate, tls_rate,
-             message_volume, delivery_errors, ip_reputation, verified, collected_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
-        ''', (
+        rows_by_table.setdefault(partition_for(data_date), []).append((
             domain, data_date, reputation, reputation_value, spam_rate, user_spam_rate,
             spf_rate, dkim_rate, dmarc_rate, tls_rate,
-            message_volume, delivery_errors, ip_reputation, datetime.utcnow()
+            message_volume, delivery_errors, ip_reputation, collected_at
         ))
 
         stored_count += 1
 
+    for table, rows in rows_by_table.items():
+        cursor.executemany(f'''
+            INSERT OR REPLACE INTO {table}
+            (domain, data_date, reputation, reputation_value, spam_rate, user_reported_spam_rate,
+             spf_success_rate, dkim_success_rate, dmarc_success_rate, tls_rate,
+             message_volume, delivery_errors, ip_reputation, verified, collected_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)
+        ''', rows)
+
     conn.commit()
     conn.close()
 
@@ -405,14 +432,13 @@ def store_domain_data(domain: str, stats: List[Dict]):
 
 
 def cleanup_old_data(days: int = 365):
-    """Delete data older than specified days"""
+    """Drop monthly partitions entirely older than specified days"""
     conn = sqlite3.connect(GPT_DB_PATH)
     cursor = conn.cursor()
 
     cutoff_date = (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
 
-    cursor.execute('DELETE FROM gpt_data WHERE data_date < ?', (cutoff_date,))
-    deleted = cursor.rowcount
+    deleted = drop_partitions_before(cursor, GPT_TABLE, cutoff_date, GPT_COLUMNS)
 
     conn.commit()
     conn.close()
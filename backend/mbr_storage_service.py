@@ -4,12 +4,62 @@ Stores MBR reports (domain and account level) in SQLite for historical tracking
 """
 import sqlite3
 import json
-from datetime import datetime
+import zlib
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
+from config import SNAPSHOT_SERVING_ENABLED, SNAPSHOT_SETTLE_HOURS, SNAPSHOT_MAX_AGE_DAYS
+
+try:
+    import zstandard
+except ImportError:  # optional - reports are zlib-compressed without it
+    zstandard = None
 
 
 DB_PATH = '/Users/pankaj/pani/data/mbr_reports.db'
 
+# report_data encodings (mbr_reports.format_version)
+REPORT_FORMAT_JSON = 1         # plain JSON text (reports saved before compression)
+REPORT_FORMAT_ZLIB_JSON = 2    # zlib-compressed compact JSON
+REPORT_FORMAT_ZSTD_JSON = 3    # zstd-compressed compact JSON
+REPORT_FORMAT_SECTIONS = 4     # report_data is empty; the JSON lives in SECTIONS_TABLE
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+# Reports are stored as separately encoded sections: one per top-level key, with these
+# keys split further into one section per ESP block entry (esp_data.<ESP>.<key>)
+SECTIONS_TABLE = 'mbr_report_sections'
+SPLIT_SECTIONS = ('esp_data', 'top_accounts_by_esp', 'all_accounts_by_esp')
+
+# Sections smaller than this are kept as plain JSON text (compression would not pay off)
+SECTION_COMPRESS_MIN_BYTES = 1024
+
+# Rows re-encoded per batch when migrating older reports
+MIGRATION_BATCH_SIZE = 20
+
+# Normalized per-report metric rows, written alongside the JSON blob
+METRICS_TABLE = 'mbr_report_metrics'
+METRIC_COLUMNS = ['sent', 'delivered', 'bounces', 'spam_reports', 'unsubscribes']
+
+# Report field names for each metric column (domain and account payloads differ slightly)
+METRIC_FIELDS = {
+    'sent': ('Sent', 'Total_Sent'),
+    'delivered': ('Delivered', 'Total_Delivered'),
+    'bounces': ('Bounces', 'Total_Bounces'),
+    'spam_reports': ('Spam_report', 'Spam_Reports', 'Total_Spam_Reports'),
+    'unsubscribes': ('Unsubscribe', 'Unsubscribes', 'Total_Unsubscribes'),
+}
+
+# esp/region value for rows that span all ESPs or both regions
+ALL = 'ALL'
+
+# Metric level compared by diff_reports for each report type
+DIFF_LEVELS = {'domain': 'domain', 'account': 'account'}
+
+# Summary keys of each ESP block -> region stored for the summary row
+SUMMARY_REGIONS = {'us_summary': 'US', 'eu_summary': 'EU', 'combined_summary': ALL}
+
 
 def detect_month_year(from_date: str, to_date: str, duration_days: int) -> Tuple[Optional[int], Optional[int]]:
     """
@@ -83,11 +133,33 @@ def init_mbr_reports_database():
             duration_days INTEGER,
             total_domains INTEGER,
             total_accounts INTEGER,
-            report_data TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            report_data BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            month INTEGER,
+            year INTEGER,
+            format_version INTEGER NOT NULL DEFAULT 1,
+            mapping_fingerprint TEXT
         )
     ''')
 
+    # Encoded JSON of each report section, in original key order
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {SECTIONS_TABLE} (
+            report_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            section TEXT NOT NULL,
+            format_version INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_report_sections
+        ON {SECTIONS_TABLE}(report_id, section)
+    ''')
+
+    migrate_mbr_reports_table(cursor)
+
     # Index for faster lookups
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_report_dates
@@ -99,11 +171,143 @@ def init_mbr_reports_database():
         ON mbr_reports(created_at)
     ''')
 
+    # One row per (report, level, name, ESP, region); level is 'domain', 'account' or 'esp'
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+            report_id INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            name TEXT NOT NULL,
+            esp TEXT NOT NULL,
+            region TEXT NOT NULL,
+            sent INTEGER DEFAULT 0,
+            delivered INTEGER DEFAULT 0,
+            bounces INTEGER DEFAULT 0,
+            spam_reports INTEGER DEFAULT 0,
+            unsubscribes INTEGER DEFAULT 0
+        )
+    ''')
+
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_report_metrics_lookup
+        ON {METRICS_TABLE}(report_id, level, name)
+    ''')
+
     conn.commit()
+
+    cursor.execute('SELECT 1 FROM mbr_reports WHERE format_version != ? LIMIT 1', (REPORT_FORMAT_SECTIONS,))
+    if cursor.fetchone():
+        print('Some MBR reports use the old single-blob format; run migrate_mbr_reports.py to compress them')
     conn.close()
     print(f"MBR reports database initialized at {DB_PATH}")
 
 
+def migrate_mbr_reports_table(cursor: sqlite3.Cursor):
+    """
+    Add the columns newer code expects to an existing mbr_reports table
+
+    These are the month/year columns used by save_mbr_report, format_version and the
+    mapping_fingerprint of account reports. Re-encoding old reports is a separate
+    one-off step (see migrate_report_encoding).
+    """
+    cursor.execute('PRAGMA table_info(mbr_reports)')
+    columns = {row[1] for row in cursor.fetchall()}
+    for column, ddl in [
+        ('month', 'month INTEGER'),
+        ('year', 'year INTEGER'),
+        ('format_version', f'format_version INTEGER NOT NULL DEFAULT {REPORT_FORMAT_JSON}'),
+        ('mapping_fingerprint', 'mapping_fingerprint TEXT'),
+    ]:
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE mbr_reports ADD COLUMN {ddl}')
+
+
+def count_unmigrated_reports() -> int:
+    """Reports still stored as a single JSON blob (plain or compressed)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM mbr_reports WHERE format_version != ?', (REPORT_FORMAT_SECTIONS,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def migrate_report_encoding(vacuum: bool = True) -> int:
+    """
+    Move reports stored as a single JSON blob into compressed sections
+
+    A one-off step run from migrate_mbr_reports.py, not on startup: on a large
+    database it takes minutes. Each batch of MIGRATION_BATCH_SIZE reports is
+    committed on its own, so an interrupted run resumes where it stopped; reports
+    not migrated yet are still decoded on read. VACUUM afterwards returns the freed
+    space to the filesystem but needs about the database's size in free disk.
+
+    Returns:
+        Number of reports re-encoded
+    """
+    total = count_unmigrated_reports()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    migrated = 0
+    while True:
+        cursor.execute(
+            'SELECT id, report_data, format_version FROM mbr_reports WHERE format_version != ? LIMIT ?',
+            (REPORT_FORMAT_SECTIONS, MIGRATION_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        for report_id, report_data, format_version in rows:
+            write_report_sections(cursor, report_id, decode_report_data(report_data, format_version))
+            cursor.execute(
+                'UPDATE mbr_reports SET report_data = ?, format_version = ? WHERE id = ?',
+                (b'', REPORT_FORMAT_SECTIONS, report_id)
+            )
+        conn.commit()
+        migrated += len(rows)
+        print(f'Split {migrated}/{total} MBR reports into compressed sections')
+
+    if migrated and vacuum:
+        print('Running VACUUM...')
+        conn.execute('VACUUM')
+    conn.close()
+    return migrated
+
+
+def compress_report_json(report_json: str) -> Tuple[int, bytes]:
+    """Compress serialized report JSON with zstd when available, else zlib"""
+    raw = report_json.encode('utf-8')
+    if zstandard is not None:
+        return REPORT_FORMAT_ZSTD_JSON, zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return REPORT_FORMAT_ZLIB_JSON, zlib.compress(raw, ZLIB_LEVEL)
+
+
+def encode_section(value) -> Tuple[int, bytes]:
+    """Serialize a section as compact JSON, compressing it unless it is small"""
+    text = json.dumps(value, separators=(',', ':'))
+    if len(text) < SECTION_COMPRESS_MIN_BYTES:
+        return REPORT_FORMAT_JSON, text.encode('utf-8')
+    return compress_report_json(text)
+
+
+def decode_report_json(payload, format_version: int) -> str:
+    """Decompress a stored report back to its JSON text without parsing it"""
+    if format_version == REPORT_FORMAT_JSON:
+        return payload.decode('utf-8') if isinstance(payload, bytes) else payload
+    if format_version == REPORT_FORMAT_ZLIB_JSON:
+        return zlib.decompress(payload).decode('utf-8')
+    if format_version == REPORT_FORMAT_ZSTD_JSON:
+        if zstandard is None:
+            raise RuntimeError('Report is zstd-compressed but the zstandard package is not installed')
+        return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+    raise ValueError(f'Unknown report format version: {format_version}')
+
+
+def decode_report_data(payload, format_version: int) -> Dict:
+    """Decompress and parse a stored report"""
+    return json.loads(decode_report_json(payload, format_version))
+
+
 def check_report_exists(from_date: str, to_date: str, report_type: str = 'domain') -> Optional[Dict]:
     """
     Check if a report already exists for the given date range and type
@@ -113,7 +317,7 @@ def check_report_exists(from_date: str, to_date: str, report_type: str = 'domain
     cursor = conn.cursor()
 
     cursor.execute('''
-        SELECT id, created_at FROM mbr_reports
+        SELECT id, created_at, mapping_fingerprint FROM mbr_reports
         WHERE from_date = ? AND to_date = ? AND report_type = ?
         ORDER BY created_at DESC LIMIT 1
     ''', (from_date, to_date, report_type))
@@ -124,13 +328,202 @@ def check_report_exists(from_date: str, to_date: str, report_type: str = 'domain
     if row:
         return {
             'id': row['id'],
-            'created_at': row['created_at']
+            'created_at': row['created_at'],
+            'mapping_fingerprint': row['mapping_fingerprint']
         }
     return None
 
 
+def split_report_sections(report_data: Dict) -> List[Tuple[str, object]]:
+    """Split a report into (section name, value) pairs, see SPLIT_SECTIONS"""
+    sections = []
+    for key, value in (report_data or {}).items():
+        if key in SPLIT_SECTIONS and isinstance(value, dict) and value:
+            for esp, block in value.items():
+                if isinstance(block, dict) and block:
+                    sections.extend((f'{key}.{esp}.{part}', part_value) for part, part_value in block.items())
+                else:
+                    sections.append((f'{key}.{esp}', block))
+        else:
+            sections.append((key, value))
+    return sections
+
+
+def write_report_sections(cursor: sqlite3.Cursor, report_id: int, report_data: Dict) -> int:
+    """Replace the stored sections of a report; returns the number of sections written"""
+    rows = []
+    for position, (section, value) in enumerate(split_report_sections(report_data)):
+        format_version, payload = encode_section(value)
+        rows.append((report_id, position, section, format_version, payload))
+
+    cursor.execute(f'DELETE FROM {SECTIONS_TABLE} WHERE report_id = ?', (report_id,))
+    cursor.executemany(
+        f'INSERT INTO {SECTIONS_TABLE} (report_id, position, section, format_version, data) VALUES (?, ?, ?, ?, ?)',
+        rows
+    )
+    return len(rows)
+
+
+def _section_parts(section: str) -> List[str]:
+    """Split a section name back into its key path"""
+    return section.split('.', 2) if section.split('.', 1)[0] in SPLIT_SECTIONS else [section]
+
+
+def _assemble_json(sections: List[Tuple[List[str], str]]) -> str:
+    """Join (key path, JSON text) pairs into one JSON object without parsing the texts"""
+    tree = {}
+    for parts, text in sections:
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = text
+
+    def render(node) -> str:
+        if isinstance(node, str):
+            return node
+        return '{' + ','.join(f'{json.dumps(key)}:{render(value)}' for key, value in node.items()) + '}'
+
+    return render(tree)
+
+
+def _load_sections(cursor: sqlite3.Cursor, report_id: int, names: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """Read and decode (section, JSON text) pairs of a report in original order"""
+    if names is None:
+        cursor.execute(
+            f'SELECT section, format_version, data FROM {SECTIONS_TABLE} WHERE report_id = ? ORDER BY position',
+            (report_id,)
+        )
+    else:
+        if not names:
+            return []
+        placeholders = ', '.join('?' for _ in names)
+        cursor.execute(
+            f'''SELECT section, format_version, data FROM {SECTIONS_TABLE}
+                WHERE report_id = ? AND section IN ({placeholders}) ORDER BY position''',
+            (report_id, *names)
+        )
+    return [(row[0], decode_report_json(row[2], row[1])) for row in cursor.fetchall()]
+
+
+def _drill(value, keys: List[str]):
+    """Follow dict keys / list indices into a parsed value; raises KeyError if absent"""
+    for key in keys:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.lstrip('-').isdigit() and -len(value) <= int(key) < len(value):
+            value = value[int(key)]
+        else:
+            raise KeyError(key)
+    return value
+
+
+def _metric_values(row: Dict) -> List[int]:
+    """Read the metric columns from a report row or summary, defaulting to 0"""
+    values = []
+    for column in METRIC_COLUMNS:
+        value = next((row[f] for f in METRIC_FIELDS[column] if row.get(f) is not None), 0)
+        try:
+            values.append(int(value))
+        except (TypeError, ValueError):
+            values.append(0)
+    return values
+
+
+def extract_report_metrics(report_type: str, report_data: Dict) -> List[Tuple]:
+    """
+    Flatten a report payload into (level, name, esp, region, *metrics) rows
+
+    Domain reports give one row per domain/ESP/region from each ESP's all_data plus
+    one 'esp' row per ESP summary; account reports give one row per account in
+    all_accounts_by_esp (each ESP's all_accounts or top10_accounts for older reports)
+    and one esp='ALL' row per account in top10_accounts_overall.
+    """
+    rows = []
+    esp_data = (report_data or {}).get('esp_data') or {}
+
+    if report_type == 'account':
+        all_accounts_by_esp = report_data.get('all_accounts_by_esp') or {}
+        for esp in dict.fromkeys([*all_accounts_by_esp, *esp_data]):
+            # all_accounts_by_esp holds every account; older reports only have the top lists
+            data = esp_data.get(esp) or {}
+            accounts = all_accounts_by_esp.get(esp) or data.get('all_accounts') or data.get('top10_accounts', [])
+            for row in accounts:
+                if row.get('Account'):
+                    rows.append(('account', row['Account'], esp, ALL, *_metric_values(row)))
+        for row in report_data.get('top10_accounts_overall', []):
+            if row.get('Account'):
+                rows.append(('account', row['Account'], ALL, ALL, *_metric_values(row)))
+        return rows
+
+    for esp, data in esp_data.items():
+        data = data or {}
+        for key, region in SUMMARY_REGIONS.items():
+            if data.get(key):
+                rows.append(('esp', esp, esp, region, *_metric_values(data[key])))
+        for row in data.get('all_data', []):
+            if row.get('From_domain'):
+                rows.append((
+                    'domain', row['From_domain'], row.get('ESP') or esp,
+                    row.get('Region') or ALL, *_metric_values(row)
+                ))
+    return rows
+
+
+def write_report_metrics(cursor: sqlite3.Cursor, report_id: int, report_type: str, report_data: Dict) -> int:
+    """Replace the normalized metric rows of a report; returns the number of rows written"""
+    rows = extract_report_metrics(report_type, report_data)
+    cursor.execute(f'DELETE FROM {METRICS_TABLE} WHERE report_id = ?', (report_id,))
+    cursor.executemany(
+        f'''INSERT INTO {METRICS_TABLE} (report_id, level, name, esp, region, {', '.join(METRIC_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        [(report_id, *row) for row in rows]
+    )
+    return len(rows)
+
+
+def find_servable_snapshot(from_date: str, to_date: str, report_type: str = 'domain',
+                           now: Optional[datetime] = None,
+                           mapping_fingerprint: Optional[str] = None) -> Optional[Dict]:
+    """
+    Latest saved snapshot that may answer a live query for the range
+
+    The range must have ended (to_date is exclusive) and the snapshot must have been
+    taken at least SNAPSHOT_SETTLE_HOURS after that, so late-arriving events are in it.
+    With SNAPSHOT_MAX_AGE_DAYS > 0 the snapshot must also be recent enough. Account
+    snapshots are only served when they were saved under mapping_fingerprint, the
+    current domain -> account mapping.
+
+    Returns:
+        {'id', 'created_at'} of the snapshot, or None if the query should go to Druid
+    """
+    if not SNAPSHOT_SERVING_ENABLED:
+        return None
+
+    now = now or datetime.utcnow()
+    range_end = datetime.strptime(to_date, '%Y-%m-%d')
+    if range_end > now:
+        return None
+
+    snapshot = check_report_exists(from_date, to_date, report_type)
+    if not snapshot:
+        return None
+
+    # created_at is SQLite CURRENT_TIMESTAMP (UTC)
+    created_at = datetime.strptime(str(snapshot['created_at'])[:19], '%Y-%m-%d %H:%M:%S')
+    if created_at < range_end + timedelta(hours=SNAPSHOT_SETTLE_HOURS):
+        return None
+    if SNAPSHOT_MAX_AGE_DAYS > 0 and created_at < now - timedelta(days=SNAPSHOT_MAX_AGE_DAYS):
+        return None
+    if report_type == 'account':
+        # Saved before fingerprints were recorded, or attributed with a different mapping
+        if mapping_fingerprint is None or snapshot['mapping_fingerprint'] != mapping_fingerprint:
+            return None
+    return snapshot
+
+
 def save_mbr_report(from_date: str, to_date: str, report_type: str,
-                    report_data: Dict, overwrite: bool = False) -> Dict:
+                    report_data: Dict, overwrite: bool = False,
+                    mapping_fingerprint: Optional[str] = None) -> Dict:
     """
     Save MBR report to database
 
@@ -143,6 +536,8 @@ def save_mbr_report(from_date: str, to_date: str, report_type: str,
         report_type: 'domain' or 'account'
         report_data: The complete report data (will be JSON serialized)
         overwrite: Not used - kept for API compatibility
+        mapping_fingerprint: Domain -> account mapping the report was built with
+                             (account reports; see find_servable_snapshot)
 
     Returns:
         Dict with status and report_id
@@ -158,19 +553,23 @@ def save_mbr_report(from_date: str, to_date: str, report_type: str,
     # Detect month and year (strict mode)
     month, year = detect_month_year(from_date, to_date, duration_days)
 
-    # Serialize report data
-    report_json = json.dumps(report_data)
+    # report_data itself stays empty; the report is written as compressed sections
+    format_version, payload = REPORT_FORMAT_SECTIONS, b''
 
     # Always insert new report (timestamped snapshot)
     cursor.execute('''
         INSERT INTO mbr_reports (
             report_type, from_date, to_date, duration_days,
-            total_domains, total_accounts, report_data, month, year
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            total_domains, total_accounts, report_data, month, year, format_version,
+            mapping_fingerprint
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
     ''', (report_type, from_date, to_date, duration_days,
-          total_domains, total_accounts, report_json, month, year))
+          total_domains, total_accounts, payload, month, year, format_version,
+          mapping_fingerprint))
 
     report_id = cursor.lastrowid
+    write_report_sections(cursor, report_id, report_data)
+    write_report_metrics(cursor, report_id, report_type, report_data)
     conn.commit()
     conn.close()
 
@@ -182,28 +581,250 @@ def save_mbr_report(from_date: str, to_date: str, report_type: str,
     }
 
 
-def get_report_by_id(report_id: int) -> Optional[Dict]:
-    """Get a specific report by ID"""
+REPORT_META_COLUMNS = [
+    'id', 'report_type', 'from_date', 'to_date', 'duration_days',
+    'total_domains', 'total_accounts', 'created_at'
+]
+
+
+def _read_report_json(cursor: sqlite3.Cursor, report_id: int, payload, format_version: int) -> str:
+    """Get the full report_data JSON text of a report in any storage format"""
+    if format_version == REPORT_FORMAT_SECTIONS:
+        sections = _load_sections(cursor, report_id)
+        return _assemble_json([(_section_parts(name), text) for name, text in sections])
+    return decode_report_json(payload, format_version)
+
+
+def _get_report_meta(cursor: sqlite3.Cursor, report_id: int) -> Optional[sqlite3.Row]:
+    """Get the metadata columns plus report_data/format_version of a report"""
+    cursor.execute(
+        f'SELECT {", ".join(REPORT_META_COLUMNS)}, report_data, format_version FROM mbr_reports WHERE id = ?',
+        (report_id,)
+    )
+    return cursor.fetchone()
+
+
+def get_report_json(report_id: int) -> Optional[Tuple[Dict, str]]:
+    """
+    Get a report's metadata and its report_data as JSON text (decompressed, not parsed)
+
+    Lets callers pass the stored JSON straight through to a response without
+    building and re-serializing the full Python structure.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute('SELECT * FROM mbr_reports WHERE id = ?', (report_id,))
-    row = cursor.fetchone()
+    row = _get_report_meta(cursor, report_id)
+    if not row:
+        conn.close()
+        return None
+
+    report_json = _read_report_json(cursor, report_id, row['report_data'], row['format_version'])
     conn.close()
 
+    meta = {column: row[column] for column in REPORT_META_COLUMNS}
+    return meta, report_json
+
+
+def get_report_sections(report_id: int, paths: List[str]) -> Optional[Tuple[Dict, Dict[str, str], List[str]]]:
+    """
+    Get parts of a saved report by dotted path without loading the rest
+
+    A path can name a section ('overall_summary', 'esp_data.Sparkpost.top10_domains'),
+    a group of sections ('esp_data', 'esp_data.Sparkpost') or a value inside a section
+    ('esp_data.Sparkpost.us_summary.Total_Sent', 'top10_overall.0').
+
+    Returns:
+        (metadata, {path: JSON text}, [paths not found]) or None if the report does not exist
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    row = _get_report_meta(cursor, report_id)
     if not row:
+        conn.close()
+        return None
+    meta = {column: row[column] for column in REPORT_META_COLUMNS}
+
+    if row['format_version'] != REPORT_FORMAT_SECTIONS:
+        # Not migrated yet: treat the whole report as one section
+        names = ['']
+        whole = {'': decode_report_json(row['report_data'], row['format_version'])}
+    else:
+        cursor.execute(f'SELECT section FROM {SECTIONS_TABLE} WHERE report_id = ? ORDER BY position', (report_id,))
+        names = [r['section'] for r in cursor.fetchall()]
+        whole = None
+
+    found, missing = {}, []
+    for path in paths:
+        keys = [k for k in path.split('.') if k]
+
+        # Whole sections at or below the path
+        covered = [n for n in names if n and (n == path or n.startswith(path + '.'))]
+        if covered == [path]:
+            found[path] = _load_sections(cursor, report_id, covered)[0][1]
+            continue
+        if covered:
+            sections = _load_sections(cursor, report_id, covered)
+            found[path] = _assemble_json([(_section_parts(n)[len(keys):], text) for n, text in sections])
+            continue
+
+        # A single section containing the path
+        container = next((n for n in names if not n or path.startswith(n + '.')), None)
+        if container is None:
+            missing.append(path)
+            continue
+        text = whole[''] if whole is not None else _load_sections(cursor, report_id, [container])[0][1]
+        try:
+            value = _drill(json.loads(text), keys[len(_section_parts(container)) if container else 0:])
+            found[path] = json.dumps(value, separators=(',', ':'))
+        except KeyError:
+            missing.append(path)
+
+    conn.close()
+    return meta, found, missing
+
+
+def list_report_sections(report_id: int) -> List[Dict]:
+    """List a report's sections with their stored (encoded) size in bytes"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        f'''SELECT section, LENGTH(data) as stored_bytes FROM {SECTIONS_TABLE}
+            WHERE report_id = ? ORDER BY position''',
+        (report_id,)
+    )
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_report_by_id(report_id: int) -> Optional[Dict]:
+    """Get a specific report by ID"""
+    report = get_report_json(report_id)
+    if not report:
         return None
 
+    meta, report_json = report
+    return {**meta, 'report_data': json.loads(report_json)}
+
+
+def get_latest_report_id(from_date: str, to_date: str, report_type: str = 'domain') -> Optional[int]:
+    """Get the id of the most recent report for a date range, None if there is none"""
+    existing = check_report_exists(from_date, to_date, report_type)
+    return existing['id'] if existing else None
+
+
+def get_report_metrics(report_id: int, level: str) -> pd.DataFrame:
+    """
+    Load the normalized metric rows of one report level ('domain', 'account' or 'esp')
+
+    Reports saved before the metric table existed are backfilled from their JSON on
+    first use, so later calls only hit the indexed table.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(f'SELECT 1 FROM {METRICS_TABLE} WHERE report_id = ? LIMIT 1', (report_id,))
+    if cursor.fetchone() is None:
+        cursor.execute('SELECT report_type, report_data, format_version FROM mbr_reports WHERE id = ?', (report_id,))
+        row = cursor.fetchone()
+        if row:
+            report_json = _read_report_json(cursor, report_id, row['report_data'], row['format_version'])
+            write_report_metrics(cursor, report_id, row['report_type'], json.loads(report_json))
+            conn.commit()
+
+    df = pd.read_sql_query(
+        f'''SELECT name, esp, region, {', '.join(METRIC_COLUMNS)}
+            FROM {METRICS_TABLE} WHERE report_id = ? AND level = ?''',
+        conn, params=(report_id, level)
+    )
+    conn.close()
+    return df
+
+
+def diff_reports(base_id: int, compare_id: int, threshold_pct: float = 5.0,
+                 level: Optional[str] = None, min_sent: int = 0) -> Optional[Dict]:
+    """
+    Compare two saved reports entity by entity
+
+    Both reports' normalized metric rows are aligned on (name, ESP, region) with one
+    outer join; an entity is returned when it only exists in one report or when any
+    metric moved by at least threshold_pct percent. Accounts are compared per ESP.
+
+    Args:
+        base_id: Earlier snapshot
+        compare_id: Later snapshot
+        threshold_pct: Minimum absolute percent change of any metric to report
+        level: 'domain', 'account' or 'esp' (defaults to the reports' own level)
+        min_sent: Ignore entities sending less than this in both reports
+
+    Returns:
+        Dict with both reports' metadata, counts and the changed rows (largest sent
+        change first), or None if either report does not exist
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    metas = []
+    for report_id in (base_id, compare_id):
+        row = _get_report_meta(cursor, report_id)
+        if not row:
+            conn.close()
+            return None
+        metas.append({column: row[column] for column in REPORT_META_COLUMNS})
+    conn.close()
+
+    if metas[0]['report_type'] != metas[1]['report_type']:
+        raise ValueError('Cannot compare a domain report with an account report')
+    level = level or DIFF_LEVELS[metas[0]['report_type']]
+
+    keys = ['name', 'esp', 'region']
+    frames = []
+    for report_id in (base_id, compare_id):
+        metrics = get_report_metrics(report_id, level)
+        if level == 'account':
+            # esp='ALL' rows only exist for the overall top 10, so an account crossing
+            # that line would look added/removed; compare the per-ESP rows only
+            metrics = metrics[metrics['esp'] != ALL]
+        frames.append(metrics.groupby(keys)[METRIC_COLUMNS].sum())
+    base, compare = frames
+    joined = base.join(compare, how='outer', lsuffix='_base', rsuffix='_compare')
+
+    in_base = joined.index.isin(base.index)
+    in_compare = joined.index.isin(compare.index)
+    joined = joined.fillna(0)
+
+    before = joined[[f'{m}_base' for m in METRIC_COLUMNS]].to_numpy(dtype=float)
+    after = joined[[f'{m}_compare' for m in METRIC_COLUMNS]].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change_pct = np.where(before > 0, (after - before) / before * 100, np.where(after > 0, np.inf, 0.0))
+
+    changed = (np.abs(change_pct) >= threshold_pct).any(axis=1) | ~in_base | ~in_compare
+    if min_sent:
+        changed &= np.maximum(before[:, 0], after[:, 0]) >= min_sent
+
+    result = joined[changed].reset_index()
+    result.insert(3, 'status', np.where(~in_base[changed], 'added', np.where(~in_compare[changed], 'removed', 'changed')))
+    for i, metric in enumerate(METRIC_COLUMNS):
+        pct = np.round(change_pct[changed, i], 2)
+        result[f'{metric}_change'] = after[changed, i] - before[changed, i]
+        # Changes from 0 have no percentage
+        result[f'{metric}_change_pct'] = pd.Series(pct, index=result.index).astype(object).where(np.isfinite(pct), None)
+
+    result = result.reindex(result['sent_change'].abs().sort_values(ascending=False).index)
+    volume_columns = [c for c in result.columns if c.endswith(('_base', '_compare', '_change'))]
+    result[volume_columns] = result[volume_columns].astype(np.int64)
+
     return {
-        'id': row['id'],
-        'report_type': row['report_type'],
-        'from_date': row['from_date'],
-        'to_date': row['to_date'],
-        'duration_days': row['duration_days'],
-        'total_domains': row['total_domains'],
-        'total_accounts': row['total_accounts'],
-        'report_data': json.loads(row['report_data']),
-        'created_at': row['created_at']
+        'base': metas[0],
+        'compare': metas[1],
+        'level': level,
+        'threshold_pct': threshold_pct,
+        'compared': int(len(joined)),
+        'changed': int(len(result)),
+        'added': int((result['status'] == 'added').sum()),
+        'removed': int((result['status'] == 'removed').sum()),
+        'rows': result.to_dict('records'),
     }
 
 
@@ -252,6 +873,8 @@ def delete_report(report_id: int) -> bool:
 
     cursor.execute('DELETE FROM mbr_reports WHERE id = ?', (report_id,))
     deleted = cursor.rowcount > 0
+    cursor.execute(f'DELETE FROM {METRICS_TABLE} WHERE report_id = ?', (report_id,))
+    cursor.execute(f'DELETE FROM {SECTIONS_TABLE} WHERE report_id = ?', (report_id,))
 
     conn.commit()
     conn.close()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+MBR Report Migration Script
+One-off re-encoding of reports saved as a single JSON blob into compressed sections
+"""
+import sys
+import os
+import argparse
+from datetime import datetime
+
+# Add the backend directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mbr_storage_service import count_unmigrated_reports, migrate_report_encoding
+
+def main():
+    """Re-encode old MBR reports, then VACUUM unless --no-vacuum is given"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--no-vacuum', action='store_true',
+                        help='Skip VACUUM (it needs free disk about the size of the database)')
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print(f"MBR Report Migration - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    try:
+        pending = count_unmigrated_reports()
+        print(f"Reports to migrate: {pending}")
+        migrated = migrate_report_encoding(vacuum=not args.no_vacuum)
+
+        print(f"\n✓ Migration completed successfully")
+        print(f"  - Reports migrated: {migrated}")
+        print(f"\n{'='*60}\n")
+
+        return 0
+    except Exception as e:
+        print(f"\n✗ Migration failed: {str(e)}")
+        print(f"\n{'='*60}\n")
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main())
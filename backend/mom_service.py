@@ -2,13 +2,14 @@
 MoM (Month-over-Month) Service
 Calculates send volume changes by comparing current period with previous period
 """
-import sqlite3
-import json
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
+from mbr_storage_service import ALL, SUMMARY_REGIONS, get_latest_report_id, get_report_metrics
 
-
-DB_PATH = '/Users/pankaj/pani/data/mbr_reports.db'
+# Column added to domain and account rows
+MOM_COLUMN = 'MoM_Send_Change_%'
 
 
 def get_previous_month_range(from_date: str, to_date: str) -> tuple:
@@ -39,107 +40,70 @@ def get_previous_month_range(from_date: str, to_date: str) -> tuple:
         return (None, None)
 
 
-def get_latest_report_for_period(from_date: str, to_date: str, report_type: str = 'domain') -> Optional[Dict]:
+def get_previous_period_metrics(from_date: str, to_date: str,
+                                report_type: str = 'domain') -> Optional[Dict[str, pd.DataFrame]]:
     """
-    Get the most recent report for a given date range
+    Load the previous period's metric rows as frames keyed like the current data
 
     Args:
-        from_date: Period start (YYYY-MM-DD)
-        to_date: Period end (YYYY-MM-DD)
+        from_date: Current period start
+        to_date: Current period end
         report_type: 'domain' or 'account'
 
     Returns:
-        Report data dict or None if not found
+        Domain reports: {'domain': From_domain/ESP/Region/Sent, 'esp': ESP/Region/Sent}
+        Account reports: {'account': Account/ESP/Sent}
+        Frames are empty when no previous report was saved; None if the previous
+        range cannot be calculated (no MoM is added at all in that case)
     """
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT report_data FROM mbr_reports
-            WHERE from_date = ? AND to_date = ? AND report_type = ?
-            ORDER BY created_at DESC LIMIT 1
-        ''', (from_date, to_date, report_type))
-
-        row = cursor.fetchone()
-        conn.close()
+    prev_from, prev_to = get_previous_month_range(from_date, to_date)
 
-        if row:
-            return json.loads(row['report_data'])
-        return None
-    except Exception as e:
-        print(f'Error fetching report: {e}')
+    if not prev_from or not prev_to:
+        print('Could not calculate previous month range')
         return None
 
+    levels = {'domain': ['domain', 'esp'], 'account': ['account']}[report_type]
+    name_column = 'Account' if report_type == 'account' else 'From_domain'
 
-def build_domain_send_map(report_data: Dict) -> Dict[str, int]:
-    """
-    Build a mapping of domain -> sent volume from report data
+    # Only the indexed metric rows of the previous report are read
+    prev_report_id = get_latest_report_id(prev_from, prev_to, report_type=report_type)
+    if prev_report_id is None:
+        print(f'No previous {report_type} report found for {prev_from} to {prev_to}')
 
-    Args:
-        report_data: Full report data with esp_data structure
+    previous = {}
+    for level in levels:
+        if prev_report_id is None:
+            metrics = pd.DataFrame(columns=['name', 'esp', 'region', 'sent'])
+        else:
+            metrics = get_report_metrics(prev_report_id, level)
+        previous[level] = metrics[['name', 'esp', 'region', 'sent']].rename(columns={
+            'name': name_column, 'esp': 'ESP', 'region': 'Region', 'sent': 'Sent'
+        })
+    return previous
 
-    Returns:
-        Dict mapping domain name to sent volume
-    """
-    domain_map = {}
-
-    if not report_data or 'esp_data' not in report_data:
-        return domain_map
-
-    # Iterate through all ESPs and their domain data
-    for esp_name, esp_data in report_data.get('esp_data', {}).items():
-        all_data = esp_data.get('all_data', [])
-
-        for domain_row in all_data:
-            domain = domain_row.get('From_domain')
-            sent = domain_row.get('Sent', 0)
 
-            if domain:
-                # Sum across ESPs if domain appears in multiple
-                domain_map[domain] = domain_map.get(domain, 0) + sent
+def build_esp_summary_send_map(esp_metrics: pd.DataFrame) -> Dict[Tuple[str, str], int]:
+    """Build a mapping of (ESP, region) -> summary sent volume from the previous 'esp' frame"""
+    if esp_metrics.empty:
+        return {}
+    return dict(zip(zip(esp_metrics['ESP'], esp_metrics['Region']), esp_metrics['Sent']))
 
-    return domain_map
 
-
-def build_account_send_map(report_data: Dict) -> Dict[str, int]:
+def build_account_totals(account_metrics: pd.DataFrame) -> pd.DataFrame:
     """
-    Build a mapping of account -> sent volume from report data
-
-    Args:
-        report_data: Full report data with account_data structure
+    Sent per account from the previous 'account' frame
 
-    Returns:
-        Dict mapping account name to sent volume
+    Per-ESP rows are summed across ESPs; accounts that only appear in the overall
+    top list (ESP = 'ALL', reports saved before all_accounts existed) use that row.
     """
-    account_map = {}
-
-    if not report_data or 'esp_data' not in report_data:
-        return account_map
-
-    # For account view, we need to aggregate by account across all ESPs
-    for esp_name, esp_data in report_data.get('esp_data', {}).items():
-        # Check for top10_accounts data
-        top_accounts = esp_data.get('top10_accounts', [])
-
-        for account_row in top_accounts:
-            account = account_row.get('Account')
-            sent = account_row.get('Sent', 0)
-
-            if account:
-                account_map[account] = account_map.get(account, 0) + sent
-
-    # Also check overall top accounts if present
-    top_accounts_overall = report_data.get('top10_accounts_overall', [])
-    for account_row in top_accounts_overall:
-        account = account_row.get('Account')
-        sent = account_row.get('Sent', 0)
+    if account_metrics.empty:
+        return pd.DataFrame(columns=['Account', 'Sent'])
 
-        if account and account not in account_map:
-            account_map[account] = sent
-
-    return account_map
+    overall = account_metrics['ESP'] == ALL
+    per_esp = account_metrics[~overall].groupby('Account')['Sent'].sum()
+    top_overall = account_metrics[overall].groupby('Account')['Sent'].first()
+    totals = per_esp.combine_first(top_overall)
+    return totals.rename_axis('Account').reset_index(name='Sent')
 
 
 def calculate_mom_change(current_sent: int, previous_sent: int) -> Optional[float]:
@@ -160,175 +124,58 @@ def calculate_mom_change(current_sent: int, previous_sent: int) -> Optional[floa
     return round(change, 2)
 
 
-def add_mom_to_domain_data(current_data: Dict, from_date: str, to_date: str) -> Dict:
+def add_mom_column(df: pd.DataFrame, previous: pd.DataFrame, keys: List[str]) -> pd.DataFrame:
     """
-    Add MoM Send change to domain-level report data
+    Add MoM_Send_Change_% to a frame with a keyed merge against the previous period
 
     Args:
-        current_data: Current report data
-        from_date: Current period start
-        to_date: Current period end
+        df: Current rows with the key columns and Sent
+        previous: Previous period rows with the key columns and Sent (summed per key)
+        keys: Columns identifying the same entity in both periods
 
     Returns:
-        Updated report data with mom_send_change added to each domain
+        Copy of df with the percent change, None where the previous volume is 0 or missing
     """
-    # Get previous month's date range
-    prev_from, prev_to = get_previous_month_range(from_date, to_date)
-
-    if not prev_from or not prev_to:
-        print('Could not calculate previous month range')
-        return current_data
-
-    # Fetch previous month's report
-    prev_report = get_latest_report_for_period(prev_from, prev_to, report_type='domain')
-
-    if not prev_report:
-        print(f'No previous report found for {prev_from} to {prev_to}')
-        # Add None values to indicate no comparison data
-        if 'esp_data' in current_data:
-            for esp_name, esp_data in current_data['esp_data'].items():
-                # Set MoM to None for ESP summaries
-                if 'us_summary' in esp_data and esp_data['us_summary']:
-                    esp_data['us_summary']['MoM_Send_Change'] = None
-                if 'eu_summary' in esp_data and esp_data['eu_summary']:
-                    esp_data['eu_summary']['MoM_Send_Change'] = None
-                if 'combined_summary' in esp_data and esp_data['combined_summary']:
-                    esp_data['combined_summary']['MoM_Send_Change'] = None
-
-                # Set MoM to None for domains
-                if 'all_data' in esp_data:
-                    for domain_row in esp_data['all_data']:
-                        domain_row['MoM_Send_Change_%'] = None
-
-                if 'top10_domains' in esp_data:
-                    for domain_row in esp_data['top10_domains']:
-                        domain_row['MoM_Send_Change_%'] = None
-
-        if 'top10_overall' in current_data:
-            for domain_row in current_data['top10_overall']:
-                domain_row['MoM_Send_Change_%'] = None
-
-        return current_data
-
-    # Build domain -> sent mapping from previous report
-    prev_domain_map = build_domain_send_map(prev_report)
-
-    print(f'Found previous report with {len(prev_domain_map)} domains')
-
-    # Add MoM to ESP summaries and domains
-    if 'esp_data' in current_data:
-        for esp_name, esp_data in current_data['esp_data'].items():
-            # Get previous ESP data
-            prev_esp_data = prev_report.get('esp_data', {}).get(esp_name, {})
-
-            # Add MoM to US summary
-            if 'us_summary' in esp_data and esp_data['us_summary']:
-                current_sent = esp_data['us_summary'].get('Total_Sent', 0)
-                prev_sent = prev_esp_data.get('us_summary', {}).get('Total_Sent', 0) if prev_esp_data else 0
-                esp_data['us_summary']['MoM_Send_Change'] = calculate_mom_change(current_sent, prev_sent)
-
-            # Add MoM to EU summary
-            if 'eu_summary' in esp_data and esp_data['eu_summary']:
-                current_sent = esp_data['eu_summary'].get('Total_Sent', 0)
-                prev_sent = prev_esp_data.get('eu_summary', {}).get('Total_Sent', 0) if prev_esp_data else 0
-                esp_data['eu_summary']['MoM_Send_Change'] = calculate_mom_change(current_sent, prev_sent)
-
-            # Add MoM to combined summary
-            if 'combined_summary' in esp_data and esp_data['combined_summary']:
-                current_sent = esp_data['combined_summary'].get('Total_Sent', 0)
-                prev_sent = prev_esp_data.get('combined_summary', {}).get('Total_Sent', 0) if prev_esp_data else 0
-                esp_data['combined_summary']['MoM_Send_Change'] = calculate_mom_change(current_sent, prev_sent)
-
-            # Update all_data
-            if 'all_data' in esp_data:
-                for domain_row in esp_data['all_data']:
-                    domain = domain_row.get('From_domain')
-                    current_sent = domain_row.get('Sent', 0)
-                    prev_sent = prev_domain_map.get(domain, 0)
-
-                    domain_row['MoM_Send_Change_%'] = calculate_mom_change(current_sent, prev_sent)
-
-            # Update top10_domains
-            if 'top10_domains' in esp_data:
-                for domain_row in esp_data['top10_domains']:
-                    domain = domain_row.get('From_domain')
-                    current_sent = domain_row.get('Sent', 0)
-                    prev_sent = prev_domain_map.get(domain, 0)
-
-                    domain_row['MoM_Send_Change_%'] = calculate_mom_change(current_sent, prev_sent)
-
-    # Update top10_overall
-    if 'top10_overall' in current_data:
-        for domain_row in current_data['top10_overall']:
-            domain = domain_row.get('From_domain')
-            current_sent = domain_row.get('Sent', 0)
-            prev_sent = prev_domain_map.get(domain, 0)
-
-            domain_row['MoM_Send_Change_%'] = calculate_mom_change(current_sent, prev_sent)
-
-    return current_data
-
-
-def add_mom_to_account_data(current_data: Dict, from_date: str, to_date: str) -> Dict:
+    df = df.copy()
+    if df.empty:
+        df[MOM_COLUMN] = pd.Series(dtype=object)
+        return df
+
+    prev_sent = previous.groupby(keys)['Sent'].sum().rename('_prev_sent')
+    prev = df[keys].merge(prev_sent, left_on=keys, right_index=True, how='left')['_prev_sent']
+    prev = prev.fillna(0).to_numpy(dtype=float)
+    current = df['Sent'].to_numpy(dtype=float)
+
+    has_prev = prev != 0
+    change = pd.Series(
+        ((current - prev) / np.where(has_prev, prev, 1.0) * 100).round(2), index=df.index
+    )
+    df[MOM_COLUMN] = change.astype(object).where(has_prev, None)
+    return df
+
+
+def add_mom_to_summaries(esp_block: Dict, esp: str, previous_summaries: Dict[Tuple[str, str], int]):
+    """Set MoM_Send_Change on an ESP block's US, EU and combined summaries"""
+    for key, region in SUMMARY_REGIONS.items():
+        if esp_block.get(key):
+            esp_block[key]['MoM_Send_Change'] = calculate_mom_change(
+                esp_block[key].get('Total_Sent', 0), previous_summaries.get((esp, region), 0)
+            )
+
+
+def add_mom_to_esp_frames(frames: Dict, previous: Dict[str, pd.DataFrame]):
     """
-    Add MoM Send change to account-level report data
+    Add MoM send change to druid_service.build_esp_frames output in place
 
-    Args:
-        current_data: Current report data
-        from_date: Current period start
-        to_date: Current period end
-
-    Returns:
-        Updated report data with mom_send_change added to each account
+    Domain rows are matched on (From_domain, ESP, Region), per-ESP top 10 on the
+    domain's total for that ESP, and summaries on the previous ESP/region totals.
     """
-    # Get previous month's date range
-    prev_from, prev_to = get_previous_month_range(from_date, to_date)
-
-    if not prev_from or not prev_to:
-        print('Could not calculate previous month range')
-        return current_data
-
-    # Fetch previous month's report
-    prev_report = get_latest_report_for_period(prev_from, prev_to, report_type='account')
-
-    if not prev_report:
-        print(f'No previous account report found for {prev_from} to {prev_to}')
-        # Add None values to indicate no comparison data
-        if 'esp_data' in current_data:
-            for esp_name, esp_data in current_data['esp_data'].items():
-                if 'top10_accounts' in esp_data:
-                    for account_row in esp_data['top10_accounts']:
-                        account_row['MoM_Send_Change_%'] = None
-
-        if 'top10_accounts_overall' in current_data:
-            for account_row in current_data['top10_accounts_overall']:
-                account_row['MoM_Send_Change_%'] = None
-
-        return current_data
-
-    # Build account -> sent mapping from previous report
-    prev_account_map = build_account_send_map(prev_report)
-
-    print(f'Found previous account report with {len(prev_account_map)} accounts')
-
-    # Add MoM to each account in current report
-    if 'esp_data' in current_data:
-        for esp_name, esp_data in current_data['esp_data'].items():
-            if 'top10_accounts' in esp_data:
-                for account_row in esp_data['top10_accounts']:
-                    account = account_row.get('Account')
-                    current_sent = account_row.get('Sent', 0)
-                    prev_sent = prev_account_map.get(account, 0)
-
-                    account_row['MoM_Send_Change_%'] = calculate_mom_change(current_sent, prev_sent)
-
-    # Update top10_accounts_overall
-    if 'top10_accounts_overall' in current_data:
-        for account_row in current_data['top10_accounts_overall']:
-            account = account_row.get('Account')
-            current_sent = account_row.get('Sent', 0)
-            prev_sent = prev_account_map.get(account, 0)
-
-            account_row['MoM_Send_Change_%'] = calculate_mom_change(current_sent, prev_sent)
-
-    return current_data
+    prev_domains = previous['domain']
+    prev_summaries = build_esp_summary_send_map(previous['esp'])
+
+    for esp, block in frames.items():
+        block['all_data'] = add_mom_column(block['all_data'], prev_domains, ['From_domain', 'ESP', 'Region'])
+        block['top10_domains'] = add_mom_column(
+            block['top10_domains'], prev_domains[prev_domains['ESP'] == esp], ['From_domain']
+        )
+        add_mom_to_summaries(block, esp, prev_summaries)
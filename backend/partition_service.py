@@ -0,0 +1,268 @@
+"""
+Partition Service
+Monthly table partitioning helpers for the SQLite history stores
+
+Each partitioned store keeps one table per month named <base>_YYYY_MM and a
+UNION ALL view named <base> over all of them, so existing readers keep working.
+Retention drops whole monthly tables instead of running DELETE on a single table,
+and range queries can select from only the partitions that overlap the range.
+"""
+import sqlite3
+from datetime import datetime, date
+from typing import Callable, List, Optional, Tuple, Union
+
+DateLike = Union[str, date, datetime]
+
+
+def to_date(value: DateLike) -> date:
+    """Convert a YYYY-MM-DD string (or longer ISO timestamp), date or datetime to a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def partition_name(base: str, value: DateLike) -> str:
+    """Get the monthly partition table name for a date"""
+    d = to_date(value)
+    return f'{base}_{d.year:04d}_{d.month:02d}'
+
+
+def partition_bounds(base: str, name: str) -> Tuple[str, str]:
+    """Get (first day, first day of next month) for a partition table name"""
+    year, month = int(name[len(base) + 1:len(base) + 5]), int(name[-2:])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return (f'{year:04d}-{month:02d}-01', f'{next_year:04d}-{next_month:02d}-01')
+
+
+def list_partitions(cursor: sqlite3.Cursor, base: str) -> List[str]:
+    """List partition tables for a store, oldest first"""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+        (f'{base}_[0-9][0-9][0-9][0-9]_[0-9][0-9]',)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partition(cursor: sqlite3.Cursor, base: str, value: DateLike,
+                     ddl: str, indexes: List[str] = None, view_columns: str = None) -> str:
+    """
+    Create the partition for a date if it does not exist yet
+
+    Args:
+        base: Store name (also the name of the union view)
+        value: Any date inside the month
+        ddl: CREATE TABLE statement with a {table} placeholder
+        indexes: CREATE INDEX statements with {table} placeholders
+        view_columns: If given, refresh the union view when a partition is created
+
+    Returns:
+        Partition table name
+    """
+    table = partition_name(base, value)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    if cursor.fetchone():
+        return table
+
+    cursor.execute(ddl.format(table=table))
+    for index_sql in indexes or []:
+        cursor.execute(index_sql.format(table=table))
+    if view_columns:
+        refresh_union_view(cursor, base, view_columns)
+    return table
+
+
+def partition_resolver(cursor: sqlite3.Cursor, base: str, ddl: str, indexes: List[str] = None,
+                       view_columns: str = None) -> Callable[[DateLike], str]:
+    """
+    ensure_partition for a batch of rows, checking each month only once
+
+    Returns:
+        Function mapping a date to its partition table name
+    """
+    tables = {}
+
+    def resolve(value: DateLike) -> str:
+        name = partition_name(base, value)
+        if name not in tables:
+            tables[name] = ensure_partition(cursor, base, value, ddl, indexes, view_columns)
+        return tables[name]
+
+    return resolve
+
+
+def refresh_union_view(cursor: sqlite3.Cursor, base: str, columns: str):
+    """(Re)create the <base> view as a UNION ALL over all partitions"""
+    partitions = list_partitions(cursor, base)
+    cursor.execute(f'DROP VIEW IF EXISTS {base}')
+    if not partitions:
+        return
+    union = '\nUNION ALL\n'.join(f'SELECT {columns} FROM {p}' for p in partitions)
+    cursor.execute(f'CREATE VIEW {base} AS\n{union}')
+
+
+def partitions_for_range(cursor: sqlite3.Cursor, base: str,
+                         start_date: DateLike = None, end_date: DateLike = None) -> List[str]:
+    """List partitions overlapping [start_date, end_date] (either bound may be None)"""
+    start = to_date(start_date).isoformat() if start_date is not None else None
+    end = to_date(end_date).isoformat() if end_date is not None else None
+
+    selected = []
+    for name in list_partitions(cursor, base):
+        first_day, next_first_day = partition_bounds(base, name)
+        if start is not None and next_first_day <= start:
+            continue
+        if end is not None and first_day > end:
+            continue
+        selected.append(name)
+    return selected
+
+
+def partitioned_source(cursor: sqlite3.Cursor, base: str, columns: str,
+                       start_date: DateLike = None, end_date: DateLike = None) -> str:
+    """
+    Build a FROM source that reads only the partitions overlapping a date range
+
+    The caller still applies its own date filter; this only prunes whole months.
+    """
+    partitions = partitions_for_range(cursor, base, start_date, end_date)
+    if not partitions:
+        # Keep the column shape so the caller's query still compiles
+        partitions = list_partitions(cursor, base)[-1:]
+        if not partitions:
+            return f'(SELECT {columns} FROM {base} WHERE 0)'
+        return f'(SELECT {columns} FROM {partitions[0]} WHERE 0)'
+    union = ' UNION ALL '.join(f'SELECT {columns} FROM {p}' for p in partitions)
+    return f'({union})'
+
+
+def drop_partitions_before(cursor: sqlite3.Cursor, base: str, cutoff_date: DateLike,
+                           columns: str) -> int:
+    """
+    Drop every partition whose month ends before the cutoff date
+
+    The month containing the cutoff is kept whole, so retention is month-granular.
+
+    Returns:
+        Number of rows removed with the dropped partitions
+    """
+    cutoff = to_date(cutoff_date).isoformat()
+    dropped_rows = 0
+    dropped = False
+
+    for name in list_partitions(cursor, base):
+        _, next_first_day = partition_bounds(base, name)
+        if next_first_day <= cutoff:
+            cursor.execute(f'SELECT COUNT(*) FROM {name}')
+            dropped_rows += cursor.fetchone()[0]
+            cursor.execute(f'DROP TABLE {name}')
+            dropped = True
+
+    if dropped:
+        refresh_union_view(cursor, base, columns)
+    return dropped_rows
+
+
+def table_columns(cursor: sqlite3.Cursor, table: str) -> List[str]:
+    """Column names of a table, in declaration order"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return [row[1] for row in cursor.fetchall()]
+
+
+def ddl_from_table(cursor: sqlite3.Cursor, table: str) -> str:
+    """
+    CREATE TABLE statement (with a {table} placeholder) reproducing a live table's columns
+
+    Built from PRAGMA table_info: column types, NOT NULL, defaults and the primary
+    key carry over; other table constraints do not.
+    """
+    cursor.execute(f'PRAGMA table_info({table})')
+    rows = cursor.fetchall()
+    if not rows:
+        raise ValueError(f'Table {table} does not exist')
+
+    definitions = []
+    for _, name, col_type, notnull, default, _ in rows:
+        definition = f'"{name}" {col_type}'.rstrip()
+        if notnull:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f' DEFAULT ({default})'
+        definitions.append(definition)
+
+    primary_key = [row[1] for row in sorted(rows, key=lambda row: row[5]) if row[5]]
+    if primary_key:
+        definitions.append('PRIMARY KEY ({})'.format(', '.join(f'"{c}"' for c in primary_key)))
+
+    # Braces in defaults must survive the caller's ddl.format(table=...)
+    columns = ',\n        '.join(definitions).replace('{', '{{').replace('}', '}}')
+    return 'CREATE TABLE IF NOT EXISTS {table} (\n        ' + columns + '\n    )'
+
+
+def migrate_to_partitions(cursor: sqlite3.Cursor, source_table: str, base: str, date_column: str,
+                          ddl: Optional[str], indexes: List[str], insert_columns: str = None,
+                          select_sql: str = None) -> int:
+    """
+    Split an existing single table into monthly partitions and drop it
+
+    The copy runs inside a savepoint and the source is only dropped once every one
+    of its rows is in a partition; otherwise the copy is rolled back and a
+    RuntimeError is raised (e.g. for rows without a date).
+
+    Args:
+        source_table: Table to migrate (dropped afterwards)
+        date_column: Date column in the source table
+        ddl: Partition CREATE TABLE with a {table} placeholder, or None to reproduce
+             the source table's own columns (see ddl_from_table)
+        insert_columns: Column list to insert into each partition (defaults to
+                        every column of the source table)
+        select_sql: SELECT producing insert_columns with a {where} placeholder
+                    (defaults to selecting insert_columns from source_table)
+
+    Returns:
+        Number of rows migrated
+    """
+    if ddl is None:
+        ddl = ddl_from_table(cursor, source_table)
+    if insert_columns is None:
+        insert_columns = ', '.join(f'"{c}"' for c in table_columns(cursor, source_table))
+    if select_sql is None:
+        select_sql = f'SELECT {insert_columns} FROM {source_table} WHERE {{where}}'
+
+    cursor.execute('SAVEPOINT migrate_partitions')
+    try:
+        cursor.execute(f'SELECT COUNT(*) FROM {source_table}')
+        expected = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'SELECT DISTINCT substr({date_column}, 1, 7) FROM {source_table} WHERE {date_column} IS NOT NULL'
+        )
+        months = sorted(row[0] for row in cursor.fetchall())
+
+        migrated = 0
+        for month in months:
+            table = ensure_partition(cursor, base, f'{month}-01', ddl, indexes)
+            first_day, next_first_day = partition_bounds(base, table)
+            where = f"{date_column} >= '{first_day}' AND {date_column} < '{next_first_day}'"
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            before = cursor.fetchone()[0]
+            cursor.execute(f'INSERT OR REPLACE INTO {table} ({insert_columns}) {select_sql.format(where=where)}')
+            cursor.execute(f'SELECT COUNT(*) FROM {table}')
+            migrated += cursor.fetchone()[0] - before
+
+        if migrated != expected:
+            raise RuntimeError(
+                f'Refusing to drop {source_table}: only {migrated} of its {expected} rows were copied '
+                f'into partitions (check for rows with a missing or malformed {date_column})'
+            )
+
+        cursor.execute(f'DROP TABLE {source_table}')
+    except BaseException:
+        cursor.execute('ROLLBACK TO migrate_partitions')
+        cursor.execute('RELEASE migrate_partitions')
+        raise
+    cursor.execute('RELEASE migrate_partitions')
+
+    print(f'Migrated {migrated} rows from {source_table} into {len(months)} monthly partitions')
+    return migrated
@@ -0,0 +1,154 @@
+"""
+PDF Render Service
+Renders MBR PDFs in a bounded process pool so ReportLab never runs on the event loop
+
+Renders are submitted to a spawn-based ProcessPoolExecutor with PDF_RENDER_WORKERS
+processes. Requests that find PDF_RENDER_MAX_QUEUE renders already waiting are rejected
+instead of piling up, and callers stop waiting after PDF_RENDER_TIMEOUT_SECONDS (the
+abandoned render still counts as in flight until its worker is done). Queue
+depth and timing counters are kept for the stats endpoint.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+from config import PDF_RENDER_WORKERS, PDF_RENDER_MAX_QUEUE, PDF_RENDER_TIMEOUT_SECONDS
+from export_service import export_to_pdf
+
+
+class RenderQueueFull(Exception):
+    """Raised when too many renders are already waiting for a worker"""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render does not finish within PDF_RENDER_TIMEOUT_SECONDS"""
+
+
+_pool = None
+_lock = threading.Lock()
+
+_stats = {
+    'in_flight': 0,
+    'peak_in_flight': 0,
+    'completed': 0,
+    'failed': 0,
+    'rejected': 0,
+    'timed_out': 0,
+    'total_render_seconds': 0.0,
+}
+
+
+def _render(esp_data: Dict, df_combined: pd.DataFrame, from_date: str, to_date: str,
+            account_data: Optional[Dict], account_name: Optional[str]):
+    """Worker entry point: render one PDF and time it"""
+    start = time.perf_counter()
+    pdf_data = export_to_pdf(esp_data, df_combined, from_date, to_date, account_data, account_name)
+    return pdf_data, time.perf_counter() - start
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Create the worker pool on first use (spawn keeps workers free of the server's threads)"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _pool
+
+
+def _reset_pool():
+    """Drop a broken pool so the next render starts a fresh one"""
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _release(_future=None):
+    """Free a render's slot once its worker is done with it (or it never started)"""
+    with _lock:
+        _stats['in_flight'] -= 1
+
+
+def _finish(outcome: str, render_seconds: float = 0.0):
+    with _lock:
+        _stats[outcome] += 1
+        _stats['total_render_seconds'] += render_seconds
+
+
+async def render_pdf(esp_data: Dict, df_combined: pd.DataFrame, from_date: str, to_date: str,
+                     account_data: Dict = None, account_name: str = None) -> bytes:
+    """
+    Render an MBR PDF in the process pool without blocking the event loop
+
+    Takes the same arguments as export_service.export_to_pdf.
+
+    Raises:
+        RenderQueueFull: PDF_RENDER_MAX_QUEUE renders are already waiting
+        RenderTimeout: The render took longer than PDF_RENDER_TIMEOUT_SECONDS
+    """
+    with _lock:
+        if _stats['in_flight'] - PDF_RENDER_WORKERS >= PDF_RENDER_MAX_QUEUE:
+            _stats['rejected'] += 1
+            raise RenderQueueFull(
+                f'PDF renderer is busy ({_stats["in_flight"]} renders in progress), try again shortly'
+            )
+        _stats['in_flight'] += 1
+        _stats['peak_in_flight'] = max(_stats['peak_in_flight'], _stats['in_flight'])
+        pool = _get_pool()
+
+    try:
+        future = pool.submit(_render, esp_data, df_combined, from_date, to_date, account_data, account_name)
+    except BaseException:
+        _release()
+        _finish('failed')
+        raise
+    # in_flight tracks the worker, not the caller: a render abandoned on timeout keeps
+    # its slot until it actually finishes (or is cancelled before it starts)
+    future.add_done_callback(_release)
+
+    try:
+        # wait_for cancels the wrapped future on timeout, which drops a render that
+        # has not started yet; one already running finishes in its worker and is discarded
+        pdf_data, render_seconds = await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=PDF_RENDER_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        _finish('timed_out')
+        raise RenderTimeout(f'PDF rendering took longer than {PDF_RENDER_TIMEOUT_SECONDS}s')
+    except BrokenProcessPool:
+        _finish('failed')
+        _reset_pool()
+        raise
+    except BaseException:
+        _finish('failed')
+        raise
+
+    _finish('completed', render_seconds)
+    return pdf_data
+
+
+def get_render_stats() -> Dict:
+    """Current queue depth and lifetime counters of the PDF renderer"""
+    with _lock:
+        stats = dict(_stats)
+
+    finished = stats['completed']
+    stats['queue_depth'] = max(0, stats['in_flight'] - PDF_RENDER_WORKERS)
+    stats['running'] = min(stats['in_flight'], PDF_RENDER_WORKERS)
+    stats['avg_render_seconds'] = round(stats.pop('total_render_seconds') / finished, 3) if finished else None
+    stats['workers'] = PDF_RENDER_WORKERS
+    stats['max_queue'] = PDF_RENDER_MAX_QUEUE
+    stats['timeout_seconds'] = PDF_RENDER_TIMEOUT_SECONDS
+    return stats
+
+
+def shutdown_renderer():
+    """Stop the worker processes (called on application shutdown)"""
+    _reset_pool()
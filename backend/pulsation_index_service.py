@@ -0,0 +1,284 @@
+"""
+Pulsation Range Index Service
+In-memory cumulative (prefix-sum) index over daily_metrics for fast custom-range queries
+
+Every (domain, region, ESP) key gets its own segment in a flat array of rows sorted by
+(key, day). A running total over that array turns any range sum into two lookups:
+the cumulative value at the end of the range minus the value at its start.
+"""
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Union
+from pulsation_service import DB_PATH, RETENTION_DAYS
+
+# Volume columns kept in the index (daily_metrics column -> API column)
+INDEX_METRICS = {
+    'sent': 'Sent',
+    'delivered': 'Delivered',
+    'bounces': 'Bounces',
+    'soft_bounce_count': 'Soft_bounce_count',
+    'unique_soft_bounce': 'Unique_soft_bounce',
+    'spam_report': 'Spam_report',
+    'unsubscribe': 'Unsubscribe',
+}
+
+# Day ordinals fit in 20 bits, so (key_id, day) packs into one sortable int64 code
+DAY_BITS = 20
+
+# Index storage
+_index = {
+    'built': False,
+    'keys': [],           # key_id -> (from_domain, region, esp)
+    'key_ids': {},        # (from_domain, region, esp) -> key_id
+    'domain_keys': {},    # from_domain -> [key_id, ...]
+    'codes': np.empty(0, dtype=np.int64),                       # sorted (key_id << DAY_BITS) | day ordinal
+    'cum': np.zeros((1, len(INDEX_METRICS)), dtype=np.int64),   # cum[i] = sum of rows before i
+    'built_at': None,
+    'building': False,
+    'pending_days': [],   # days collected while a build was reading the database
+}
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def _to_ordinal(value: Union[str, date, datetime]) -> int:
+    """Convert a YYYY-MM-DD string, date or datetime to a day ordinal"""
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+def _key_id(key: tuple) -> int:
+    """Get id for a (domain, region, esp) key, registering it if new"""
+    key_id = _index['key_ids'].get(key)
+    if key_id is None:
+        key_id = len(_index['keys'])
+        _index['keys'].append(key)
+        _index['key_ids'][key] = key_id
+        _index['domain_keys'].setdefault(key[0], []).append(key_id)
+    return key_id
+
+
+def _encode_rows(df: pd.DataFrame) -> np.ndarray:
+    """Build (key_id, day) codes for rows with from_domain/region/esp/report_date columns"""
+    key_ids = np.fromiter(
+        (_key_id(key) for key in zip(df['from_domain'], df['region'], df['esp'])),
+        dtype=np.int64, count=len(df)
+    )
+    days = np.fromiter((_to_ordinal(d) for d in df['report_date']), dtype=np.int64, count=len(df))
+    return (key_ids << DAY_BITS) | days
+
+
+def _set_rows(codes: np.ndarray, values: np.ndarray):
+    """Replace index contents with the given (unsorted) rows"""
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    values = values[order]
+
+    cum = np.zeros((len(codes) + 1, len(INDEX_METRICS)), dtype=np.int64)
+    np.cumsum(values, axis=0, out=cum[1:])
+
+    _index['codes'] = codes
+    _index['cum'] = cum
+
+
+def _build():
+    """Read daily_metrics and install a fresh index (caller holds _build_lock)"""
+    with _lock:
+        _index['building'] = True
+        _index['pending_days'] = []
+
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        metric_cols = ', '.join(f'COALESCE({c}, 0) as {c}' for c in INDEX_METRICS)
+        df = pd.read_sql_query(
+            f'SELECT report_date, from_domain, region, esp, {metric_cols} FROM daily_metrics',
+            conn
+        )
+        conn.close()
+
+        with _lock:
+            _index['keys'] = []
+            _index['key_ids'] = {}
+            _index['domain_keys'] = {}
+
+            codes = _encode_rows(df)
+            values = df[list(INDEX_METRICS)].to_numpy(dtype=np.int64)
+            _set_rows(codes, values)
+
+            # Days collected during the read may be missing from it; re-applying one
+            # that made it in just replaces its rows with the same values
+            for day in _index['pending_days']:
+                _merge_day(day)
+
+            _index['built'] = True
+            _index['built_at'] = datetime.utcnow()
+            rows = len(_index['codes'])
+    finally:
+        with _lock:
+            _index['building'] = False
+            _index['pending_days'] = []
+
+    print(f'Pulsation range index built: {rows} rows, {len(_index["keys"])} keys')
+
+
+def build_range_index():
+    """Load all rows from daily_metrics and build the cumulative index from scratch"""
+    with _build_lock:
+        _build()
+
+
+def ensure_range_index():
+    """Build the index on first use (concurrent first queries share one build)"""
+    if _index['built']:
+        return
+    with _build_lock:
+        if not _index['built']:
+            _build()
+
+
+def _merge_day(day: pd.DataFrame):
+    """Replace one day's rows in the index (caller holds _lock)"""
+    new_codes = _encode_rows(day)
+    new_values = day[list(INDEX_METRICS)].to_numpy(dtype=np.int64)
+
+    codes = _index['codes']
+    values = np.diff(_index['cum'], axis=0)
+
+    # Rows being re-collected replace their previous values
+    keep = ~np.isin(codes, new_codes)
+    _set_rows(
+        np.concatenate([codes[keep], new_codes]),
+        np.concatenate([values[keep], new_values])
+    )
+
+
+def add_day_to_range_index(df: pd.DataFrame, report_date: str):
+    """
+    Merge one collected day into the index without re-reading the database
+
+    Args:
+        df: Processed Pulsation frame for the day (as passed to insert_daily_data)
+        report_date: Day the rows belong to (YYYY-MM-DD)
+    """
+    if df.empty:
+        return
+
+    day = pd.DataFrame({
+        'report_date': report_date,
+        'from_domain': df['From_domain'].fillna('').astype(str),
+        'region': df['Region'].fillna('').astype(str),
+        'esp': df['ESP'].fillna('').astype(str),
+    })
+    for col, api_col in INDEX_METRICS.items():
+        day[col] = pd.to_numeric(df[api_col], errors='coerce').fillna(0).astype(np.int64).to_numpy()
+
+    # Mirror INSERT OR REPLACE: last row per key wins
+    day = day.drop_duplicates(subset=['from_domain', 'region', 'esp'], keep='last')
+
+    with _lock:
+        if _index['building']:
+            # The running build may have read the database before this day landed
+            _index['pending_days'].append(day)
+        elif _index['built']:
+            _merge_day(day)
+        # Otherwise nothing to update - the next query builds from the database
+
+
+def prune_range_index(days: int = RETENTION_DAYS):
+    """Drop rows older than the retention window (mirrors cleanup_old_data)"""
+    if not _index['built']:
+        return
+
+    # cleanup_old_data drops whole months, keeping the month containing the cutoff
+    cutoff = (datetime.utcnow().date() - timedelta(days=days)).replace(day=1).toordinal()
+
+    with _lock:
+        codes = _index['codes']
+        keep = (codes & ((1 << DAY_BITS) - 1)) >= cutoff
+        if keep.all():
+            return
+        values = np.diff(_index['cum'], axis=0)
+        _set_rows(codes[keep], values[keep])
+
+
+def query_range_totals(start_date: Union[str, date, datetime], end_date: Union[str, date, datetime],
+                       domains: Optional[List[str]] = None, group_by: str = 'esp') -> pd.DataFrame:
+    """
+    Sum volumes and derive rates for any day range using the cumulative index
+
+    Args:
+        start_date: Range start (inclusive)
+        end_date: Range end (exclusive, same as query_date_range)
+        domains: Domains to include, None for all
+        group_by: 'esp' for one row per (domain, region, ESP), 'domain' for one row per domain
+
+    Returns:
+        DataFrame with the same volume and rate columns as query_date_range
+    """
+    ensure_range_index()
+
+    start_ord = _to_ordinal(start_date)
+    end_ord = _to_ordinal(end_date)
+
+    with _lock:
+        if domains is None:
+            key_ids = np.arange(len(_index['keys']), dtype=np.int64)
+        else:
+            domain_keys = _index['domain_keys']
+            key_ids = np.fromiter(
+                (k for d in domains for k in domain_keys.get(d.strip().lower(), [])),
+                dtype=np.int64
+            )
+        keys = [_index['keys'][k] for k in key_ids]
+        codes = _index['codes']
+        cum = _index['cum']
+
+        lo = np.searchsorted(codes, (key_ids << DAY_BITS) | start_ord, side='left')
+        hi = np.searchsorted(codes, (key_ids << DAY_BITS) | end_ord, side='left')
+        totals = cum[hi] - cum[lo]
+
+    has_data = hi > lo
+    df = pd.DataFrame(totals[has_data], columns=list(INDEX_METRICS.values()))
+    keys = [k for k, present in zip(keys, has_data) if present]
+    df.insert(0, 'From_domain', [k[0] for k in keys])
+    df.insert(1, 'Region', [k[1] for k in keys])
+    df.insert(2, 'ESP', [k[2] for k in keys])
+
+    if group_by == 'domain':
+        df = df.groupby('From_domain', as_index=False)[list(INDEX_METRICS.values())].sum()
+
+    return add_range_rates(df)
+
+
+def add_range_rates(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive rate columns from summed volumes (same rounding as query_date_range)"""
+    sent = df['Sent'].astype(float)
+    delivered = df['Delivered'].astype(float)
+
+    def rate(numerator: str, denominator: pd.Series, digits: int) -> pd.Series:
+        result = (100.0 * df[numerator] / denominator.where(denominator > 0)).round(digits)
+        return result.fillna(0.0)
+
+    df['delivery_rate'] = rate('Delivered', sent, 2)
+    df['spam_rate'] = rate('Spam_report', delivered, 4)
+    df['unsub_rate'] = rate('Unsubscribe', delivered, 4)
+    df['bounce_rate'] = rate('Bounces', sent, 4)
+    df['soft_bounce_pct'] = rate('Soft_bounce_count', sent, 4)
+    return df
+
+
+def get_range_index_status() -> Dict:
+    """Describe the current index (for diagnostics)"""
+    return {
+        'built': _index['built'],
+        'rows': int(len(_index['codes'])),
+        'keys': len(_index['keys']),
+        'domains': len(_index['domain_keys']),
+        'built_at': _index['built_at'].isoformat() if _index['built_at'] else None,
+    }
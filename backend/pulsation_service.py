@@ -1,10 +1,20 @@
 import sqlite3
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import os
 from druid_service import execute_druid_query, calculate_metrics
 from config import DRUID_US_BROKER, DRUID_EU_BROKER
+from downsample_service import lttb_indices, downsample_frame, validate_max_points
+from partition_service import (
+    ensure_partition,
+    refresh_union_view,
+    partition_name,
+    partitioned_source,
+    drop_partitions_before,
+    migrate_to_partitions
+)
 
 # Database path
 DB_PATH = '/Users/pankaj/pani/data/deliverability_history.db'
@@ -33,43 +43,161 @@ GROUP BY
 """
 
 
+# Dimension tables for dictionary-encoded columns (dimension table -> daily_metrics column)
+DIMENSIONS = {
+    'dim_domain': 'from_domain',
+    'dim_region': 'region',
+    'dim_esp': 'esp',
+    'dim_classification': 'classification',
+}
+
+METRIC_COLUMNS = [
+    'sent', 'delivered', 'bounces', 'soft_bounce_count', 'unique_soft_bounce',
+    'spam_report', 'unsubscribe', 'delivery_rate', 'spam_rate', 'unsub_rate',
+    'bounce_rate', 'soft_bounce_pct', 'risk_score'
+]
+
+# Fact rows are stored in monthly partitions (daily_metrics_fact_YYYY_MM) behind
+# a daily_metrics_fact union view
+FACT_TABLE = 'daily_metrics_fact'
+FACT_COLUMNS = (
+    'report_date, domain_id, region_id, esp_id, ' + ', '.join(METRIC_COLUMNS) +
+    ', classification_id, created_at'
+)
+# The primary key doubles as the (report_date, domain, region, esp) uniqueness constraint
+FACT_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        report_date TEXT NOT NULL,
+        domain_id INTEGER NOT NULL,
+        region_id INTEGER NOT NULL,
+        esp_id INTEGER NOT NULL,
+        sent INTEGER,
+        delivered INTEGER,
+        bounces INTEGER,
+        soft_bounce_count INTEGER,
+        unique_soft_bounce INTEGER,
+        spam_report INTEGER,
+        unsubscribe INTEGER,
+        delivery_rate REAL,
+        spam_rate REAL,
+        unsub_rate REAL,
+        bounce_rate REAL,
+        soft_bounce_pct REAL,
+        risk_score REAL,
+        classification_id INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (report_date, domain_id, region_id, esp_id)
+    ) WITHOUT ROWID
+"""
+FACT_INDEXES = ['CREATE INDEX IF NOT EXISTS idx_{table}_domain_date ON {table}(domain_id, report_date)']
+
+# Read-only view with the original daily_metrics columns
+DAILY_METRICS_VIEW = """
+    CREATE VIEW IF NOT EXISTS daily_metrics AS
+    SELECT
+        f.report_date,
+        d.name as from_domain,
+        r.name as region,
+        e.name as esp,
+        f.sent, f.delivered, f.bounces, f.soft_bounce_count, f.unique_soft_bounce,
+        f.spam_report, f.unsubscribe, f.delivery_rate, f.spam_rate, f.unsub_rate,
+        f.bounce_rate, f.soft_bounce_pct, f.risk_score,
+        c.name as classification,
+        f.created_at
+    FROM daily_metrics_fact f
+    JOIN dim_domain d ON d.id = f.domain_id
+    JOIN dim_region r ON r.id = f.region_id
+    JOIN dim_esp e ON e.id = f.esp_id
+    LEFT JOIN dim_classification c ON c.id = f.classification_id
+"""
+
+
 def init_pulsation_database():
-    """Create database and table if not exists"""
+    """Create database, dimension tables and fact partitions if not exists"""
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS daily_metrics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            report_date TEXT NOT NULL,
-            from_domain TEXT NOT NULL,
-            region TEXT NOT NULL,
-            esp TEXT NOT NULL,
-            sent INTEGER,
-            delivered INTEGER,
-            bounces INTEGER,
-            soft_bounce_count INTEGER,
-            unique_soft_bounce INTEGER,
-            spam_report INTEGER,
-            unsubscribe INTEGER,
-            delivery_rate REAL,
-            spam_rate REAL,
-            unsub_rate REAL,
-            bounce_rate REAL,
-            soft_bounce_pct REAL,
-            risk_score REAL,
-            classification TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(report_date, from_domain, region, esp)
-        )
-    """)
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_report_date ON daily_metrics(report_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_from_domain ON daily_metrics(from_domain)')
+
+    for table in DIMENSIONS:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL
+            )
+        """)
+
+    cursor.execute("SELECT name, type FROM sqlite_master WHERE name IN ('daily_metrics', ?)", (FACT_TABLE,))
+    existing = dict(cursor.fetchall())
+    migrated = False
+
+    # Migration: legacy TEXT-keyed daily_metrics table
+    if existing.get('daily_metrics') == 'table':
+        migrate_daily_metrics_table(cursor)
+        migrated = True
+
+    # Migration: unpartitioned fact table
+    if existing.get(FACT_TABLE) == 'table':
+        migrate_to_partitions(cursor, FACT_TABLE, FACT_TABLE, 'report_date', FACT_DDL, FACT_INDEXES, FACT_COLUMNS)
+        migrated = True
+
+    ensure_partition(cursor, FACT_TABLE, datetime.utcnow().date(), FACT_DDL, FACT_INDEXES)
+    refresh_union_view(cursor, FACT_TABLE, FACT_COLUMNS)
+    cursor.execute(DAILY_METRICS_VIEW)
     conn.commit()
+
+    if migrated:
+        # Reclaim the space freed by dropping the old table
+        conn.execute('VACUUM')
+
     conn.close()
     print(f'Pulsation database initialized at {DB_PATH}')
 
 
+def migrate_daily_metrics_table(cursor: sqlite3.Cursor):
+    """Copy the legacy daily_metrics table into dimension tables + fact partitions and drop it"""
+    print('Migrating daily_metrics to dictionary-encoded storage...')
+
+    for table, column in DIMENSIONS.items():
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {table} (name)
+            SELECT DISTINCT {column} FROM daily_metrics WHERE {column} IS NOT NULL
+        """)
+
+    old_metric_cols = ', '.join(f'm.{c}' for c in METRIC_COLUMNS)
+    select_sql = f"""
+        SELECT m.report_date, d.id, r.id, e.id, {old_metric_cols}, c.id, m.created_at
+        FROM daily_metrics m
+        JOIN dim_domain d ON d.name = m.from_domain
+        JOIN dim_region r ON r.name = m.region
+        JOIN dim_esp e ON e.name = m.esp
+        LEFT JOIN dim_classification c ON c.name = m.classification
+        WHERE {{where}}
+        ORDER BY m.id
+    """
+    migrate_to_partitions(
+        cursor, 'daily_metrics', FACT_TABLE, 'report_date', FACT_DDL, FACT_INDEXES, FACT_COLUMNS,
+        select_sql=select_sql
+    )
+
+
+def get_dimension_ids(cursor: sqlite3.Cursor, table: str, names: List[str]) -> Dict[str, int]:
+    """Get surrogate keys for dimension values, creating missing entries"""
+    names = list({n for n in names if n is not None})
+    if not names:
+        return {}
+
+    cursor.executemany(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', [(n,) for n in names])
+
+    ids = {}
+    # Stay under SQLite's bound-parameter limit
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        placeholders = ','.join('?' * len(chunk))
+        cursor.execute(f'SELECT name, id FROM {table} WHERE name IN ({placeholders})', chunk)
+        ids.update(dict(cursor.fetchall()))
+    return ids
+
+
 def pct(n, d):
     """Calculate percentage"""
     return 0.0 if (d == 0 or d is None) else (n / d) * 100.0
@@ -141,10 +269,14 @@ def data_exists_for_date(report_date: str) -> bool:
     """Check if data already exists for this date"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM daily_metrics WHERE report_date = ?', (report_date,))
-    count = cursor.fetchone()[0]
+    table = partition_name(FACT_TABLE, report_date)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    exists = False
+    if cursor.fetchone():
+        cursor.execute(f'SELECT 1 FROM {table} WHERE report_date = ? LIMIT 1', (report_date,))
+        exists = cursor.fetchone() is not None
     conn.close()
-    return count > 0
+    return exists
 
 
 def insert_daily_data(df: pd.DataFrame, report_date: str):
@@ -152,19 +284,22 @@ def insert_daily_data(df: pd.DataFrame, report_date: str):
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
 
-    for _, row in df.iterrows():
-        cursor.execute("""
-            INSERT OR REPLACE INTO daily_metrics
-            (report_date, from_domain, region, esp, sent, delivered, bounces,
-             soft_bounce_count, unique_soft_bounce, spam_report, unsubscribe,
-             delivery_rate, spam_rate, unsub_rate, bounce_rate, soft_bounce_pct,
-             risk_score, classification)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+    records = df.to_dict('records')
+
+    # Resolve dimension values to surrogate keys
+    domain_ids = get_dimension_ids(cursor, 'dim_domain', [r.get('From_domain', '') for r in records])
+    region_ids = get_dimension_ids(cursor, 'dim_region', [r.get('Region', '') for r in records])
+    esp_ids = get_dimension_ids(cursor, 'dim_esp', [r.get('ESP', '') for r in records])
+    classification_ids = get_dimension_ids(
+        cursor, 'dim_classification', [r.get('classification', 'Unclassified') for r in records]
+    )
+
+    rows = [
+        (
             report_date,
-            row.get('From_domain', ''),
-            row.get('Region', ''),
-            row.get('ESP', ''),
+            domain_ids[row.get('From_domain', '')],
+            region_ids[row.get('Region', '')],
+            esp_ids[row.get('ESP', '')],
             int(row.get('Sent', 0)),
             int(row.get('Delivered', 0)),
             int(row.get('Bounces', 0)),
@@ -178,8 +313,20 @@ def insert_daily_data(df: pd.DataFrame, report_date: str):
             float(row.get('bounce_rate', 0.0)),
             float(row.get('soft_bounce_pct', 0.0)),
             float(row.get('risk_score', 0.0)),
-            row.get('classification', 'Unclassified')
-        ))
+            classification_ids[row.get('classification', 'Unclassified')]
+        )
+        for row in records
+    ]
+
+    table = ensure_partition(cursor, FACT_TABLE, report_date, FACT_DDL, FACT_INDEXES, view_columns=FACT_COLUMNS)
+    cursor.executemany(f"""
+        INSERT OR REPLACE INTO {table}
+        (report_date, domain_id, region_id, esp_id, sent, delivered, bounces,
+         soft_bounce_count, unique_soft_bounce, spam_report, unsubscribe,
+         delivery_rate, spam_rate, unsub_rate, bounce_rate, soft_bounce_pct,
+         risk_score, classification_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
 
     conn.commit()
     conn.close()
@@ -187,12 +334,11 @@ def insert_daily_data(df: pd.DataFrame, report_date: str):
 
 
 def cleanup_old_data(days: int = RETENTION_DAYS):
-    """Delete records older than specified days"""
+    """Drop monthly partitions that are entirely older than specified days"""
     cutoff_date = (datetime.utcnow().date() - timedelta(days=days)).strftime('%Y-%m-%d')
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute('DELETE FROM daily_metrics WHERE report_date < ?', (cutoff_date,))
-    deleted_count = cursor.rowcount
+    deleted_count = drop_partitions_before(cursor, FACT_TABLE, cutoff_date, FACT_COLUMNS)
     conn.commit()
     conn.close()
     if deleted_count > 0:
@@ -202,39 +348,60 @@ def cleanup_old_data(days: int = RETENTION_DAYS):
 def query_date_range(start_date: datetime, end_date: datetime) -> pd.DataFrame:
     """Query and aggregate data for date range"""
     conn = sqlite3.connect(DB_PATH)
-    query = """
+    # Only read the monthly partitions overlapping [start_date, end_date)
+    source = partitioned_source(conn.cursor(), FACT_TABLE, FACT_COLUMNS, start_date, end_date - timedelta(days=1))
+    # Aggregate on integer keys, then decode the (much smaller) grouped result
+    query = f"""
         SELECT
-            from_domain as From_domain,
-            region as Region,
-            esp as ESP,
-            SUM(sent) as Sent,
-            SUM(delivered) as Delivered,
-            SUM(bounces) as Bounces,
-            SUM(soft_bounce_count) as Soft_bounce_count,
-            SUM(unique_soft_bounce) as Unique_soft_bounce,
-            SUM(spam_report) as Spam_report,
-            SUM(unsubscribe) as Unsubscribe,
-            CASE WHEN SUM(sent) > 0 THEN ROUND(100.0 * SUM(delivered) / SUM(sent), 2) ELSE 0 END as delivery_rate,
-            CASE WHEN SUM(delivered) > 0 THEN ROUND(100.0 * SUM(spam_report) / SUM(delivered), 4) ELSE 0 END as spam_rate,
-            CASE WHEN SUM(delivered) > 0 THEN ROUND(100.0 * SUM(unsubscribe) / SUM(delivered), 4) ELSE 0 END as unsub_rate,
-            CASE WHEN SUM(sent) > 0 THEN ROUND(100.0 * SUM(bounces) / SUM(sent), 4) ELSE 0 END as bounce_rate,
-            CASE WHEN SUM(sent) > 0 THEN ROUND(100.0 * SUM(soft_bounce_count) / SUM(sent), 4) ELSE 0 END as soft_bounce_pct,
-            AVG(risk_score) as risk_score,
-            MAX(classification) as classification
-        FROM daily_metrics
-        WHERE report_date >= ? AND report_date < ?
-        GROUP BY from_domain, region, esp
+            d.name as From_domain,
+            r.name as Region,
+            e.name as ESP,
+            a.Sent, a.Delivered, a.Bounces, a.Soft_bounce_count, a.Unique_soft_bounce,
+            a.Spam_report, a.Unsubscribe, a.delivery_rate, a.spam_rate, a.unsub_rate,
+            a.bounce_rate, a.soft_bounce_pct, a.risk_score, a.classification
+        FROM (
+            SELECT
+                f.domain_id,
+                f.region_id,
+                f.esp_id,
+                SUM(f.sent) as Sent,
+                SUM(f.delivered) as Delivered,
+                SUM(f.bounces) as Bounces,
+                SUM(f.soft_bounce_count) as Soft_bounce_count,
+                SUM(f.unique_soft_bounce) as Unique_soft_bounce,
+                SUM(f.spam_report) as Spam_report,
+                SUM(f.unsubscribe) as Unsubscribe,
+                CASE WHEN SUM(f.sent) > 0 THEN ROUND(100.0 * SUM(f.delivered) / SUM(f.sent), 2) ELSE 0 END as delivery_rate,
+                CASE WHEN SUM(f.delivered) > 0 THEN ROUND(100.0 * SUM(f.spam_report) / SUM(f.delivered), 4) ELSE 0 END as spam_rate,
+                CASE WHEN SUM(f.delivered) > 0 THEN ROUND(100.0 * SUM(f.unsubscribe) / SUM(f.delivered), 4) ELSE 0 END as unsub_rate,
+                CASE WHEN SUM(f.sent) > 0 THEN ROUND(100.0 * SUM(f.bounces) / SUM(f.sent), 4) ELSE 0 END as bounce_rate,
+                CASE WHEN SUM(f.sent) > 0 THEN ROUND(100.0 * SUM(f.soft_bounce_count) / SUM(f.sent), 4) ELSE 0 END as soft_bounce_pct,
+                AVG(f.risk_score) as risk_score,
+                MAX(c.name) as classification
+            FROM {source} f
+            LEFT JOIN dim_classification c ON c.id = f.classification_id
+            WHERE f.report_date >= ? AND f.report_date < ?
+            GROUP BY f.domain_id, f.region_id, f.esp_id
+        ) a
+        JOIN dim_domain d ON d.id = a.domain_id
+        JOIN dim_region r ON r.id = a.region_id
+        JOIN dim_esp e ON e.id = a.esp_id
     """
     df = pd.read_sql_query(query, conn, params=(start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
     conn.close()
     return df
 
 
-def get_domain_timeseries(from_domain: str, days: int = 30) -> pd.DataFrame:
-    """Get time-series data for a specific domain"""
+TIMESERIES_VOLUMES = ['sent', 'delivered']
+TIMESERIES_RATES = ['delivery_rate', 'spam_rate', 'bounce_rate']
+
+
+def get_domain_timeseries(from_domain: str, days: int = 30, max_points: Optional[int] = None) -> pd.DataFrame:
+    """Get time-series data for a specific domain (LTTB-downsampled to max_points if given)"""
     cutoff_date = (datetime.utcnow().date() - timedelta(days=days)).strftime('%Y-%m-%d')
     conn = sqlite3.connect(DB_PATH)
-    query = """
+    source = partitioned_source(conn.cursor(), FACT_TABLE, FACT_COLUMNS, cutoff_date)
+    query = f"""
         SELECT
             report_date,
             SUM(sent) as sent,
@@ -242,21 +409,120 @@ def get_domain_timeseries(from_domain: str, days: int = 30) -> pd.DataFrame:
             CASE WHEN SUM(sent) > 0 THEN ROUND(100.0 * SUM(delivered) / SUM(sent), 2) ELSE 0 END as delivery_rate,
             CASE WHEN SUM(delivered) > 0 THEN ROUND(100.0 * SUM(spam_report) / SUM(delivered), 4) ELSE 0 END as spam_rate,
             CASE WHEN SUM(sent) > 0 THEN ROUND(100.0 * SUM(bounces) / SUM(sent), 4) ELSE 0 END as bounce_rate
-        FROM daily_metrics
-        WHERE from_domain = ? AND report_date >= ?
+        FROM {source}
+        WHERE domain_id = (SELECT id FROM dim_domain WHERE name = ?) AND report_date >= ?
         GROUP BY report_date
         ORDER BY report_date
     """
     df = pd.read_sql_query(query, conn, params=(from_domain, cutoff_date))
     conn.close()
-    return df
+    return downsample_frame(df, max_points, ['sent', 'delivered'] + TIMESERIES_RATES)
+
+
+def get_domains_timeseries(domains: Optional[List[str]] = None, days: int = 30,
+                           top_n: Optional[int] = None, max_points: Optional[int] = None) -> Dict:
+    """
+    Get time-series data for several domains in one query, aligned on a shared date axis
+
+    Args:
+        domains: Domains to include (ignored when top_n is given)
+        days: Number of days to look back
+        top_n: Pick the top N domains by sent volume in the window instead
+        max_points: LTTB-downsample the shared date axis to this many points
+
+    Returns:
+        Dict with 'dates', 'domains' (in volume order) and 'series'
+        {domain: {metric: [value per date]}}; days without data have 0 volume and None rates
+    """
+    validate_max_points(max_points)
+    cutoff_date = (datetime.utcnow().date() - timedelta(days=days)).strftime('%Y-%m-%d')
+    conn = sqlite3.connect(DB_PATH)
+    source = partitioned_source(conn.cursor(), FACT_TABLE, FACT_COLUMNS, cutoff_date)
+
+    params: List = [cutoff_date]
+    domain_filter = ''
+    if top_n is None:
+        names = [d.strip() for d in domains or [] if d and d.strip()]
+        if not names:
+            conn.close()
+            return {'dates': [], 'domains': [], 'series': {}}
+        domain_filter = f"AND domain_id IN (SELECT id FROM dim_domain WHERE name IN ({','.join('?' * len(names))}))"
+        params.extend(names)
+
+    # One pass over the window: per-(domain, day) sums plus each domain's window total for ordering
+    query = f"""
+        WITH daily AS (
+            SELECT
+                domain_id,
+                report_date,
+                SUM(sent) as sent,
+                SUM(delivered) as delivered,
+                SUM(spam_report) as spam_report,
+                SUM(bounces) as bounces
+            FROM {source}
+            WHERE report_date >= ? {domain_filter}
+            GROUP BY domain_id, report_date
+        ),
+        ranked AS (
+            SELECT domain_id, SUM(sent) as total_sent
+            FROM daily
+            GROUP BY domain_id
+            ORDER BY total_sent DESC
+            {'LIMIT ?' if top_n is not None else ''}
+        )
+        SELECT
+            dd.name as from_domain,
+            daily.report_date,
+            daily.sent,
+            daily.delivered,
+            CASE WHEN daily.sent > 0 THEN ROUND(100.0 * daily.delivered / daily.sent, 2) ELSE 0 END as delivery_rate,
+            CASE WHEN daily.delivered > 0 THEN ROUND(100.0 * daily.spam_report / daily.delivered, 4) ELSE 0 END as spam_rate,
+            CASE WHEN daily.sent > 0 THEN ROUND(100.0 * daily.bounces / daily.sent, 4) ELSE 0 END as bounce_rate
+        FROM daily
+        JOIN ranked ON ranked.domain_id = daily.domain_id
+        JOIN dim_domain dd ON dd.id = daily.domain_id
+        ORDER BY ranked.total_sent DESC, dd.name, daily.report_date
+    """
+    if top_n is not None:
+        params.append(int(top_n))
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+
+    if df.empty:
+        return {'dates': [], 'domains': [], 'series': {}}
+
+    # Pivot to one column per date so every domain shares the same axis
+    dates = sorted(df['report_date'].unique())
+    domain_order = list(dict.fromkeys(df['from_domain']))
+    wide = df.pivot(index='from_domain', columns='report_date').reindex(index=domain_order)
+
+    # Keep one set of dates for every domain, chosen over all domains' series at once
+    if max_points is not None and len(dates) > max_points:
+        matrix = np.hstack([
+            wide[metric].reindex(columns=dates).to_numpy(dtype=float).T
+            for metric in TIMESERIES_VOLUMES + TIMESERIES_RATES
+        ])
+        keep = lttb_indices(matrix, max_points)
+        dates = [dates[i] for i in keep]
+
+    series = {domain: {} for domain in domain_order}
+    for metric in TIMESERIES_VOLUMES + TIMESERIES_RATES:
+        values = wide[metric].reindex(columns=dates)
+        if metric in TIMESERIES_VOLUMES:
+            values = values.fillna(0).astype('int64')
+        else:
+            values = values.astype(object).where(values.notna(), None)
+        for domain, row in zip(domain_order, values.to_numpy().tolist()):
+            series[domain][metric] = row
+
+    return {'dates': dates, 'domains': domain_order, 'series': series}
 
 
 def get_available_dates() -> List[str]:
     """Get list of dates with data"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT report_date FROM daily_metrics ORDER BY report_date DESC')
+    cursor.execute('SELECT DISTINCT report_date FROM daily_metrics_fact ORDER BY report_date DESC')
     dates = [row[0] for row in cursor.fetchall()]
     conn.close()
     return dates
@@ -0,0 +1,227 @@
+"""
+Pulsation Trend Service
+MoM, QoQ, YoY and trailing-12-month trends per domain and account from daily_metrics
+
+Monthly totals for the 13 months ending at the anchor month are loaded with one
+grouped query and laid out as an (entity x month x metric) array, so every
+comparison for every entity is a single array operation. Results for closed months
+never change, so they are cached per (level, month) until a day inside their window
+is re-collected (accounts are also re-keyed when the mapping changes).
+"""
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Union
+from pulsation_service import DB_PATH, FACT_TABLE, FACT_COLUMNS
+from partition_service import partitioned_source, to_date
+from account_mapping_service import get_mapping_version
+from account_aggregation_service import add_account_column
+
+TREND_METRICS = ['sent', 'delivered', 'bounces', 'spam_report', 'unsubscribe']
+TREND_LEVELS = {'domain': 'From_domain', 'account': 'Account'}
+
+# Anchor month plus the 12 before it (YoY compares against index 0)
+WINDOW_MONTHS = 13
+
+# (level, 'YYYY-MM') -> {'mapping_version', 'trends'}; closed months only
+_trend_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _month_number(value: Union[str, date, datetime]) -> int:
+    """Months since year 0 for a date or YYYY-MM(-DD) string"""
+    if isinstance(value, str) and len(value) == 7:
+        value = f'{value}-01'
+    d = to_date(value)
+    return d.year * 12 + d.month - 1
+
+
+def _month_label(number: int) -> str:
+    """YYYY-MM label for a month number"""
+    return f'{number // 12:04d}-{number % 12 + 1:02d}'
+
+
+def last_closed_month() -> str:
+    """Most recent month that has fully ended (UTC)"""
+    return _month_label(_month_number(datetime.utcnow().date()) - 1)
+
+
+def trailing_months(month: str) -> List[str]:
+    """Labels of the 12 months ending at month (the Trailing_12 axis)"""
+    anchor = _month_number(month)
+    return [_month_label(anchor - 11 + i) for i in range(12)]
+
+
+def anchor_month_for_range(to_date_value: str) -> str:
+    """
+    Month a trend is anchored on for a range ending at to_date (exclusive)
+
+    The range's last day decides the month, capped at the last closed month.
+    """
+    last_day = to_date(to_date_value) - timedelta(days=1)
+    return _month_label(min(_month_number(last_day), _month_number(last_closed_month())))
+
+
+def load_monthly_totals(first_month: str, last_month: str) -> pd.DataFrame:
+    """
+    Sum TREND_METRICS per domain and month in one grouped query
+
+    Returns:
+        DataFrame with From_domain, month (YYYY-MM) and one column per metric
+    """
+    start = f'{first_month}-01'
+    end = f'{_month_label(_month_number(last_month) + 1)}-01'
+
+    conn = sqlite3.connect(DB_PATH)
+    source = partitioned_source(conn.cursor(), FACT_TABLE, FACT_COLUMNS, start, to_date(end) - timedelta(days=1))
+    sums = ', '.join(f'SUM(COALESCE(f.{m}, 0)) as {m}' for m in TREND_METRICS)
+    query = f"""
+        SELECT d.name as From_domain, a.month, {', '.join(f'a.{m}' for m in TREND_METRICS)}
+        FROM (
+            SELECT f.domain_id, substr(f.report_date, 1, 7) as month, {sums}
+            FROM {source} f
+            WHERE f.report_date >= ? AND f.report_date < ?
+            GROUP BY f.domain_id, substr(f.report_date, 1, 7)
+        ) a
+        JOIN dim_domain d ON d.id = a.domain_id
+    """
+    df = pd.read_sql_query(query, conn, params=(start, end))
+    conn.close()
+    return df
+
+
+def _percent_change(current: np.ndarray, previous: np.ndarray, valid: bool) -> np.ndarray:
+    """(current - previous) / previous * 100 rounded to 2 places; NaN where not comparable"""
+    if not valid:
+        return np.full(current.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        change = np.round((current - previous) / previous * 100, 2)
+    return np.where(previous > 0, change, np.nan)
+
+
+def compute_trends(monthly: pd.DataFrame, name_column: str, anchor_month: str) -> Dict:
+    """
+    Compute MoM, QoQ, YoY and trailing-12 for every entity in one pass
+
+    Args:
+        monthly: Rows with name_column, month and TREND_METRICS (any number per key)
+        name_column: Entity column (From_domain or Account)
+        anchor_month: Month the comparisons are for (YYYY-MM)
+
+    Returns:
+        {'month', 'months': 12 trailing labels, 'names': entity array,
+         'values': (entities, 13, metrics) totals, 'mom'/'qoq'/'yoy': (entities, metrics)}
+    """
+    anchor = _month_number(anchor_month)
+    labels = [_month_label(anchor - WINDOW_MONTHS + 1 + i) for i in range(WINDOW_MONTHS)]
+    month_index = {label: i for i, label in enumerate(labels)}
+
+    monthly = monthly[monthly['month'].isin(month_index)]
+    codes, names = pd.factorize(monthly[name_column])
+
+    values = np.zeros((len(names), WINDOW_MONTHS, len(TREND_METRICS)))
+    np.add.at(
+        values,
+        (codes, monthly['month'].map(month_index).to_numpy()),
+        monthly[TREND_METRICS].to_numpy(dtype=float)
+    )
+
+    # A comparison is only made when every month it reads has data (retention may
+    # have dropped the oldest ones); otherwise it would report a spurious -100%
+    has_data = values.sum(axis=(0, 2)) > 0
+    current = values[:, -1]
+
+    return {
+        'month': anchor_month,
+        'months': labels[1:],
+        'names': np.asarray(names),
+        'values': values,
+        'mom': _percent_change(current, values[:, -2], has_data[-2]),
+        'qoq': _percent_change(values[:, -3:].sum(axis=1), values[:, -6:-3].sum(axis=1), has_data[-6:-3].all()),
+        'yoy': _percent_change(current, values[:, 0], has_data[0]),
+    }
+
+
+def _build_trends(level: str, anchor_month: str) -> Dict:
+    """Load the window and compute trends for one level"""
+    anchor = _month_number(anchor_month)
+    monthly = load_monthly_totals(_month_label(anchor - WINDOW_MONTHS + 1), anchor_month)
+
+    if level == 'account' and not monthly.empty:
+        monthly = add_account_column(monthly)
+        monthly = monthly.groupby(['Account', 'month'], as_index=False)[TREND_METRICS].sum()
+    elif level == 'account':
+        monthly = monthly.rename(columns={'From_domain': 'Account'})
+
+    return compute_trends(monthly, TREND_LEVELS[level], anchor_month)
+
+
+def get_trends(level: str = 'domain', month: Optional[str] = None) -> Dict:
+    """
+    Get trends for all entities of a level, cached when the month is closed
+
+    Args:
+        level: 'domain' or 'account'
+        month: Anchor month (YYYY-MM), defaults to the last closed month
+    """
+    if level not in TREND_LEVELS:
+        raise ValueError(f'Invalid level: {level}. Must be one of {list(TREND_LEVELS)}')
+
+    month = _month_label(_month_number(month)) if month else last_closed_month()
+    closed = _month_number(month) < _month_number(datetime.utcnow().date())
+    mapping_version = get_mapping_version() if level == 'account' else None
+
+    with _cache_lock:
+        cached = _trend_cache.get((level, month))
+    if cached and cached['mapping_version'] == mapping_version:
+        return cached['trends']
+
+    trends = _build_trends(level, month)
+    if closed:
+        with _cache_lock:
+            _trend_cache[(level, month)] = {'mapping_version': mapping_version, 'trends': trends}
+    return trends
+
+
+def get_trend_frame(level: str = 'domain', month: Optional[str] = None, metric: str = 'sent',
+                    names: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Trend columns for one metric, ready to merge into a domain or account frame
+
+    Returns:
+        DataFrame with the entity column (From_domain/Account), Current, Previous,
+        MoM_%, QoQ_%, YoY_% (None where not comparable) and Trailing_12 (list)
+    """
+    if metric not in TREND_METRICS:
+        raise ValueError(f'Invalid metric: {metric}. Must be one of {TREND_METRICS}')
+
+    trends = get_trends(level, month)
+    k = TREND_METRICS.index(metric)
+
+    df = pd.DataFrame({
+        TREND_LEVELS[level]: trends['names'],
+        'Current': trends['values'][:, -1, k].astype(np.int64),
+        'Previous': trends['values'][:, -2, k].astype(np.int64),
+        'MoM_%': trends['mom'][:, k],
+        'QoQ_%': trends['qoq'][:, k],
+        'YoY_%': trends['yoy'][:, k],
+        'Trailing_12': list(trends['values'][:, 1:, k].astype(np.int64).tolist()),
+    })
+    if names is not None:
+        df = df[df[TREND_LEVELS[level]].isin(names)]
+
+    for column in ['MoM_%', 'QoQ_%', 'YoY_%']:
+        df[column] = df[column].astype(object).where(df[column].notna(), None)
+    return df.sort_values('Current', ascending=False).reset_index(drop=True)
+
+
+def invalidate_trend_cache(report_date: Union[str, date, datetime]):
+    """Drop cached months whose 13-month window contains a (re)collected day"""
+    day_month = _month_number(report_date)
+    with _cache_lock:
+        for key in list(_trend_cache):
+            anchor = _month_number(key[1])
+            if anchor - WINDOW_MONTHS < day_month <= anchor:
+                del _trend_cache[key]
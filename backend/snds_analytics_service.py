@@ -6,6 +6,9 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from collections import defaultdict
+from partition_service import partitioned_source
+from downsample_service import downsample_series
+from snds_service import SNDS_TABLE, SNDS_COLUMNS
 
 SNDS_DB_PATH = '/Users/pankaj/pani/data/snds_data.db'
 
@@ -86,52 +89,53 @@ def get_snds_overview(period: str = '30day') -> Dict:
 
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
+    source = partitioned_source(cursor, SNDS_TABLE, SNDS_COLUMNS, start_date, end_date)
 
     # Total IPs monitored
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT COUNT(DISTINCT ip_address)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
     ''', (start_date, end_date))
     total_ips = cursor.fetchone()[0]
 
     # Total messages
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT SUM(message_volume)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
     ''', (start_date, end_date))
     total_messages = cursor.fetchone()[0] or 0
 
     # Average spam rate
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT AVG(spam_rate)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
     ''', (start_date, end_date))
     avg_spam_rate = cursor.fetchone()[0] or 0
 
     # Total trap hits
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT SUM(trap_hits)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
     ''', (start_date, end_date))
     total_trap_hits = cursor.fetchone()[0] or 0
 
     # Filter result distribution
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT filter_result, COUNT(*)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
         GROUP BY filter_result
     ''', (start_date, end_date))
     filter_distribution = {row[0]: row[1] for row in cursor.fetchall()}
 
     # Calculate average reputation
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT ip_address, AVG(spam_rate), SUM(trap_hits), filter_result
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
         GROUP BY ip_address
     ''', (start_date, end_date))
@@ -144,9 +148,9 @@ def get_snds_overview(period: str = '30day') -> Dict:
     avg_reputation = sum(reputation_scores) / len(reputation_scores) if reputation_scores else 0
 
     # Accounts with data
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT COUNT(DISTINCT account_name)
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
         AND account_name IS NOT NULL
         AND account_name != ''
@@ -184,10 +188,11 @@ def get_snds_data_by_period(period: str = '30day', view_by: str = 'ip', account_
 
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
+    source = partitioned_source(cursor, SNDS_TABLE, SNDS_COLUMNS, start_date, end_date)
 
     # Build query based on view_by
     if view_by == 'account':
-        query = '''
+        query = f'''
             SELECT
                 account_name,
                 data_date,
@@ -195,7 +200,7 @@ def get_snds_data_by_period(period: str = '30day', view_by: str = 'ip', account_
                 AVG(spam_rate) as avg_spam_rate,
                 SUM(trap_hits) as total_trap_hits,
                 filter_result
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
         '''
         params = [start_date, end_date]
@@ -209,7 +214,7 @@ def get_snds_data_by_period(period: str = '30day', view_by: str = 'ip', account_
             ORDER BY data_date DESC, total_messages DESC
         '''
     else:  # by IP
-        query = '''
+        query = f'''
             SELECT
                 ip_address,
                 account_name,
@@ -219,7 +224,7 @@ def get_snds_data_by_period(period: str = '30day', view_by: str = 'ip', account_
                 trap_hits,
                 filter_result,
                 comments
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
         '''
         params = [start_date, end_date]
@@ -270,25 +275,27 @@ def get_snds_data_by_period(period: str = '30day', view_by: str = 'ip', account_
     return results
 
 
-def get_reputation_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
+def get_reputation_trends(period: str = '30day', group_by: str = 'ip', max_points: Optional[int] = None) -> Dict:
     """
     Get reputation trends over time
     Returns data suitable for line charts
+    Each series is LTTB-downsampled to max_points dates if given
     """
     start_date, end_date = get_time_period_dates(period)
 
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
+    source = partitioned_source(cursor, SNDS_TABLE, SNDS_COLUMNS, start_date, end_date)
 
     if group_by == 'account':
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT
                 account_name,
                 data_date,
                 AVG(spam_rate) as avg_spam_rate,
                 SUM(trap_hits) as trap_hits,
                 filter_result
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
             AND account_name IS NOT NULL
             AND account_name != ''
@@ -296,14 +303,14 @@ def get_reputation_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
             ORDER BY account_name, data_date
         ''', (start_date, end_date))
     else:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT
                 ip_address,
                 data_date,
                 spam_rate,
                 trap_hits,
                 filter_result
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
             ORDER BY ip_address, data_date
         ''', (start_date, end_date))
@@ -332,26 +339,28 @@ def get_reputation_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
     return {
         'period': period,
         'group_by': group_by,
-        'trends': dict(trends)
+        'trends': {entity: downsample_series(series, max_points) for entity, series in trends.items()}
     }
 
 
-def get_traffic_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
+def get_traffic_trends(period: str = '30day', group_by: str = 'ip', max_points: Optional[int] = None) -> Dict:
     """
     Get traffic volume trends over time
+    Each series is LTTB-downsampled to max_points dates if given
     """
     start_date, end_date = get_time_period_dates(period)
 
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
+    source = partitioned_source(cursor, SNDS_TABLE, SNDS_COLUMNS, start_date, end_date)
 
     if group_by == 'account':
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT
                 account_name,
                 data_date,
                 SUM(message_volume) as volume
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
             AND account_name IS NOT NULL
             AND account_name != ''
@@ -359,12 +368,12 @@ def get_traffic_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
             ORDER BY account_name, data_date
         ''', (start_date, end_date))
     else:
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT
                 ip_address,
                 data_date,
                 message_volume
-            FROM snds_data
+            FROM {source}
             WHERE data_date BETWEEN ? AND ?
             ORDER BY ip_address, data_date
         ''', (start_date, end_date))
@@ -386,7 +395,7 @@ def get_traffic_trends(period: str = '30day', group_by: str = 'ip') -> Dict:
     return {
         'period': period,
         'group_by': group_by,
-        'trends': dict(trends)
+        'trends': {entity: downsample_series(series, max_points) for entity, series in trends.items()}
     }
 
 
@@ -400,8 +409,9 @@ def get_top_performers(period: str = '30day', metric: str = 'reputation', limit:
 
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
+    source = partitioned_source(cursor, SNDS_TABLE, SNDS_COLUMNS, start_date, end_date)
 
-    cursor.execute('''
+    cursor.execute(f'''
         SELECT
             ip_address,
             account_name,
@@ -409,7 +419,7 @@ def get_top_performers(period: str = '30day', metric: str = 'reputation', limit:
             SUM(trap_hits) as total_trap_hits,
             filter_result,
             SUM(message_volume) as total_volume
-        FROM snds_data
+        FROM {source}
         WHERE data_date BETWEEN ? AND ?
         GROUP BY ip_address
     ''', (start_date, end_date))
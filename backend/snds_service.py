@@ -7,6 +7,14 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import xml.etree.ElementTree as ET
+from partition_service import (
+    ensure_partition,
+    refresh_union_view,
+    list_partitions,
+    partition_resolver,
+    drop_partitions_before,
+    migrate_to_partitions
+)
 
 # SNDS API Configuration
 SNDS_DATA_URL = "https://sendersupport.olc.protection.outlook.com/snds/data/?key=bc7c2e2e-23ba-4689-a338-c23c18590abd"
@@ -16,36 +24,55 @@ SNDS_IP_STATUS_URL = "https://sendersupport.olc.protection.outlook.com/snds/ipSt
 SNDS_DB_PATH = '/Users/pankaj/pani/data/snds_data.db'
 
 
+# SNDS rows are stored in monthly partitions (snds_data_YYYY_MM) behind a snds_data union view
+SNDS_TABLE = 'snds_data'
+SNDS_COLUMNS = (
+    'ip_address, account_name, data_date, message_volume, spam_rate, complaint_rate, '
+    'trap_hits, filter_result, activity_end, comments, collected_at'
+)
+SNDS_DDL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        ip_address TEXT NOT NULL,
+        account_name TEXT,
+        data_date DATE NOT NULL,
+
+        -- Traffic Metrics
+        message_volume INTEGER DEFAULT 0,
+        spam_rate REAL DEFAULT 0,
+        complaint_rate REAL DEFAULT 0,
+        trap_hits INTEGER DEFAULT 0,
+
+        -- Reputation Metrics
+        filter_result TEXT,
+        activity_end TEXT,
+        comments TEXT,
+
+        -- Metadata
+        collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+        UNIQUE(ip_address, data_date)
+    )
+'''
+SNDS_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_{table}_account_date ON {table}(account_name, data_date)',
+    'CREATE INDEX IF NOT EXISTS idx_{table}_date ON {table}(data_date)',
+]
+
+
 def init_snds_database():
     """Initialize SNDS database with required tables"""
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
 
-    # Main SNDS data table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS snds_data (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ip_address TEXT NOT NULL,
-            account_name TEXT,
-            data_date DATE NOT NULL,
-
-            -- Traffic Metrics
-            message_volume INTEGER DEFAULT 0,
-            spam_rate REAL DEFAULT 0,
-            complaint_rate REAL DEFAULT 0,
-            trap_hits INTEGER DEFAULT 0,
-
-            -- Reputation Metrics
-            filter_result TEXT,
-            activity_end TEXT,
-            comments TEXT,
+    # Migration: split the old single snds_data table into monthly partitions
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (SNDS_TABLE,))
+    existing = cursor.fetchone()
+    if existing and existing[0] == 'table':
+        migrate_to_partitions(cursor, SNDS_TABLE, SNDS_TABLE, 'data_date', SNDS_DDL, SNDS_INDEXES, SNDS_COLUMNS)
 
-            -- Metadata
-            collected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-
-            UNIQUE(ip_address, data_date)
-        )
-    ''')
+    # Main SNDS data partitions
+    ensure_partition(cursor, SNDS_TABLE, datetime.utcnow().date(), SNDS_DDL, SNDS_INDEXES)
+    refresh_union_view(cursor, SNDS_TABLE, SNDS_COLUMNS)
 
     # IP to Account mapping table
     cursor.execute('''
@@ -57,11 +84,6 @@ def init_snds_database():
         )
     ''')
 
-    # Create indexes for performance
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_snds_ip_date ON snds_data(ip_address, data_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_snds_account_date ON snds_data(account_name, data_date)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_snds_date ON snds_data(data_date)')
-
     conn.commit()
     conn.close()
     print(f'SNDS database initialized at {SNDS_DB_PATH}')
@@ -283,31 +305,45 @@ def store_snds_data(data_records: List[Dict]) -> int:
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
 
-    inserted = 0
+    partition_for = partition_resolver(cursor, SNDS_TABLE, SNDS_DDL, SNDS_INDEXES, view_columns=SNDS_COLUMNS)
+    collected_at = datetime.utcnow()
 
+    rows_by_table = {}
     for record in data_records:
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO snds_data
+            table = partition_for(record.get('date'))
+        except (sqlite3.Error, ValueError, TypeError) as e:
+            print(f'Error inserting record: {e}')
+            continue
+        rows_by_table.setdefault(table, []).append((
+            record.get('ip_address'),
+            record.get('date'),
+            record.get('message_volume', 0),
+            record.get('spam_rate', 0.0),
+            record.get('complaint_rate', 0.0),
+            record.get('trap_hits', 0),
+            record.get('filter_result', 'unknown'),
+            record.get('activity_end'),
+            record.get('comments'),
+            collected_at
+        ))
+
+    inserted = 0
+    for table, rows in rows_by_table.items():
+        # A failing month is rolled back whole instead of leaving part of its rows
+        cursor.execute('SAVEPOINT store_month')
+        try:
+            cursor.executemany(f'''
+                INSERT OR REPLACE INTO {table}
                 (ip_address, data_date, message_volume, spam_rate, complaint_rate,
                  trap_hits, filter_result, activity_end, comments, collected_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                record.get('ip_address'),
-                record.get('date'),
-                record.get('message_volume', 0),
-                record.get('spam_rate', 0.0),
-                record.get('complaint_rate', 0.0),
-                record.get('trap_hits', 0),
-                record.get('filter_result', 'unknown'),
-                record.get('activity_end'),
-                record.get('comments'),
-                datetime.utcnow()
-            ))
-            inserted += 1
+            ''', rows)
+            inserted += len(rows)
         except sqlite3.Error as e:
-            print(f'Error inserting record: {e}')
-            continue
+            cursor.execute('ROLLBACK TO store_month')
+            print(f'Error inserting records into {table}: {e}')
+        cursor.execute('RELEASE store_month')
 
     conn.commit()
     conn.close()
@@ -318,7 +354,7 @@ def store_snds_data(data_records: List[Dict]) -> int:
 
 def cleanup_old_data(days_to_keep: int = 365):
     """
-    Delete SNDS data older than specified days
+    Drop SNDS monthly partitions entirely older than specified days
     Default: Keep 1 year of data
     """
     cutoff_date = (datetime.utcnow() - timedelta(days=days_to_keep)).date()
@@ -326,8 +362,7 @@ def cleanup_old_data(days_to_keep: int = 365):
     conn = sqlite3.connect(SNDS_DB_PATH)
     cursor = conn.cursor()
 
-    cursor.execute('DELETE FROM snds_data WHERE data_date < ?', (cutoff_date,))
-    deleted = cursor.rowcount
+    deleted = drop_partitions_before(cursor, SNDS_TABLE, cutoff_date, SNDS_COLUMNS)
 
     conn.commit()
     conn.close()
@@ -380,18 +415,19 @@ def map_ips_to_accounts():
 
     conn.commit()
 
-    # Update account_name in snds_data table
-    cursor.execute('''
-        UPDATE snds_data
-        SET account_name = (
-            SELECT account_name
-            FROM snds_ip_mapping
-            WHERE snds_ip_mapping.ip_address = snds_data.ip_address
-        )
-        WHERE ip_address IN (SELECT ip_address FROM snds_ip_mapping)
-    ''')
-
-    updated = cursor.rowcount
+    # Update account_name in every snds_data partition
+    updated = 0
+    for table in list_partitions(cursor, SNDS_TABLE):
+        cursor.execute(f'''
+            UPDATE {table}
+            SET account_name = (
+                SELECT account_name
+                FROM snds_ip_mapping
+                WHERE snds_ip_mapping.ip_address = {table}.ip_address
+            )
+            WHERE ip_address IN (SELECT ip_address FROM snds_ip_mapping)
+        ''')
+        updated += cursor.rowcount
     conn.commit()
 
     conn.close()
@@ -0,0 +1,97 @@
+"""
+Tests for mbr_storage_service.diff_reports
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import mbr_storage_service  # noqa: E402
+
+
+@pytest.fixture
+def reports_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(mbr_storage_service, 'DB_PATH', str(tmp_path / 'mbr_reports.db'))
+    mbr_storage_service.init_mbr_reports_database()
+
+
+def account_row(name, sent):
+    return {'Account': name, 'Sent': sent, 'Delivered': sent, 'Bounces': 0,
+            'Spam_report': 0, 'Unsubscribe': 0}
+
+
+def account_report(sends, top_overall):
+    """Account report with every account per ESP and an overall top list"""
+    rows = [account_row(name, sent) for name, sent in sends.items()]
+    return {
+        'esp_data': {'Sparkpost': {'top10_accounts': rows[:10]}},
+        'all_accounts_by_esp': {'Sparkpost': rows},
+        'top10_accounts_overall': [account_row(name, sends[name]) for name in top_overall],
+    }
+
+
+def save(report_type, data):
+    return mbr_storage_service.save_mbr_report('2026-01-01', '2026-02-01', report_type, data)['report_id']
+
+
+def test_account_crossing_top10_is_not_added_or_removed(reports_db):
+    sends = {f'A{i}': 1000 - i for i in range(12)}
+    names = list(sends)
+    # Same per-ESP rows; only the overall top 10 differs (A9 and A10 swapped)
+    base = save('account', account_report(sends, names[:10]))
+    compare = save('account', account_report(sends, names[:9] + ['A10']))
+
+    diff = mbr_storage_service.diff_reports(base, compare, threshold_pct=5.0)
+
+    assert diff['level'] == 'account'
+    assert diff['compared'] == len(sends)
+    assert diff['rows'] == []
+    assert diff['added'] == diff['removed'] == 0
+
+
+def test_account_diff_reports_per_esp_changes(reports_db):
+    sends = {f'A{i}': 1000 for i in range(12)}
+    changed = dict(sends, A3=1500, A11=1000)
+    del changed['A0']
+    changed['A12'] = 700
+
+    base = save('account', account_report(sends, list(sends)[:10]))
+    compare = save('account', account_report(changed, list(changed)[:10]))
+
+    diff = mbr_storage_service.diff_reports(base, compare, threshold_pct=5.0)
+    status = {(row['name'], row['esp']): row['status'] for row in diff['rows']}
+
+    assert status == {
+        ('A0', 'Sparkpost'): 'removed',
+        ('A3', 'Sparkpost'): 'changed',
+        ('A12', 'Sparkpost'): 'added',
+    }
+    a3 = next(row for row in diff['rows'] if row['name'] == 'A3')
+    assert a3['sent_change'] == 500
+    assert a3['sent_change_pct'] == 50.0
+
+
+def test_domain_diff_threshold_and_min_sent(reports_db):
+    def domain_report(sents):
+        return {'esp_data': {'Sparkpost': {'all_data': [
+            {'From_domain': name, 'ESP': 'Sparkpost', 'Region': 'US', 'Sent': sent, 'Delivered': sent}
+            for name, sent in sents.items()
+        ]}}}
+
+    base = save('domain', domain_report({'a.com': 1000, 'b.com': 1000, 'c.com': 10}))
+    compare = save('domain', domain_report({'a.com': 1020, 'b.com': 1200, 'c.com': 20}))
+
+    diff = mbr_storage_service.diff_reports(base, compare, threshold_pct=5.0, min_sent=100)
+
+    assert [row['name'] for row in diff['rows']] == ['b.com']
+
+
+def test_missing_report_and_mixed_types(reports_db):
+    domain = save('domain', {'esp_data': {}})
+    account = save('account', account_report({'A0': 1}, ['A0']))
+
+    assert mbr_storage_service.diff_reports(domain, 999) is None
+    with pytest.raises(ValueError):
+        mbr_storage_service.diff_reports(domain, account)